@@ -32,6 +32,8 @@ tools.initiate_translation(None)
 import config
 import logger
 import snapshots
+import searchindex
+import snapshotdiff
 import sshtools
 import mount
 import password
@@ -296,6 +298,45 @@ def createParsers(app_name = 'backintime'):
                                                  help = 'Decode PATH. If no PATH is specified on command line ' +\
                                                  'a list of filenames will be read from stdin.')
 
+    command = 'diff'
+    nargs = 0
+    description = 'Show the differences between two snapshots. Print one ' +\
+                  'line for every added (A), deleted (D), modified (M) ' +\
+                  'or replaced (T) file with status and path separated ' +\
+                  'by a tab.'
+    diffCP =               subparsers.add_parser(command,
+                                                 parents = [snapshotPathParser],
+                                                 epilog = epilogCommon,
+                                                 help = description,
+                                                 description = description)
+    diffCP.set_defaults(func = diff)
+    parsers[command] = diffCP
+    for arg, text in (('SID1', 'old'), ('SID2', 'new')):
+        diffCP.add_argument                     (arg,
+                                                 type = str,
+                                                 action = 'store',
+                                                 help = 'ID of the %s snapshot. This can be a snapshot ID or ' % text +\
+                                                 'an integer starting with 0 for the last snapshot, 1 for the second to last, ... ' +\
+                                                 'the very first snapshot is -1')
+
+    diffCP.add_argument                         ('PATH',
+                                                 type = str,
+                                                 action = 'store',
+                                                 nargs = '?',
+                                                 default = '/',
+                                                 help = 'Only compare file or directory PATH.')
+
+    command = 'empty-trash'
+    nargs = 0
+    description = 'Delete snapshots which were moved into the trash by ' +\
+                  'background removal.'
+    emptyTrashCP =         subparsers.add_parser(command,
+                                                 epilog = epilogCommon,
+                                                 help = description,
+                                                 description = description)
+    emptyTrashCP.set_defaults(func = emptyTrash)
+    parsers[command] = emptyTrashCP
+
     command = 'last-snapshot'
     nargs = 0
     aliases.append((command, nargs))
@@ -410,6 +451,23 @@ def createParsers(app_name = 'backintime'):
                                                  help = 'Only restore files which do not exist or are newer than ' +\
                                                         'those in destination. Using "rsync --update" option.')
 
+    command = 'search'
+    nargs = 0
+    description = 'Find files in all snapshots. Print the first and last ' +\
+                  'snapshot ID of every range of snapshots containing ' +\
+                  'the same file followed by its path, separated by tabs.'
+    searchCP =             subparsers.add_parser(command,
+                                                 parents = [snapshotPathParser],
+                                                 epilog = epilogCommon,
+                                                 help = description,
+                                                 description = description)
+    searchCP.add_argument                       ('PATTERN',
+                                                 action = 'store',
+                                                 help = 'Part of the path or a glob pattern (with *, ? or [) ' +\
+                                                 'matching the end of the path like "invoice-2023*.pdf".')
+    searchCP.set_defaults(func = search)
+    parsers[command] = searchCP
+
     command = 'shutdown'
     nargs = 0
     description = 'Shut down the computer after the snapshot is done.'
@@ -427,6 +485,13 @@ def createParsers(app_name = 'backintime'):
                                                  epilog = epilogCommon,
                                                  help = description,
                                                  description = description)
+    smartRemoveCP.add_argument                  ('--dry-run',
+                                                 action = 'store_true',
+                                                 help = 'Only show which snapshots would be removed.')
+    smartRemoveCP.add_argument                  ('--explain',
+                                                 action = 'store_true',
+                                                 help = 'Show for each snapshot which rule keeps it or ' +\
+                                                 'if it will be removed. Implies --dry-run.')
     smartRemoveCP.set_defaults(func = smartRemove)
     parsers[command] = smartRemoveCP
 
@@ -1091,6 +1156,52 @@ def decode(args):
     _umount(cfg)
     sys.exit(RETURN_OK)
 
+def diff(args):
+    """
+    Command for printing the differences between two snapshots.
+
+    Args:
+        args (argparse.Namespace):
+                        previously parsed arguments
+
+    Raises:
+        SystemExit:     0
+    """
+    force_stdout = setQuiet(args)
+    cfg = getConfig(args)
+    _mount(cfg)
+
+    snapshotsList = snapshots.listSnapshots(cfg)
+    sid1 = cli.selectSnapshot(snapshotsList, cfg, args.SID1, 'Old SnapshotID')
+    sid2 = cli.selectSnapshot(snapshotsList, cfg, args.SID2, 'New SnapshotID')
+    path = tools.preparePath(os.path.abspath(os.path.expanduser(args.PATH)))
+
+    for status, name in snapshotdiff.diff(sid1, sid2, path):
+        print('{}\t{}'.format(status, snapshots.escapeRsync(name)),
+              file = force_stdout)
+
+    if not args.keep_mount:
+        _umount(cfg)
+    sys.exit(RETURN_OK)
+
+def emptyTrash(args):
+    """
+    Command for deleting snapshots which were moved into the trash. This is
+    started in background after a snapshot if background removal is enabled.
+
+    Args:
+        args (argparse.Namespace):
+                        previously parsed arguments
+
+    Raises:
+        SystemExit:     0 if the trash is empty, 1 if not
+    """
+    setQuiet(args)
+    printHeader()
+    cfg = getConfig(args)
+    ret = snapshots.Snapshots(cfg).emptyTrash()
+    sys.exit(RETURN_OK if ret else RETURN_ERR)
+
 def remove(args, force = False):
     """
     Command for removing snapshots.
@@ -1142,16 +1253,36 @@ def smartRemove(args):
     cfg = getConfig(args)
     sn = snapshots.Snapshots(cfg)
 
+    if args.explain:
+        # never remove anything while explaining
+        args.dry_run = True
+
     enabled, keep_all, keep_one_per_day, keep_one_per_week, keep_one_per_month = cfg.smartRemove()
     if enabled:
         _mount(cfg)
-        del_snapshots = sn.smartRemoveList(datetime.today(),
-                                           keep_all,
-                                           keep_one_per_day,
-                                           keep_one_per_week,
-                                           keep_one_per_month)
+        sids = snapshots.listSnapshots(cfg)
+        keep = sn.smartRemoveKeep(sids,
+                                  datetime.today().date(),
+                                  keep_all,
+                                  keep_one_per_day,
+                                  keep_one_per_week,
+                                  keep_one_per_month)
+        del_snapshots = [sid for sid in sids if sid not in keep]
         logger.info('Smart Removal will remove {} snapshots'.format(len(del_snapshots)))
-        sn.smartRemove(del_snapshots, log = logger.info)
+
+        if args.explain:
+            for sid in sids:
+                if sid in keep:
+                    print('{}: keep ({})'.format(sid, ', '.join(keep[sid])))
+                else:
+                    print('{}: remove'.format(sid))
+
+        elif args.dry_run:
+            for sid in del_snapshots:
+                print('{}: remove'.format(sid))
+
+        if not args.dry_run:
+            sn.smartRemove(del_snapshots, log = logger.info)
         _umount(cfg)
         sys.exit(RETURN_OK)
     else:
@@ -1187,6 +1318,42 @@ def restore(args):
     _umount(cfg)
     sys.exit(RETURN_OK)
 
+def search(args):
+    """
+    Command for finding files in all snapshots of current profile. New
+    snapshots are added to the search index first.
+
+    Args:
+        args (argparse.Namespace):
+                        previously parsed arguments
+
+    Raises:
+        SystemExit:     0
+    """
+    force_stdout = setQuiet(args)
+    cfg = getConfig(args)
+    _mount(cfg)
+
+    sids = snapshots.listSnapshots(cfg, reverse = False)
+    ids = [sid.sid for sid in sids]
+
+    with searchindex.SearchIndex(cfg) as index:
+        index.update(sids, callback = lambda sid: logger.info(
+            'Add snapshot {} to search index'.format(sid)))
+        results = index.search(args.PATTERN)
+
+    for path, first, last, inode in results:
+        existing = searchindex.rangeSIDs(ids, first, last)
+        if existing:
+            print('{}\t{}\t{}'.format(existing[0],
+                                      existing[-1],
+                                      snapshots.escapeRsync(path)),
+                  file=force_stdout)
+
+    if not args.keep_mount:
+        _umount(cfg)
+    sys.exit(RETURN_OK)
+
 def checkConfig(args):
     """
     Command for checking the config file.
@@ -211,16 +211,40 @@ class RestoreDialog:
         if os.path.exists(self.logFile):
             os.remove(self.logFile)
 
+        # length of the progress line which needs to be overwritten
+        self.progressLength = 0
+
     def callback(self, line, *params):
         if not line:
             return
+        self.clearProgress()
         print(line)
         with open(self.logFile, 'a') as log:
             log.write(line + '\n')
 
+    def progress(self, percent, sent, speed, eta):
+        """
+        Show the progress of all restored paths in one line which is
+        overwritten by the next progress or message. Only on a terminal.
+        """
+        if not sys.stdout.isatty():
+            return
+        self.clearProgress()
+        line = '{}% {}: {} {}: {} {}: {}'.format(
+            percent, _('Sent'), sent, _('Speed'), speed, _('ETA'), eta)
+        print(line, end = '\r', flush = True)
+        self.progressLength = len(line)
+
+    def clearProgress(self):
+        if self.progressLength:
+            print(' ' * self.progressLength, end = '\r')
+            self.progressLength = 0
+
     def run(self):
         s = snapshots.Snapshots(self.config)
-        s.restore(self.sid, self.what, self.callback, self.where, **self.kwargs)
+        s.restore(self.sid, self.what, self.callback, self.where,
+                  progress = self.progress, **self.kwargs)
+        self.clearProgress()
         print('\nLog saved to %s' % self.logFile)
 
 class BackupJobDaemon(daemon.Daemon):
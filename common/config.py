@@ -1059,6 +1059,16 @@ class Config(configfile.ConfigFileWithProfiles):
     def setSmartRemoveRunRemoteInBackground(self, value, profile_id = None):
         self.setProfileBoolValue('snapshots.smart_remove.run_remote_in_background', value, profile_id)
 
+    def backgroundRemoveEnabled(self, profile_id = None):
+        #?Move snapshots removed by "older than", "Smart Removal" and free
+        #?space rules into the trash folder '.trash' inside the snapshots
+        #?folder and delete them in a low priority background process after
+        #?the backup. Only for mode Local.
+        return self.profileBoolValue('snapshots.background_remove.enabled', False, profile_id)
+
+    def setBackgroundRemoveEnabled(self, value, profile_id = None):
+        self.setProfileBoolValue('snapshots.background_remove.enabled', value, profile_id)
+
     def notify(self, profile_id = None):
         #?Display notifications (errors, warnings) through libnotify.
         return self.profileBoolValue('snapshots.notify.enabled', True, profile_id)
@@ -1218,6 +1228,42 @@ class Config(configfile.ConfigFileWithProfiles):
         self.setProfileBoolValue('snapshots.rsync_options.enabled', enabled, profile_id)
         self.setProfileStrValue('snapshots.rsync_options.value', value, profile_id)
 
+    def parallelRsyncEnabled(self, profile_id = None):
+        #?Split the include list into shards and run one rsync process per
+        #?shard concurrently. Hard links between files of different shards
+        #?are not preserved.
+        return self.profileBoolValue('snapshots.rsync_parallel.enabled', False, profile_id)
+
+    def parallelRsyncWorkers(self, profile_id = None):
+        #?Maximum number of concurrent rsync processes.;1-99
+        return self.profileIntValue('snapshots.rsync_parallel.workers', 4, profile_id)
+
+    def setParallelRsync(self, enabled, workers, profile_id = None):
+        self.setProfileBoolValue('snapshots.rsync_parallel.enabled', enabled, profile_id)
+        self.setProfileIntValue('snapshots.rsync_parallel.workers', workers, profile_id)
+
+    def continueInterruptedEnabled(self, profile_id = None):
+        #?Keep snapshots interrupted by a signal, a lost connection or a
+        #?timeout and continue them with the next run. rsync skips the files
+        #?already transferred. Partially transferred files are kept in mode
+        #?'ssh' and 'ssh_encfs' (--partial-dir=.rsync-partial) and removed
+        #?when the snapshot is finished. Only with
+        #?\fIprofile<N>.snapshots.rsync_parallel.enabled\fR each finished
+        #?rsync process is recorded as checkpoint, so the continued snapshot
+        #?skips its include items completely.
+        return self.profileBoolValue('snapshots.continue_interrupted.enabled', False, profile_id)
+
+    def setContinueInterruptedEnabled(self, value, profile_id = None):
+        return self.setProfileBoolValue('snapshots.continue_interrupted.enabled', value, profile_id)
+
+    def restorePermissionsWorkers(self, profile_id = None):
+        #?Number of threads restoring owner, group and mode of restored
+        #?files and folders. 1 restores them in a single thread.;1-99
+        return self.profileIntValue('snapshots.restore_permissions.workers', 1, profile_id)
+
+    def setRestorePermissionsWorkers(self, value, profile_id = None):
+        self.setProfileIntValue('snapshots.restore_permissions.workers', value, profile_id)
+
     def sshPrefixEnabled(self, profile_id = None):
         #?Add prefix to every command which run through SSH on remote host.
         return self.profileBoolValue('snapshots.ssh.prefix.enabled', False, profile_id)
@@ -1282,6 +1328,74 @@ class Config(configfile.ConfigFileWithProfiles):
     def setTakeSnapshotRegardlessOfChanges(self, value, profile_id = None):
         return self.setProfileBoolValue('snapshots.take_snapshot_regardless_of_changes', value, profile_id)
 
+    def checkForChanges(self, profile_id = None):
+        #?Check for changes with an rsync dry run before taking the snapshot.
+        #?If nothing has changed no hard-link tree is created in the
+        #?destination at all.
+        return self.profileBoolValue('snapshots.check_for_changes', False, profile_id)
+
+    def setCheckForChanges(self, value, profile_id = None):
+        return self.setProfileBoolValue('snapshots.check_for_changes', value, profile_id)
+
+    def dedupEnabled(self, profile_id = None):
+        #?Replace new files with hard links to identical files in older
+        #?snapshots of all profiles on the same destination after each
+        #?snapshot. Only for mode 'local'.
+        return self.profileBoolValue('snapshots.dedup.enabled', False, profile_id)
+
+    def setDedupEnabled(self, value, profile_id = None):
+        return self.setProfileBoolValue('snapshots.dedup.enabled', value, profile_id)
+
+    def dedupBudget(self, profile_id = None):
+        #?Maximum MiB of file content read for deduplication in one run.
+        #?0 = no limit.;0-999999
+        return self.profileIntValue('snapshots.dedup.budget', 10240, profile_id)
+
+    def setDedupBudget(self, value, profile_id = None):
+        return self.setProfileIntValue('snapshots.dedup.budget', value, profile_id)
+
+    def scanCacheEnabled(self, profile_id = None):
+        #?Keep size, mtime, ctime and inode of all included files in a cache
+        #?and only let rsync transfer the changed files (--files-from) if
+        #?there are few changes. Only for mode 'local'.
+        return self.profileBoolValue('snapshots.scan_cache.enabled', False, profile_id)
+
+    def setScanCacheEnabled(self, value, profile_id = None):
+        return self.setProfileBoolValue('snapshots.scan_cache.enabled', value, profile_id)
+
+    def scanCacheMaxChanges(self, profile_id = None):
+        #?Take a snapshot with a full rsync run if more files and folders
+        #?changed.
+        return self.profileIntValue('snapshots.scan_cache.max_changes', 10000, profile_id)
+
+    def setScanCacheMaxChanges(self, value, profile_id = None):
+        return self.setProfileIntValue('snapshots.scan_cache.max_changes', value, profile_id)
+
+    def scanCacheFullDays(self, profile_id = None):
+        #?Take a snapshot with a full rsync run after this many days even if
+        #?the cache shows only few changes.;1-365
+        return self.profileIntValue('snapshots.scan_cache.full_days', 7, profile_id)
+
+    def setScanCacheFullDays(self, value, profile_id = None):
+        return self.setProfileIntValue('snapshots.scan_cache.full_days', value, profile_id)
+
+    def copyEngine(self, profile_id = None):
+        #?Program which copies the files in mode 'local'. 'python' hard links
+        #?unchanged files and copies changed files (with reflinks if
+        #?possible) without rsync. rsync is used anyway for options 'python'
+        #?doesn't support.;rsync|python
+        return self.profileStrValue('snapshots.copy_engine.value', 'rsync', profile_id)
+
+    def setCopyEngine(self, value, profile_id = None):
+        return self.setProfileStrValue('snapshots.copy_engine.value', value, profile_id)
+
+    def copyEngineWorkers(self, profile_id = None):
+        #?Number of files copied in parallel by copy engine 'python'.;1-99
+        return self.profileIntValue('snapshots.copy_engine.workers', 4, profile_id)
+
+    def setCopyEngineWorkers(self, value, profile_id = None):
+        return self.setProfileIntValue('snapshots.copy_engine.workers', value, profile_id)
+
     def globalFlock(self):
         #?Prevent multiple snapshots (from different profiles or users) to be run at the same time
         return self.boolValue('global.use_flock', False)
@@ -1289,6 +1403,35 @@ class Config(configfile.ConfigFileWithProfiles):
     def setGlobalFlock(self, value):
         self.setBoolValue('global.use_flock', value)
 
+    def hashAlgorithm(self):
+        #?Algorithm for comparing file content in deep checks. blake2b and
+        #?sha1 are faster than md5 on most 64 bit CPUs.;md5|sha1|blake2b
+        return self.strValue('global.hash.algorithm', 'md5')
+
+    def setHashAlgorithm(self, value):
+        self.setStrValue('global.hash.algorithm', value)
+
+    def hashWorkers(self):
+        #?Number of files hashed in parallel in deep checks.;1-99
+        return self.intValue('global.hash.workers', 4)
+
+    def setHashWorkers(self, value):
+        self.setIntValue('global.hash.workers', value)
+
+    def hashCacheSize(self):
+        #?Maximum number of file hashes kept in the hash cache. The least
+        #?recently used are removed first.
+        return self.intValue('global.hash.cache_size', 100000)
+
+    def setHashCacheSize(self, value):
+        self.setIntValue('global.hash.cache_size', value)
+
+    def hashCacheFile(self):
+        return os.path.join(self._LOCAL_DATA_FOLDER, 'hashcache.db')
+
+    def dedupIndexFile(self):
+        return os.path.join(self._LOCAL_DATA_FOLDER, 'dedupindex.db')
+
     def appInstanceFile(self):
         return os.path.join(self._LOCAL_DATA_FOLDER, 'app.lock')
 
@@ -1313,11 +1456,20 @@ class Config(configfile.ConfigFileWithProfiles):
         return os.path.join(self._LOCAL_DATA_FOLDER,
                             "worker%s.progress" % self.fileId(profile_id))
 
+    def takeSnapshotFilesFromFile(self, profile_id = None):
+        return os.path.join(self._LOCAL_DATA_FOLDER,
+                            "worker%s.files" % self.fileId(profile_id))
+
     def takeSnapshotInstanceFile(self, profile_id=None):
         return os.path.join(
             self._LOCAL_DATA_FOLDER,
             "worker%s.lock" % self.fileId(profile_id))
 
+    def emptyTrashInstanceFile(self, profile_id=None):
+        return os.path.join(
+            self._LOCAL_DATA_FOLDER,
+            "trash%s.lock" % self.fileId(profile_id))
+
     def takeSnapshotUserCallback(self):
         return os.path.join(self._LOCAL_CONFIG_FOLDER, "user-callback")
 
@@ -1363,6 +1515,21 @@ class Config(configfile.ConfigFileWithProfiles):
     def udevRulesPath(self):
         return os.path.join('/etc/udev/rules.d', '99-backintime-%s.rules' % getpass.getuser())
 
+    def searchIndexFile(self, profile_id=None):
+        return os.path.join(
+            self._LOCAL_DATA_FOLDER,
+            "searchindex%s.db" % self.fileId(profile_id))
+
+    def snapshotCatalogFile(self, profile_id=None):
+        return os.path.join(
+            self._LOCAL_DATA_FOLDER,
+            "catalog%s.json" % self.fileId(profile_id))
+
+    def scanCacheFile(self, profile_id=None):
+        return os.path.join(
+            self._LOCAL_DATA_FOLDER,
+            "scancache%s.db" % self.fileId(profile_id))
+
     def restoreLogFile(self, profile_id = None):
         return os.path.join(self._LOCAL_DATA_FOLDER, "restore_%s.log" % self.fileId(profile_id))
 
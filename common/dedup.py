@@ -0,0 +1,354 @@
+# Back In Time
+# Copyright (C) 2008-2022 Oprea Dan, Bart de Koning, Richard Bailey,
+# Germar Reitze
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""Deduplication of files in snapshots by content.
+
+rsync ``--link-dest`` only hard links a file to the same path in the
+previous snapshot. Moved or renamed files and identical files of other
+profiles are stored again. :py:class:`DedupIndex` keeps every inode in the
+snapshots on the destination and replaces new files with a hard link to an
+existing inode with the same content.
+
+Inodes are grouped by size. A file is only hashed if there is another inode
+of the same size, so most files are never read. Only inodes with the same
+mode, owner, group and mtime are linked. Hard linked files share all of
+these, so linking them doesn't change anything a restore takes from the
+snapshot. Owner, group and permissions in ``fileinfo`` are stored by path
+and stay untouched.
+
+A digest is only trusted as long as the inode keeps the mtime and ctime
+it had when it was hashed. Adding or removing a hard link, e.g. by rsync
+``--link-dest`` in every new snapshot, changes the ctime too. So a changed
+ctime is accepted if the number of links changed as well. Otherwise the
+inode is hashed again.
+
+The index is a SQLite database in the local data folder.
+"""
+import os
+import stat
+import sqlite3
+
+import logger
+import tools
+
+# hash of file content. Strong enough to link files without comparing them
+HASH_ALGORITHM = 'blake2b'
+
+# smaller files are not worth a hash and a database row
+MIN_SIZE = 1024
+
+
+class DedupIndex:
+    """
+    Index of all inodes in the snapshots on a destination.
+
+    Args:
+        filename (str):     database file
+    """
+    VERSION = 3
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._db = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def open(self):
+        """
+        Open the database and create it if it doesn't exist or has an other
+        version.
+
+        Raises:
+            sqlite3.Error:  if the database can't be opened
+        """
+        self._db = sqlite3.connect(self.filename)
+        db = self._db
+        db.execute('CREATE TABLE IF NOT EXISTS meta '
+                   '(key TEXT PRIMARY KEY, value TEXT)')
+        row = db.execute("SELECT value FROM meta WHERE key = 'version'"
+                         ).fetchone()
+
+        if row is None or row[0] != str(self.VERSION):
+            logger.debug(f'Create new dedup index {self.filename}', self)
+            db.executescript('''
+                DROP TABLE IF EXISTS inodes;
+                DROP TABLE IF EXISTS roots;
+                DELETE FROM meta;
+                CREATE TABLE inodes (dev INTEGER NOT NULL,
+                                     ino INTEGER NOT NULL,
+                                     size INTEGER NOT NULL,
+                                     mtime INTEGER NOT NULL,
+                                     ctime INTEGER NOT NULL,
+                                     nlink INTEGER NOT NULL,
+                                     path BLOB NOT NULL,
+                                     digest TEXT,
+                                     PRIMARY KEY (dev, ino));
+                CREATE INDEX inodes_size ON inodes (dev, size);
+                CREATE TABLE roots (path BLOB PRIMARY KEY);
+            ''')
+            db.execute("INSERT INTO meta VALUES ('version', ?)",
+                       (str(self.VERSION),))
+            db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.commit()
+            self._db.close()
+            self._db = None
+
+    def isIndexed(self, root):
+        """
+        Check if the snapshot folder ``root`` was added already.
+
+        Args:
+            root (str): full path of the ``backup`` folder of a snapshot
+
+        Returns:
+            bool:       ``True`` if ``root`` is in the index
+        """
+        return self._db.execute('SELECT 1 FROM roots WHERE path = ?',
+                                (os.fsencode(root),)).fetchone() is not None
+
+    def prune(self):
+        """
+        Forget snapshots which don't exist anymore. Their inodes stay until a
+        lookup finds the stored path gone.
+        """
+        roots = [path for path, in
+                 self._db.execute('SELECT path FROM roots').fetchall()
+                 if not os.path.isdir(path)]
+        self._db.executemany('DELETE FROM roots WHERE path = ?',
+                             [(path,) for path in roots])
+        self._db.commit()
+
+    def add(self, root):
+        """
+        Add all inodes of an existing snapshot without hashing them.
+
+        Args:
+            root (str): full path of the ``backup`` folder of a snapshot
+        """
+        self._db.executemany(
+            'INSERT OR IGNORE INTO inodes VALUES (?, ?, ?, ?, ?, ?, ?, NULL)',
+            ((st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns,
+              st.st_ctime_ns, st.st_nlink, path)
+             for path, st in self._walk(root)))
+        self._setIndexed(root)
+
+    def _setIndexed(self, root):
+        self._db.execute('INSERT OR IGNORE INTO roots VALUES (?)',
+                         (os.fsencode(root),))
+        self._db.commit()
+
+    def _walk(self, root):
+        """
+        Iterate over all regular files of at least :py:data:`MIN_SIZE`
+        bytes below ``root``.
+
+        Yields:
+            tuple:  (full path as :py:class:`bytes`, stat result)
+        """
+        stack = [os.fsencode(root)]
+
+        while stack:
+            folder = stack.pop()
+
+            try:
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+
+                        elif entry.is_file(follow_symlinks=False):
+                            st = entry.stat(follow_symlinks=False)
+                            if st.st_size >= MIN_SIZE:
+                                yield entry.path, st
+
+            except OSError as e:
+                logger.error(f'Failed to list {folder}: {str(e)}', self)
+
+    def deduplicate(self, root, budget=0, callback=None):
+        """
+        Replace files in the new snapshot ``root`` with hard links to
+        identical inodes in the index and add the remaining inodes.
+
+        Args:
+            root (str):         full path of the ``backup`` folder of the
+                                new snapshot
+            budget (int):       maximal number of bytes read for hashing.
+                                ``0`` for no limit. Files are only added
+                                to the index without hashing after the
+                                budget is spent
+            callback (method):  called with the path of every linked file
+
+        Returns:
+            tuple:              (linked files, saved bytes, hashed bytes)
+        """
+        linked = saved = hashed = 0
+        db = self._db
+
+        for path, st in self._walk(root):
+            dev, ino, size = st.st_dev, st.st_ino, st.st_size
+
+            # unchanged file hard linked by rsync --link-dest
+            row = db.execute('SELECT mtime FROM inodes '
+                             'WHERE dev = ? AND ino = ?', (dev, ino)).fetchone()
+            if row is not None:
+                if row[0] == st.st_mtime_ns:
+                    continue
+
+                # inode number reused by a new file
+                db.execute('DELETE FROM inodes WHERE dev = ? AND ino = ?',
+                           (dev, ino))
+
+            candidates = db.execute(
+                'SELECT ino, mtime, ctime, nlink, path, digest FROM inodes '
+                'WHERE dev = ? AND size = ?', (dev, size)).fetchall()
+
+            digest = None
+            if candidates and (not budget or hashed + size <= budget):
+                digest = self._hash(path)
+                hashed += size
+
+            done = False
+            for cand_ino, cand_mtime, cand_ctime, cand_nlink, cand_path, \
+                    cand_digest in candidates:
+                if digest is None:
+                    break
+
+                cand_st = tools.lstatOrNone(cand_path)
+                if (cand_st is None
+                        or cand_st.st_ino != cand_ino
+                        or cand_st.st_mtime_ns != cand_mtime):
+                    # removed with its snapshot or replaced by another file
+                    db.execute('DELETE FROM inodes WHERE dev = ? AND ino = ?',
+                               (dev, cand_ino))
+                    continue
+
+                if not _sameMetadata(st, cand_st):
+                    continue
+
+                if (cand_st.st_ctime_ns != cand_ctime
+                        and cand_st.st_nlink == cand_nlink):
+                    # changed since it was hashed. A new or removed hard
+                    # link changes the ctime too, but also the link count.
+                    # Hash it again instead of forgetting the inode
+                    cand_digest = None
+
+                if cand_digest is None:
+                    if budget and hashed + size > budget:
+                        break
+
+                    cand_digest = self._hash(cand_path)
+                    hashed += size
+                    db.execute('UPDATE inodes SET digest = ?, ctime = ?, '
+                               'nlink = ? WHERE dev = ? AND ino = ?',
+                               (cand_digest, cand_st.st_ctime_ns,
+                                cand_st.st_nlink, dev, cand_ino))
+
+                if cand_digest == digest and self._link(cand_path, path):
+                    # the new hard link changed the ctime
+                    cand_st = tools.lstatOrNone(cand_path)
+                    if cand_st is not None:
+                        db.execute('UPDATE inodes SET ctime = ?, nlink = ? '
+                                   'WHERE dev = ? AND ino = ?',
+                                   (cand_st.st_ctime_ns, cand_st.st_nlink,
+                                    dev, cand_ino))
+                    linked += 1
+                    saved += size
+                    if callback:
+                        callback(path)
+                    done = True
+                    break
+
+            if not done:
+                # no identical inode (or out of budget): keep the new one
+                db.execute('INSERT OR REPLACE INTO inodes VALUES '
+                           '(?, ?, ?, ?, ?, ?, ?, ?)',
+                           (dev, ino, size, st.st_mtime_ns, st.st_ctime_ns,
+                            st.st_nlink, path, digest))
+
+        self._setIndexed(root)
+        logger.info(f'Deduplicated {linked} files, saved {saved} bytes, '
+                    f'hashed {hashed} bytes', self)
+
+        return linked, saved, hashed
+
+    def _hash(self, path):
+        try:
+            return tools.hashsum(path, HASH_ALGORITHM)
+        except OSError as e:
+            logger.error(f'Failed to hash {path}: {str(e)}', self)
+            return None
+
+    def _link(self, source, path):
+        """
+        Replace ``path`` with a hard link to ``source``. The parent folder
+        keeps its permissions and modification time.
+
+        Returns:
+            bool:   ``True`` if ``path`` was replaced
+        """
+        folder = os.path.dirname(path)
+        tmp = os.path.join(folder, b'.bit-dedup-%d' % os.getpid())
+        folder_st = os.lstat(folder)
+        writable = folder_st.st_mode & stat.S_IWUSR
+        # restore only what was actually changed
+        chmodded = modified = False
+
+        try:
+            if not writable:
+                os.chmod(folder, folder_st.st_mode | stat.S_IWUSR)
+                chmodded = True
+
+            os.link(source, tmp)
+            modified = True
+            os.rename(tmp, path)
+            return True
+
+        except OSError as e:
+            # e.g. EMLINK if source has too many links already
+            logger.debug(f'Failed to link {path} to {source}: {str(e)}',
+                         self)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return False
+
+        finally:
+            if chmodded:
+                os.chmod(folder, folder_st.st_mode)
+            if modified:
+                os.utime(folder, ns=(folder_st.st_atime_ns,
+                                     folder_st.st_mtime_ns))
+
+
+def _sameMetadata(st1, st2):
+    """
+    Check if two files can share one inode without changing what would be
+    restored.
+    """
+    return (st1.st_mode == st2.st_mode
+            and st1.st_uid == st2.st_uid
+            and st1.st_gid == st2.st_gid
+            and st1.st_mtime_ns == st2.st_mtime_ns)
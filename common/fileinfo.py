@@ -0,0 +1,394 @@
+# Back In Time
+# Copyright (C) 2008-2022 Oprea Dan, Bart de Koning, Richard Bailey,
+# Germar Reitze
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""Indexed file format for the permissions stored with each snapshot.
+
+The old format ``fileinfo.bz2`` is one bzip2 stream which has to be read
+completely even to restore a single file. This format keeps the entries
+sorted by path in independently compressed blocks. An index of the first
+path of every block makes it possible to read only the blocks of the
+requested paths and subtrees.
+
+Layout::
+
+    MAGIC varint(VERSION)
+    block ...                   zlib compressed entries
+    index                       zlib compressed block index
+    uint64(index offset) MAGIC
+
+Within a block every path is stored as the number of leading bytes shared
+with the previous path followed by the remaining bytes.
+"""
+import os
+import bisect
+import struct
+import zlib
+
+MAGIC = b'BiTfinfo'
+VERSION = 1
+
+# uncompressed size of one block in bytes
+BLOCK_SIZE = 64 * 1024
+
+_TRAILER = struct.Struct('<Q')
+
+
+def _writeVarint(buf, value):
+    while value > 0x7f:
+        buf.append(value & 0x7f | 0x80)
+        value >>= 7
+
+    buf.append(value)
+
+
+def _readVarint(data, pos):
+    result = 0
+    shift = 0
+
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+
+        if byte < 0x80:
+            return result, pos
+
+        shift += 7
+
+
+def _writeBytes(buf, value):
+    _writeVarint(buf, len(value))
+    buf += value
+
+
+def _readBytes(data, pos):
+    length, pos = _readVarint(data, pos)
+    end = pos + length
+
+    return data[pos:end], end
+
+
+class FileInfoWriter:
+    """
+    Write entries into ``filename`` while they are collected. Entries need
+    to be added sorted by path. Only the current block is kept in memory.
+
+    Args:
+        filename (str):     file to write
+
+    Raises:
+        OSError:            if the file can't be created
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = open(filename, 'wb')
+        self._index = bytearray()
+        self._blocks = 0
+        self._block = bytearray()
+        self._first = None
+        self._last = None
+        self._count = 0
+
+        header = bytearray(MAGIC)
+        _writeVarint(header, VERSION)
+        self._file.write(header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+    def add(self, path, info):
+        """
+        Add an entry.
+
+        Args:
+            path (bytes):   full path, greater than the path added before
+            info (tuple):   (permission, user, group)
+
+        Raises:
+            ValueError:     if ``path`` is not sorted
+        """
+        if self._last is not None and path <= self._last:
+            raise ValueError(f'{path} added after {self._last}')
+
+        # the first path of a block is stored completely
+        if self._first is None:
+            self._first = path
+            prev = b''
+        else:
+            prev = self._last
+
+        shared = 0
+        limit = min(len(prev), len(path))
+        while shared < limit and prev[shared] == path[shared]:
+            shared += 1
+
+        mode, user, group = info
+        block = self._block
+        _writeVarint(block, shared)
+        _writeBytes(block, path[shared:])
+        _writeVarint(block, mode)
+        _writeBytes(block, user)
+        _writeBytes(block, group)
+        self._last = path
+        self._count += 1
+
+        if len(block) >= BLOCK_SIZE:
+            self._flush()
+
+    def _flush(self):
+        _writeBytes(self._index, self._first)
+        _writeVarint(self._index, self._file.tell())
+        data = zlib.compress(self._block)
+        _writeVarint(self._index, len(data))
+        _writeVarint(self._index, self._count)
+        self._file.write(data)
+
+        self._blocks += 1
+        self._block = bytearray()
+        self._first = None
+        self._count = 0
+
+    def close(self):
+        """
+        Write the last block and the index and close the file.
+        """
+        if self._count:
+            self._flush()
+
+        offset = self._file.tell()
+        head = bytearray()
+        _writeVarint(head, self._blocks)
+        self._file.write(zlib.compress(bytes(head) + self._index))
+        self._file.write(_TRAILER.pack(offset) + MAGIC)
+        self._file.close()
+
+
+def write(filename, fileinfo):
+    """
+    Write ``fileinfo`` to ``filename``.
+
+    Args:
+        filename (str):     file to write
+        fileinfo (dict):    dict of: {path: (permission, user, group)}
+                            with :py:class:`bytes` path, user and group
+    """
+    with FileInfoWriter(filename) as writer:
+        for path in sorted(fileinfo):
+            writer.add(path, fileinfo[path])
+
+
+class FileInfoReader:
+    """
+    Read entries from a file written with :py:func:`write`. Only the block
+    index is loaded on creation. Blocks are read when needed.
+
+    Args:
+        filename (str):     file to read
+
+    Raises:
+        OSError:            if the file can't be read
+        ValueError:         if the file is not in this format or broken
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = open(filename, 'rb')
+        self._block = (None, [])
+
+        try:
+            self._readIndex()
+
+        except (IndexError, zlib.error, struct.error) as e:
+            self.close()
+            raise ValueError(f'Broken file {filename}: {str(e)}') from e
+
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def _readIndex(self):
+        f = self._file
+
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{self.filename} is not a fileinfo index')
+
+        f.seek(-(_TRAILER.size + len(MAGIC)), os.SEEK_END)
+        trailer = f.read()
+        if trailer[_TRAILER.size:] != MAGIC:
+            raise ValueError(f'{self.filename} is truncated')
+
+        offset, = _TRAILER.unpack(trailer[:_TRAILER.size])
+        end = f.tell() - len(trailer)
+        f.seek(offset)
+        data = zlib.decompress(f.read(end - offset))
+
+        blocks, pos = _readVarint(data, 0)
+        self._first = []
+        self._blocks = []
+        self.count = 0
+
+        for _ in range(blocks):
+            first, pos = _readBytes(data, pos)
+            block_offset, pos = _readVarint(data, pos)
+            length, pos = _readVarint(data, pos)
+            count, pos = _readVarint(data, pos)
+            self._first.append(first)
+            self._blocks.append((block_offset, length))
+            self.count += count
+
+    def _readBlock(self, number):
+        """
+        Decode block ``number``. The last decoded block is cached.
+
+        Returns:
+            list:   sorted (path, (permission, user, group)) tuples
+        """
+        if self._block[0] == number:
+            return self._block[1]
+
+        offset, length = self._blocks[number]
+        self._file.seek(offset)
+        data = zlib.decompress(self._file.read(length))
+
+        entries = []
+        pos = 0
+        path = b''
+
+        while pos < len(data):
+            shared, pos = _readVarint(data, pos)
+            suffix, pos = _readBytes(data, pos)
+            mode, pos = _readVarint(data, pos)
+            user, pos = _readBytes(data, pos)
+            group, pos = _readBytes(data, pos)
+            path = path[:shared] + suffix
+            entries.append((path, (mode, user, group)))
+
+        self._block = (number, entries)
+
+        return entries
+
+    def range(self, start, stop=None):
+        """
+        Iterate over all entries with ``start <= path < stop``.
+
+        Args:
+            start (bytes):  first path
+            stop (bytes):   end of the range or ``None`` for all
+                            following paths
+
+        Yields:
+            tuple:          (path, (permission, user, group))
+        """
+        number = max(bisect.bisect_right(self._first, start) - 1, 0)
+
+        while number < len(self._blocks):
+            if stop is not None and self._first[number] >= stop:
+                return
+
+            for path, info in self._readBlock(number):
+                if path < start:
+                    continue
+
+                if stop is not None and path >= stop:
+                    return
+
+                yield path, info
+
+            number += 1
+
+    def items(self):
+        """
+        Iterate over all entries sorted by path.
+
+        Yields:
+            tuple:          (path, (permission, user, group))
+        """
+        return self.range(b'')
+
+    def get(self, path):
+        """
+        Entry of ``path``.
+
+        Args:
+            path (bytes):   full path
+
+        Returns:
+            tuple:          (permission, user, group) or ``None``
+        """
+        for _path, info in self.range(path, path + b'\0'):
+            return info
+
+        return None
+
+    def lookup(self):
+        """
+        Create a function which returns the entry of a path like
+        :py:func:`get`. The paths need to be requested in ascending order.
+        All blocks are read only once.
+
+        Returns:
+            method:     called with a full path (bytes), returns
+                        (permission, user, group) or ``None``
+        """
+        items = self.items()
+        current = next(items, None)
+
+        def get(path):
+            nonlocal current
+
+            while current is not None and current[0] < path:
+                current = next(items, None)
+
+            if current is not None and current[0] == path:
+                return current[1]
+
+            return None
+
+        return get
+
+    def subtree(self, path):
+        """
+        Iterate over ``path`` and everything below it.
+
+        Args:
+            path (bytes):   full path of a folder or file
+
+        Yields:
+            tuple:          (path, (permission, user, group))
+        """
+        path = path.rstrip(b'/')
+
+        info = self.get(path)
+        if info is not None:
+            yield path, info
+
+        # b'0' follows b'/' so this is everything starting with path + b'/'
+        yield from self.range(path + b'/', path + b'0')
@@ -0,0 +1,192 @@
+# Back In Time
+# Copyright (C) 2008-2022 Oprea Dan, Bart de Koning, Richard Bailey,
+# Germar Reitze
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""Persistent cache of file content hashes.
+
+All versions of a file which didn't change between snapshots are hard links
+to the same inode. So a hash is stored once per inode, keyed by
+``(st_dev, st_ino, st_size, st_mtime_ns)`` and the algorithm. A file which
+was modified in place gets a new size or mtime and therefore a new key.
+
+The cache is a SQLite database in the local data folder. The least recently
+used entries are removed on :py:func:`HashCache.close` if there are more
+than ``max_entries``.
+"""
+import os
+import time
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import logger
+import tools
+
+
+class HashCache:
+    """
+    Hashes of files, computed only if they are not cached yet.
+
+    Args:
+        filename (str):     database file or ``None`` for an in-memory
+                            cache which is not persistent
+        algorithm (str):    name of a :py:mod:`hashlib` algorithm
+        max_entries (int):  number of entries kept on :py:func:`close`
+        workers (int):      number of files hashed in parallel by
+                            :py:func:`hashMany`
+    """
+    def __init__(self, filename=None, algorithm='md5', max_entries=100000,
+                 workers=1):
+        self.filename = filename
+        self.algorithm = algorithm
+        self.maxEntries = max_entries
+        self.workers = workers
+        self._now = int(time.time())
+        self._db = sqlite3.connect(filename or ':memory:')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS hashes (
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                algorithm TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                used INTEGER NOT NULL,
+                PRIMARY KEY (dev, ino, size, mtime_ns, algorithm))
+        ''')
+
+    @classmethod
+    def fromConfig(cls, cfg):
+        """
+        Open the persistent cache with the settings in ``cfg``.
+
+        Args:
+            cfg (config.Config):    current config
+
+        Returns:
+            HashCache:              new instance
+        """
+        return cls(cfg.hashCacheFile(),
+                   algorithm=cfg.hashAlgorithm(),
+                   max_entries=cfg.hashCacheSize(),
+                   workers=cfg.hashWorkers())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Remove the least recently used entries and close the database.
+        """
+        if self._db is None:
+            return
+
+        self._db.execute('''
+            DELETE FROM hashes WHERE rowid IN (
+                SELECT rowid FROM hashes ORDER BY used DESC
+                LIMIT -1 OFFSET ?)
+        ''', (self.maxEntries,))
+        self._db.commit()
+        self._db.close()
+        self._db = None
+
+    def _key(self, st):
+        return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns,
+                self.algorithm)
+
+    def _get(self, key):
+        row = self._db.execute('''
+            SELECT digest FROM hashes WHERE dev = ? AND ino = ? AND size = ?
+                AND mtime_ns = ? AND algorithm = ?
+        ''', key).fetchone()
+
+        if row is None:
+            return None
+
+        self._db.execute('''
+            UPDATE hashes SET used = ? WHERE dev = ? AND ino = ? AND size = ?
+                AND mtime_ns = ? AND algorithm = ?
+        ''', (self._now,) + key)
+
+        return row[0]
+
+    def _set(self, key, digest):
+        self._db.execute('INSERT OR REPLACE INTO hashes VALUES '
+                         '(?, ?, ?, ?, ?, ?, ?)', key + (digest, self._now))
+
+    def hash(self, path, st=None):
+        """
+        Hash of file ``path``.
+
+        Args:
+            path (str):                 full path to file
+            st (os.stat_result):        stat of ``path`` or ``None``
+
+        Returns:
+            str:                        hex digest
+        """
+        if st is None:
+            st = os.stat(path)
+
+        key = self._key(st)
+        digest = self._get(key)
+
+        if digest is None:
+            digest = tools.hashsum(path, self.algorithm)
+            self._set(key, digest)
+
+        return digest
+
+    def hashMany(self, files, cancel=None):
+        """
+        Hash all files which are not cached yet with :py:attr:`workers`
+        threads. Every inode is read only once.
+
+        Args:
+            files (list):   (path, :py:class:`os.stat_result`) tuples
+            cancel (method): called before every file. Files which are not
+                            hashed yet are skipped once it returns ``True``
+
+        Returns:
+            int:            number of hashed files
+        """
+        missing = {}
+        for path, st in files:
+            key = self._key(st)
+            if key not in missing and self._get(key) is None:
+                missing[key] = path
+
+        def hashsum(path):
+            if cancel is not None and cancel():
+                return None
+
+            try:
+                return tools.hashsum(path, self.algorithm)
+            except OSError as e:
+                logger.error(f'Failed to hash {path}: {str(e)}', self)
+                return None
+
+        with ThreadPoolExecutor(max_workers=max(self.workers, 1)) as executor:
+            for key, digest in zip(missing,
+                                   executor.map(hashsum, missing.values())):
+                if digest is not None:
+                    self._set(key, digest)
+
+        self._db.commit()
+
+        return len(missing)
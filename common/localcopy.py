@@ -0,0 +1,529 @@
+# Back In Time
+# Copyright (C) 2008-2022 Oprea Dan, Bart de Koning, Richard Bailey,
+# Germar Reitze
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""Copy engine for snapshots on local file systems without rsync.
+
+:py:class:`LocalCopy` creates the same snapshot layout as
+``rsync --link-dest``: files which didn't change since the previous snapshot
+are hard linked to it, all others are copied. Content is cloned with
+``FICLONE`` (reflink) where the file system supports it, otherwise copied
+in the kernel with :py:func:`os.copy_file_range`. Files are copied by a
+thread pool.
+
+Every created or updated entry is reported as :py:class:`Change` with the
+flags rsync's ``--itemize-changes`` would print, so the change manifest and
+the permission backup don't see a difference between both engines.
+"""
+import os
+import stat
+import errno
+import fcntl
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+import logger
+import tools
+from scancache import ExcludeFilter, includeRoots, parentFolders
+
+# ioctl to share all data blocks of a file (linux/fs.h)
+FICLONE = 0x40049409
+
+# chunk size for os.copy_file_range
+COPY_CHUNK = 64 * 1024 * 1024
+
+# errors if reflink or copy_file_range is not supported between two files
+_UNSUPPORTED = (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL,
+                errno.ENOSYS)
+
+Change = collections.namedtuple('Change', ('flags', 'path', 'size', 'mtime'))
+Change.__doc__ = """
+Entry created or updated in the snapshot.
+
+Attributes:
+    flags (str):    flags like ``rsync --itemize-changes``
+    path (bytes):   path relative to the source root
+    size (int):     size in bytes
+    mtime (int):    modification time in seconds since epoch
+"""
+
+
+class LocalCopy:
+    """
+    Take a snapshot of local include folders into a local destination.
+
+    Args:
+        include (list):         (path, type) tuples like
+                                :py:func:`config.Config.include`
+        dest (str):             empty backup folder of the new snapshot
+        link_dest (str):        backup folder of the previous snapshot or
+                                ``None``
+        exclude (ExcludeFilter):excluded paths
+        workers (int):          number of files copied in parallel
+        one_file_system (bool): don't enter folders on other file systems
+        max_size (int):         skip files larger than this many bytes. ``0``
+                                for no limit
+    """
+    def __init__(self, include, dest, link_dest=None, exclude=None,
+                 workers=4, one_file_system=False, max_size=0):
+        self.include = include
+        self.dest = os.fsencode(dest)
+        self.linkDest = os.fsencode(link_dest) if link_dest else None
+        self.exclude = exclude or ExcludeFilter([])
+        self.workers = workers
+        self.oneFileSystem = one_file_system
+        self.maxSize = max_size
+        self.isRoot = os.geteuid() == 0
+
+        # statistics
+        self.linked = 0
+        self.copied = 0
+        self.copiedBytes = 0
+
+        # error messages like 'copy /foo failed: ...'
+        self.errors = []
+
+        # source paths which disappeared while they were copied
+        self.vanished = []
+
+        # guards statistics and errors updated by the worker threads
+        self._lock = threading.Lock()
+        self._callback = None
+        self._folders = []
+        self._created = set()
+        self._hardlinks = {}
+        self._pendingLinks = []
+        self._futures = []
+        self._reflink = True
+        self._copyRange = hasattr(os, 'copy_file_range')
+
+    def run(self, callback=None):
+        """
+        Copy all include folders.
+
+        Args:
+            callback (method):  called with every :py:class:`Change`
+
+        Returns:
+            bool:               ``True`` if there were no errors
+        """
+        self._callback = callback
+        with ThreadPoolExecutor(max_workers=max(self.workers, 1)) as executor:
+            self._executor = executor
+
+            # nested items are copied with their parent folder
+            for root, isFolder in includeRoots(self.include):
+                self._copyRoot(root, isFolder)
+
+            for future in self._futures:
+                future.result()
+
+        for source, path in self._pendingLinks:
+            self._run('link', path, os.link, source, path,
+                      follow_symlinks=False)
+
+        # Children first, so their creation doesn't change the times again.
+        # Folders get their exact mode only now, like with rsync they are
+        # writable for their owner while they are filled.
+        for path, st in reversed(self._folders):
+            self._setAttributes(path, st)
+
+        return not self.errors
+
+    def _run(self, action, path, func, *args, **kwargs):
+        try:
+            func(*args, **kwargs)
+            return True
+
+        except OSError as e:
+            msg = f'{action} {os.fsdecode(path)} failed: {e.strerror} ' \
+                  f'({e.errno})'
+            logger.error(msg, self)
+            with self._lock:
+                self.errors.append(msg)
+            return False
+
+    def _report(self, flags, rel, st):
+        if self._callback is not None:
+            self._callback(Change(flags, rel, st.st_size, int(st.st_mtime)))
+
+    def _paths(self, source):
+        rel = source.lstrip(b'/')
+        dest = os.path.join(self.dest, rel) if rel else self.dest
+        ref = None
+        if self.linkDest is not None:
+            ref = os.path.join(self.linkDest, rel) if rel else self.linkDest
+        return rel, dest, ref
+
+    def _copyRoot(self, root, isFolder):
+        # folders above the include items are copied, too
+        for parent in parentFolders(root):
+            if parent not in self._created:
+                st = tools.lstatOrNone(parent)
+                if st is None:
+                    return
+                self._folder(parent, st)
+
+        st = tools.lstatOrNone(root)
+        if st is None:
+            return
+
+        # include rules for folders come before all exclude rules
+        if not isFolder and self.exclude(root, stat.S_ISDIR(st.st_mode)):
+            return
+
+        if not stat.S_ISDIR(st.st_mode):
+            self._entry(root, st)
+        elif root not in self._created:
+            self._walk(root, st.st_dev)
+
+    def _walk(self, root, dev):
+        """
+        Copy folder ``root`` and everything below.
+        """
+        folders = [(root, tools.lstatOrNone(root))]
+
+        while folders:
+            source, st = folders.pop()
+            existed = self._folder(source, st)
+            names = set()
+
+            entries = []
+            try:
+                with os.scandir(source) as it:
+                    for entry in it:
+                        try:
+                            entries.append((entry.path, entry.name,
+                                            entry.stat(follow_symlinks=False)))
+
+                        except FileNotFoundError:
+                            self._vanished(entry.path)
+
+                        except OSError as e:
+                            self._run('stat', entry.path, self._raise, e)
+
+            except FileNotFoundError:
+                self._vanished(source)
+                continue
+
+            except OSError as e:
+                self._run('opendir', source, self._raise, e)
+                continue
+
+            for path, name, st in entries:
+                isDir = stat.S_ISDIR(st.st_mode)
+                if self.exclude(path, isDir):
+                    continue
+
+                names.add(name)
+                if not isDir:
+                    self._entry(path, st)
+                elif not self.oneFileSystem or st.st_dev == dev:
+                    folders.append((path, st))
+                else:
+                    # mount point of another file system stays empty
+                    self._folder(path, st)
+
+            # left over from an interrupted snapshot
+            if existed:
+                self._removeExtra(self._paths(source)[1], names)
+
+    @staticmethod
+    def _raise(e):
+        raise e
+
+    def _vanished(self, path):
+        # like rsync this is only a warning (exit code 24)
+        logger.warning(f'file has vanished: {os.fsdecode(path)}', self)
+        with self._lock:
+            self.vanished.append(path)
+
+    @staticmethod
+    def _removeTree(path):
+        # folders of an interrupted snapshot might be read-only already
+        if not tools.removeTree(os.fsdecode(path)):
+            raise OSError(errno.EIO, 'Failed to remove folder')
+
+    def _removeExtra(self, path, names):
+        for name in os.listdir(path):
+            if os.fsencode(name) in names:
+                continue
+
+            target = os.path.join(path, os.fsencode(name))
+            if os.path.isdir(target) and not os.path.islink(target):
+                self._run('delete', target, self._removeTree, target)
+            else:
+                self._run('delete', target, os.remove, target)
+
+    def _folder(self, source, st):
+        """
+        Create the folder for ``source``. Its attributes are set in the end.
+
+        Returns:
+            bool:   ``True`` if the folder existed already
+        """
+        rel, dest, ref = self._paths(source)
+        self._created.add(source)
+        existed = False
+
+        try:
+            os.mkdir(dest, 0o700)
+
+        except FileExistsError:
+            if os.path.isdir(dest) and not os.path.islink(dest):
+                existed = True
+                # got its exact mode already in an interrupted snapshot
+                self._run('chmod', dest, os.chmod, dest, 0o700)
+            else:
+                self._run('delete', dest, os.remove, dest)
+                self._run('mkdir', dest, os.mkdir, dest, 0o700)
+
+        except OSError as e:
+            self._run('mkdir', dest, self._raise, e)
+            return False
+
+        if rel:
+            self._folders.append((dest, st))
+            refSt = tools.lstatOrNone(ref) if ref else None
+            if refSt is None or not stat.S_ISDIR(refSt.st_mode):
+                self._report('cd+++++++++', rel + b'/', st)
+            else:
+                flags = self._itemize('.d', st, refSt)
+                if flags is not None:
+                    self._report(flags, rel + b'/', st)
+
+        return existed
+
+    def _itemize(self, prefix, st, ref):
+        """
+        Flags for an entry which changed since the previous snapshot.
+
+        Returns:
+            str:    rsync like flags or ``None`` if nothing changed
+        """
+        flags = prefix + ''.join((
+            '.',
+            's' if st.st_size != ref.st_size
+            and not stat.S_ISDIR(st.st_mode) else '.',
+            't' if st.st_mtime_ns != ref.st_mtime_ns else '.',
+            'p' if stat.S_IMODE(st.st_mode) != stat.S_IMODE(ref.st_mode)
+            and not stat.S_ISLNK(st.st_mode) else '.',
+            'o' if self.isRoot and st.st_uid != ref.st_uid else '.',
+            'g' if st.st_gid != ref.st_gid else '.',
+            '...'))
+
+        if flags[2:] == '.' * 9:
+            return None
+
+        return flags
+
+    def _unchanged(self, st, ref):
+        """
+        Check if the file in the previous snapshot can be hard linked.
+        Like rsync all preserved attributes have to be equal.
+        """
+        if ref is None or stat.S_IFMT(st.st_mode) != stat.S_IFMT(ref.st_mode):
+            return False
+
+        if stat.S_ISDIR(st.st_mode):
+            return False
+
+        return (st.st_size == ref.st_size
+                and st.st_mtime_ns == ref.st_mtime_ns
+                and st.st_mode == ref.st_mode
+                and st.st_gid == ref.st_gid
+                and (not self.isRoot or st.st_uid == ref.st_uid))
+
+    def _entry(self, source, st):
+        """
+        Hard link or copy a file, symlink or special file.
+        """
+        rel, dest, ref = self._paths(source)
+        mode = st.st_mode
+
+        if stat.S_ISREG(mode) and self.maxSize and st.st_size > self.maxSize:
+            return
+
+        if os.path.lexists(dest):
+            # left over from an interrupted snapshot
+            if os.path.isdir(dest) and not os.path.islink(dest):
+                removed = self._run('delete', dest, self._removeTree, dest)
+            else:
+                removed = self._run('delete', dest, os.remove, dest)
+            if not removed:
+                return
+
+        # hard links inside the source
+        key = (st.st_dev, st.st_ino)
+        if st.st_nlink > 1 and key in self._hardlinks:
+            first, changed = self._hardlinks[key]
+            self._pendingLinks.append((first, dest))
+            if changed:
+                self._report('hf+++++++++', rel, st)
+            return
+
+        refSt = tools.lstatOrNone(ref) if ref else None
+
+        if refSt is not None and stat.S_ISLNK(mode) \
+                and stat.S_ISLNK(refSt.st_mode):
+            try:
+                same = os.readlink(source) == os.readlink(ref)
+            except OSError:
+                same = False
+        else:
+            same = True
+
+        if same and self._unchanged(st, refSt):
+            try:
+                os.link(ref, dest, follow_symlinks=False)
+                with self._lock:
+                    self.linked += 1
+                if st.st_nlink > 1:
+                    self._hardlinks[key] = (dest, False)
+                return
+
+            except OSError as e:
+                # e.g. EMLINK, copy it instead
+                logger.debug(f'Failed to link {ref}: {str(e)}', self)
+
+        if st.st_nlink > 1:
+            self._hardlinks[key] = (dest, True)
+
+        if stat.S_ISREG(mode):
+            kind = '>f'
+            self._futures.append(
+                self._executor.submit(self._copyFile, source, dest, st))
+        elif stat.S_ISLNK(mode):
+            kind = 'cL'
+            self._run('symlink', dest, self._symlink, source, dest, st)
+        else:
+            kind = 'cD' if stat.S_ISCHR(mode) or stat.S_ISBLK(mode) \
+                else 'cS'
+            try:
+                os.mknod(dest, mode, st.st_rdev)
+
+            except PermissionError as e:
+                if kind != 'cD' or self.isRoot:
+                    self._run('mknod', dest, self._raise, e)
+                    return
+
+                # like rsync only root can create devices
+                logger.warning(f'Skip device {os.fsdecode(source)}: '
+                               f'{e.strerror}', self)
+                return
+
+            except OSError as e:
+                self._run('mknod', dest, self._raise, e)
+                return
+
+            self._setAttributes(dest, st)
+
+        if refSt is None or stat.S_IFMT(refSt.st_mode) != stat.S_IFMT(mode):
+            self._report(kind + '+' * 9, rel, st)
+        else:
+            flags = self._itemize(kind, st, refSt)
+            if not same:
+                flags = kind + 'c' + (flags or kind + '.' * 9)[3:]
+            self._report(flags or kind + '.' * 9, rel, st)
+
+    def _symlink(self, source, dest, st):
+        try:
+            target = os.readlink(source)
+        except FileNotFoundError:
+            self._vanished(source)
+            return
+
+        os.symlink(target, dest)
+        self._setAttributes(dest, st)
+
+    def _copyFile(self, source, dest, st):
+        """
+        Copy content and attributes of a regular file. Runs in a worker
+        thread.
+        """
+        try:
+            with open(source, 'rb') as fsrc, \
+                    open(os.open(dest, os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                                 0o600), 'wb') as fdst:
+                self._copyContent(fsrc.fileno(), fdst.fileno(), st.st_size)
+
+        except FileNotFoundError as e:
+            if e.filename != source:
+                self._run('copy', source, self._raise, e)
+            else:
+                self._vanished(source)
+            return
+
+        except OSError as e:
+            self._run('copy', source, self._raise, e)
+            return
+
+        with self._lock:
+            self.copied += 1
+            self.copiedBytes += st.st_size
+        self._setAttributes(dest, st)
+
+    def _copyContent(self, fsrc, fdst, size):
+        if self._reflink:
+            try:
+                fcntl.ioctl(fdst, FICLONE, fsrc)
+                return
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED:
+                    raise
+                self._reflink = False
+
+        if self._copyRange:
+            try:
+                copied = 0
+                while True:
+                    n = os.copy_file_range(fsrc, fdst, COPY_CHUNK)
+                    if n == 0:
+                        return
+                    copied += n
+
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED or copied:
+                    raise
+                self._copyRange = False
+
+        while True:
+            buf = os.read(fsrc, 1024 * 1024)
+            if not buf:
+                return
+            os.write(fdst, buf)
+
+    def _setAttributes(self, path, st):
+        """
+        Owner, group, mode and times of ``path`` like in ``st``.
+        """
+        isLink = stat.S_ISLNK(st.st_mode)
+
+        try:
+            if self.isRoot:
+                os.lchown(path, st.st_uid, st.st_gid)
+            else:
+                os.lchown(path, -1, st.st_gid)
+        except PermissionError:
+            pass
+
+        if not isLink:
+            self._run('chmod', path, os.chmod, path, stat.S_IMODE(st.st_mode))
+
+        self._run('utime', path, os.utime, path,
+                  ns=(st.st_atime_ns, st.st_mtime_ns),
+                  follow_symlinks=not isLink)
@@ -15,6 +15,8 @@
 #    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 import os
+import re
+import time
 
 import configfile
 
@@ -37,3 +39,121 @@ class ProgressFile(configfile.ConfigFile):
 
     def fileReadable(self):
         return os.access(self.filename, os.R_OK)
+
+
+class ProgressEstimator:
+    """
+    Estimate percent and ETA of an rsync run with incremental recursion.
+
+    With incremental recursion rsync's own percent only covers the part of
+    the file list which is known so far. The totals are predicted from the
+    previous snapshot instead and the ETA is blended from its duration and
+    the extrapolated runtime of this run. Once rsync reports ``to-chk`` the
+    file list is complete and rsync's percent is used as is.
+
+    Args:
+        files (int):        number of files in the previous snapshot or
+                            ``0`` if unknown
+        size (int):         bytes in the previous snapshot or ``0``
+        duration (float):   seconds rsync took for the previous snapshot or
+                            ``0``
+        start (float):      :py:func:`time.monotonic` when rsync started
+    """
+    # rsync --human-readable uses units of 1000
+    UNITS = {'K': 10**3, 'k': 10**3, 'M': 10**6, 'G': 10**9, 'T': 10**12}
+
+    # (xfr#53, ir-chk=1000/2000) or (xfr#53, to-chk=169/452)
+    reCheck = re.compile(r'(ir|to)-chk=(\d+)/(\d+)')
+
+    def __init__(self, files=0, size=0, duration=0, start=None):
+        self.files = files
+        self.size = size
+        self.duration = duration
+        self.start = time.monotonic() if start is None else start
+
+        # latest state of this run
+        self.sent = 0
+        self.checked = 0
+        self.complete = False
+        self.fraction = 0.0
+
+    @classmethod
+    def parseSize(cls, value):
+        """
+        Convert a byte count printed by rsync (e.g. ``'1,234'`` or
+        ``'517.38K'``) into an int.
+        """
+        factor = cls.UNITS.get(value[-1:], 1)
+        if factor == 1:
+            return int(value.replace(',', '').replace('.', '') or 0)
+
+        return int(float(value[:-1].replace(',', '.')) * factor)
+
+    def update(self, sent, percent, trash, now=None):
+        """
+        Add one progress line of ``rsync --info=progress2``.
+
+        Args:
+            sent (str):     bytes processed so far
+            percent (str):  rsync's percent of the known file list
+            trash (str):    rest of the line with ``ir-chk`` or ``to-chk``
+            now (float):    :py:func:`time.monotonic`
+
+        Returns:
+            tuple:          (percent as int, ETA as str ``H:MM:SS`` or
+                            ``None``)
+        """
+        if now is None:
+            now = time.monotonic()
+
+        self.sent = self.parseSize(sent)
+        rsyncFraction = int(percent or 0) / 100
+
+        m = self.reCheck.search(trash or '')
+        if m:
+            todo, known = int(m.group(2)), int(m.group(3))
+            self.checked = known - todo
+            if m.group(1) == 'to':
+                self.complete = True
+                self.files = known
+
+        if self.complete:
+            fraction = rsyncFraction
+        else:
+            fractions = []
+            if self.size:
+                fractions.append(self.sent / max(self.size, self.sent, 1))
+            if self.files and m:
+                fractions.append(self.checked / max(self.files, known, 1))
+
+            # without a previous snapshot rsync's percent is the only hint
+            fraction = min(fractions) if fractions else rsyncFraction
+
+        # never let the progress bar jump back
+        self.fraction = max(self.fraction, min(fraction, 1.0))
+
+        return int(self.fraction * 100), self.eta(now)
+
+    def eta(self, now):
+        """
+        Remaining time from the runtime so far and the duration of the
+        previous run. The latter counts less the further this run got.
+        """
+        elapsed = now - self.start
+        estimates = []
+
+        if self.fraction > 0:
+            estimates.append((self.fraction,
+                              elapsed * (1 - self.fraction) / self.fraction))
+        if self.duration:
+            estimates.append((1 - self.fraction,
+                              max(self.duration - elapsed, 0)))
+
+        weight = sum(w for w, _ in estimates)
+        if not weight:
+            return None
+
+        remaining = round(sum(w * e for w, e in estimates) / weight)
+        return '%d:%02d:%02d' % (remaining // 3600,
+                                 remaining // 60 % 60,
+                                 remaining % 60)
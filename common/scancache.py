@@ -0,0 +1,510 @@
+# Back In Time
+# Copyright (C) 2008-2022 Oprea Dan, Bart de Koning, Richard Bailey,
+# Germar Reitze
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""Persistent cache of the source file tree of a profile.
+
+:py:class:`ScanCache` keeps mode, size, mtime, ctime and inode of every file
+and folder included in the last snapshot. :py:func:`ScanCache.scan` walks
+the source with parallel :py:func:`os.scandir` calls, updates the cache and
+returns the entries which were added, changed or removed since. With a small
+change set the snapshot can be taken by rsync with ``--files-from`` instead
+of comparing the whole source tree with the previous snapshot.
+
+A folder whose mtime and ctime didn't change still has the same entries, so
+it isn't listed again. Its entries are still stat'ed because a file modified
+in place doesn't touch its folder.
+
+The cache is a SQLite database in the local data folder. All changes of a
+scan are kept in one transaction until :py:func:`ScanCache.commit` is called
+after the snapshot was taken successfully.
+"""
+import os
+import re
+import stat
+import time
+import sqlite3
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import logger
+import tools
+
+
+class ScanResult:
+    """
+    Result of :py:func:`ScanCache.scan`.
+
+    Attributes:
+        changed (list):     full paths (bytes) of new or changed entries
+        deleted (list):     full paths (bytes) of removed entries. Entries
+                            inside a removed folder are not listed
+        count (int):        number of scanned entries
+        errors (int):       number of folders which couldn't be listed.
+                            Their cached entries are kept
+        overflow (bool):    ``True`` if there were more differences than
+                            the limit given to :py:func:`ScanCache.scan`.
+                            ``changed`` and ``deleted`` are incomplete then
+    """
+    def __init__(self, limit=None):
+        self.changed = []
+        self.deleted = []
+        self.count = 0
+        self.errors = 0
+        self.overflow = False
+        self._limit = limit
+
+    def add(self, paths, path):
+        if self.overflow:
+            return
+
+        if self._limit is not None and len(self) >= self._limit:
+            self.overflow = True
+            self.changed.clear()
+            self.deleted.clear()
+            return
+
+        paths.append(path)
+
+    def __len__(self):
+        return len(self.changed) + len(self.deleted)
+
+
+class ExcludeFilter:
+    """
+    Match paths against rsync exclude patterns.
+
+    Only patterns which can be translated exactly are used. All others
+    (e.g. with rsync's ``***`` or filter rule prefixes) are ignored, so a
+    path might be scanned which rsync excludes later on but never the other
+    way around.
+
+    Args:
+        patterns (list):    rsync exclude patterns
+    """
+    def __init__(self, patterns):
+        self._patterns = []
+        # patterns which couldn't be translated
+        self.unsupported = []
+
+        for pattern in patterns:
+            compiled = self._compile(pattern)
+            if compiled is None:
+                logger.debug(f'Exclude pattern {pattern} is not used to '
+                             'skip entries while scanning', self)
+                self.unsupported.append(pattern)
+            else:
+                self._patterns.append(compiled)
+
+    @staticmethod
+    def _compile(pattern):
+        """
+        Translate an rsync pattern into a regular expression.
+
+        Returns:
+            tuple:  (compiled bytes regex, only match folders) or ``None``
+        """
+        if not pattern or '***' in pattern or '\\' in pattern \
+                or pattern[:2] in ('+ ', '- ', '! ', ': '):
+            return None
+
+        dirOnly = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        if not pattern:
+            return None
+
+        # anchored at the root or matching the tail of the path
+        if pattern.startswith('/'):
+            prefix = b'^'
+        else:
+            prefix = b'(?:^|/)'
+
+        regex = b''
+        i = 0
+        raw = os.fsencode(pattern)
+        while i < len(raw):
+            c = raw[i:i + 1]
+            if raw[i:i + 2] == b'**':
+                regex += b'.*'
+                i += 2
+                continue
+            if c == b'*':
+                regex += b'[^/]*'
+            elif c == b'?':
+                regex += b'[^/]'
+            elif c == b'[':
+                end = raw.find(b']', i + 2)
+                if end < 0:
+                    return None
+                regex += raw[i:end + 1].replace(b'[!', b'[^', 1)
+                i = end + 1
+                continue
+            else:
+                regex += re.escape(c)
+            i += 1
+
+        return re.compile(prefix + regex + b'$'), dirOnly
+
+    def __call__(self, path, isDir):
+        """
+        Check if ``path`` is excluded.
+
+        Args:
+            path (bytes):   full path
+            isDir (bool):   ``True`` if ``path`` is a folder
+
+        Returns:
+            bool:           ``True`` if ``path`` is excluded for sure
+        """
+        for regex, dirOnly in self._patterns:
+            if dirOnly and not isDir:
+                continue
+            if regex.search(path):
+                return True
+
+        return False
+
+
+def _split(path):
+    if path == b'/':
+        return b'', b'/'
+    return os.path.split(path)
+
+
+def includeRoots(include):
+    """
+    Include items which are walked on their own. Items inside an included
+    folder are walked together with that folder.
+
+    Args:
+        include (list): (path, type) tuples like
+                        :py:func:`config.Config.include`
+
+    Returns:
+        list:           (full path as :py:class:`bytes`, ``True`` if the
+                        item is a folder) tuples sorted by path
+    """
+    roots = sorted(os.fsencode(path) for path, _ in include)
+    isFolder = {os.fsencode(path): t == 0 for path, t in include}
+
+    return [(root, isFolder[root]) for root in roots
+            if not any(root.startswith(parent.rstrip(b'/') + b'/')
+                       for parent in roots
+                       if isFolder[parent] and parent != root)]
+
+
+def parentFolders(path):
+    """
+    Folders above ``path`` without ``/``. rsync syncs them together with
+    the include items.
+
+    Args:
+        path (bytes):   full path of an include item
+
+    Returns:
+        list:           full paths, the top-most folder first
+    """
+    parents = []
+    parent = os.path.dirname(path)
+    while parent != os.path.dirname(parent):
+        parents.append(parent)
+        parent = os.path.dirname(parent)
+
+    return parents[::-1]
+
+
+def _listFolder(folder, names):
+    """
+    lstat all entries of ``folder``. Runs in a worker thread.
+
+    Args:
+        folder (bytes): full path of the folder
+        names (list):   cached names of the entries or ``None`` if
+                        ``folder`` has to be listed
+
+    Returns:
+        list:           (name, stat result or ``None``) tuples or ``None``
+                        if ``folder`` can't be listed
+    """
+    if names is None:
+        try:
+            with os.scandir(folder) as it:
+                return [(entry.name, tools.lstatOrNone(entry.path)) for entry in it]
+        except OSError as e:
+            logger.error(f'Failed to list {folder}: {str(e)}')
+            return None
+
+    return [(name, tools.lstatOrNone(os.path.join(folder, name))) for name in names]
+
+
+class ScanCache:
+    """
+    Cached state of the source files of a profile.
+
+    Args:
+        filename (str):     database file
+        workers (int):      number of folders listed in parallel
+    """
+    VERSION = 1
+
+    # folders handed to the workers at once
+    BATCH = 256
+
+    def __init__(self, filename, workers=8):
+        self.filename = filename
+        self.workers = workers
+        self._db = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def open(self):
+        """
+        Open the database and create it if it doesn't exist or has an other
+        version.
+
+        Raises:
+            sqlite3.Error:  if the database can't be opened
+        """
+        self._db = sqlite3.connect(self.filename)
+        db = self._db
+        db.execute('CREATE TABLE IF NOT EXISTS meta '
+                   '(key TEXT PRIMARY KEY, value TEXT)')
+
+        if self._meta('version') != str(self.VERSION):
+            logger.debug(f'Create new scan cache {self.filename}', self)
+            db.executescript('''
+                DROP TABLE IF EXISTS entries;
+                DELETE FROM meta;
+                CREATE TABLE entries (parent BLOB NOT NULL,
+                                      name BLOB NOT NULL,
+                                      mode INTEGER NOT NULL,
+                                      size INTEGER NOT NULL,
+                                      mtime_ns INTEGER NOT NULL,
+                                      ctime_ns INTEGER NOT NULL,
+                                      ino INTEGER NOT NULL,
+                                      PRIMARY KEY (parent, name));
+            ''')
+            self._setMeta('version', str(self.VERSION))
+            db.commit()
+
+    def close(self):
+        """
+        Close the database. Changes which were not committed are lost.
+        """
+        if self._db is not None:
+            self._db.rollback()
+            self._db.close()
+            self._db = None
+
+    def _meta(self, key):
+        row = self._db.execute('SELECT value FROM meta WHERE key = ?',
+                               (key,)).fetchone()
+        return row[0] if row else None
+
+    def _setMeta(self, key, value):
+        self._db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                         (key, value))
+
+    def isValid(self, sid, fingerprint):
+        """
+        Check if the cache describes the source of snapshot ``sid``.
+
+        Args:
+            sid (str):          snapshot ID of the previous snapshot
+            fingerprint (str):  settings which changes which files are
+                                included, see :py:func:`commit`
+
+        Returns:
+            bool:               ``True`` if only the differences found by
+                                :py:func:`scan` need to be transferred
+        """
+        return (self._meta('sid') == sid
+                and self._meta('fingerprint') == fingerprint)
+
+    def lastFullScan(self):
+        """
+        Returns:
+            float:  time of the last snapshot which was taken with a full
+                    rsync run or ``0``
+        """
+        return float(self._meta('full') or 0)
+
+    def commit(self, sid, fingerprint, full):
+        """
+        Keep the changes of the last :py:func:`scan` after snapshot ``sid``
+        was taken.
+
+        Args:
+            sid (str):          snapshot ID of the new snapshot
+            fingerprint (str):  settings used for the snapshot
+            full (bool):        ``True`` if rsync compared the whole source
+        """
+        self._setMeta('sid', sid)
+        self._setMeta('fingerprint', fingerprint)
+        if full:
+            self._setMeta('full', str(time.time()))
+        self._db.commit()
+
+    def invalidate(self):
+        """
+        Drop the changes of the last :py:func:`scan` and make sure the next
+        snapshot is taken with a full rsync run.
+        """
+        self._db.rollback()
+        self._db.execute("DELETE FROM meta WHERE key = 'sid'")
+        self._db.commit()
+
+    def _cached(self, path):
+        return self._db.execute(
+            'SELECT mode, size, mtime_ns, ctime_ns, ino FROM entries '
+            'WHERE parent = ? AND name = ?', _split(path)).fetchone()
+
+    def _children(self, folder):
+        return {name: tuple(row) for name, *row in self._db.execute(
+            'SELECT name, mode, size, mtime_ns, ctime_ns, ino FROM entries '
+            'WHERE parent = ?', (folder,))}
+
+    def _update(self, path, st, cached, result):
+        """
+        Compare ``st`` with the cached entry of ``path`` and store it.
+
+        Returns:
+            bool:   ``True`` if ``path`` didn't change
+        """
+        result.count += 1
+        row = (st.st_mode, st.st_size, st.st_mtime_ns, st.st_ctime_ns,
+               st.st_ino)
+
+        if cached is not None and tuple(cached) == row:
+            return True
+
+        # a folder replaced by a file
+        if cached is not None and stat.S_ISDIR(cached[0]) \
+                and not stat.S_ISDIR(st.st_mode):
+            self._deleteChildren(path)
+
+        result.add(result.changed, path)
+        self._db.execute('INSERT OR REPLACE INTO entries VALUES '
+                         '(?, ?, ?, ?, ?, ?, ?)', _split(path) + row)
+        return False
+
+    def _delete(self, path, result):
+        result.add(result.deleted, path)
+        self._db.execute('DELETE FROM entries WHERE parent = ? AND name = ?',
+                         _split(path))
+        self._deleteChildren(path)
+
+    def _deleteChildren(self, path):
+        prefix = path.rstrip(b'/') + b'/'
+        self._db.execute('DELETE FROM entries WHERE parent = ? OR '
+                         '(parent >= ? AND parent < ?)',
+                         (path, prefix, prefix[:-1] + b'0'))
+
+    def clear(self):
+        """
+        Remove all entries, e.g. before the first scan with changed
+        settings. Part of the transaction of the next :py:func:`scan`.
+        """
+        self._db.execute('DELETE FROM entries')
+
+    def scan(self, include, exclude=None, one_file_system=False, limit=None):
+        """
+        Walk the source, update the cache and collect all differences.
+
+        Args:
+            include (list):             (path, type) tuples like
+                                        :py:func:`config.Config.include`
+            exclude (ExcludeFilter):    excluded paths
+            one_file_system (bool):     don't enter folders on other file
+                                        systems
+            limit (int):                stop collecting differences after
+                                        this many. The cache is updated
+                                        completely anyway
+
+        Returns:
+            ScanResult:                 differences since the last scan
+        """
+        result = ScanResult(limit)
+        folders = deque()
+
+        if exclude is None:
+            exclude = ExcludeFilter([])
+
+        for root, isFolder in includeRoots(include):
+            # folders above the include items are synced by rsync, too
+            for parent in parentFolders(root):
+                st = tools.lstatOrNone(parent)
+                if st is not None:
+                    self._update(parent, st, self._cached(parent), result)
+
+            # include rules for folders come before all exclude rules
+            st = tools.lstatOrNone(root)
+            cached = self._cached(root)
+            if st is None or (not isFolder
+                              and exclude(root, stat.S_ISDIR(st.st_mode))):
+                if cached is not None:
+                    self._delete(root, result)
+                continue
+
+            unchanged = self._update(root, st, cached, result)
+            if isFolder and stat.S_ISDIR(st.st_mode):
+                folders.append((root, st.st_dev, unchanged))
+
+        with ThreadPoolExecutor(max_workers=max(self.workers, 1)) as executor:
+            while folders:
+                batch = [folders.popleft()
+                         for _ in range(min(self.BATCH, len(folders)))]
+                children = [self._children(folder) for folder, *_ in batch]
+                names = [list(cached) if unchanged else None
+                         for (_, _, unchanged), cached
+                         in zip(batch, children)]
+
+                for (folder, dev, _), cached, entries in zip(
+                        batch, children,
+                        executor.map(_listFolder,
+                                     [folder for folder, *_ in batch],
+                                     names)):
+                    if entries is None:
+                        # list it again next time
+                        result.errors += 1
+                        self._db.execute('UPDATE entries SET ctime_ns = -1 '
+                                         'WHERE parent = ? AND name = ?',
+                                         _split(folder))
+                        continue
+
+                    for name, st in entries:
+                        path = os.path.join(folder, name)
+                        isDir = st is not None and stat.S_ISDIR(st.st_mode)
+
+                        if st is None or exclude(path, isDir):
+                            continue
+
+                        unchanged = self._update(
+                            path, st, cached.pop(name, None), result)
+
+                        if isDir and (not one_file_system
+                                      or st.st_dev == dev):
+                            folders.append((path, dev, unchanged))
+
+                    for name in cached:
+                        self._delete(os.path.join(folder, name), result)
+
+        return result
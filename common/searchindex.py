@@ -0,0 +1,322 @@
+# Back In Time
+# Copyright (C) 2008-2022 Oprea Dan, Bart de Koning, Richard Bailey,
+# Germar Reitze
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""Index of the file paths in all snapshots of a profile.
+
+Finding a file in all snapshots would need to walk every snapshot. Files
+which didn't change between snapshots are hard links to the same inode. So
+the index stores for every path only the ranges of snapshot IDs in which
+the path existed with the same inode. Folders are always new inodes in
+every snapshot and are stored with inode ``0``.
+
+The index is a SQLite database in the local data folder. Only snapshots
+newer than the last indexed snapshot are added by :py:func:`update`. If the
+change manifest of a snapshot (see :py:func:`snapshots.SID.changes`) lists
+all changes against the last indexed snapshot, only the changed paths are
+updated. Other snapshots are walked completely. Removed snapshots don't
+need an update: a range still covers the remaining snapshots between its
+first and last snapshot ID.
+"""
+import os
+import bisect
+import sqlite3
+import stat
+import zlib
+
+import logger
+import snapshots
+
+
+class SearchIndex:
+    """
+    Search index of all snapshots of a profile.
+
+    Args:
+        cfg (config.Config):    current config
+        profile_id (str):       profile ID, current profile if ``None``
+    """
+    VERSION = 1
+
+    def __init__(self, cfg, profile_id=None):
+        self.config = cfg
+        self.profileID = profile_id
+        self.filename = cfg.searchIndexFile(profile_id)
+        self._db = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def open(self):
+        """
+        Open the database and create or reset it if it doesn't match the
+        current snapshots path or version.
+
+        Raises:
+            sqlite3.Error:  if the database can't be opened
+        """
+        self._db = sqlite3.connect(self.filename)
+        db = self._db
+        db.execute('CREATE TABLE IF NOT EXISTS meta '
+                   '(key TEXT PRIMARY KEY, value TEXT)')
+
+        folder = self.config.snapshotsFullPath(self.profileID)
+        if (self._meta('version') != str(self.VERSION)
+                or self._meta('folder') != folder):
+            logger.debug(f'Create new search index {self.filename}', self)
+            db.executescript('''
+                DROP TABLE IF EXISTS paths;
+                DROP TABLE IF EXISTS ranges;
+                DELETE FROM meta;
+                CREATE TABLE paths (id INTEGER PRIMARY KEY,
+                                    path TEXT UNIQUE NOT NULL);
+                CREATE TABLE ranges (path_id INTEGER NOT NULL,
+                                     first TEXT NOT NULL,
+                                     last TEXT,
+                                     inode INTEGER NOT NULL);
+                CREATE INDEX ranges_path ON ranges (path_id);
+                CREATE INDEX ranges_open ON ranges (path_id, inode)
+                    WHERE last IS NULL;
+            ''')
+            self._setMeta('version', str(self.VERSION))
+            self._setMeta('folder', folder)
+            db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _meta(self, key):
+        row = self._db.execute('SELECT value FROM meta WHERE key = ?',
+                               (key,)).fetchone()
+        return row[0] if row else None
+
+    def _setMeta(self, key, value):
+        self._db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                         (key, value))
+
+    def lastSID(self):
+        """
+        ID of the newest snapshot in the index.
+
+        Returns:
+            str:    snapshot ID or ``None`` if nothing is indexed
+        """
+        return self._meta('last')
+
+    def update(self, sids, callback=None):
+        """
+        Add all snapshots in ``sids`` which are newer than the last indexed
+        snapshot. Each snapshot is committed separately, so an interrupted
+        update continues with the next snapshot.
+
+        Args:
+            sids (list):        :py:class:`snapshots.SID` instances
+            callback (method):  called with each snapshot before it is added
+
+        Returns:
+            int:                number of added snapshots
+        """
+        last = self.lastSID()
+        new = sorted((sid for sid in sids if last is None or sid.sid > last),
+                     key=lambda sid: sid.sid)
+
+        for sid in new:
+            if callback:
+                callback(sid)
+
+            self._add(sid, last)
+            last = sid.sid
+
+        return len(new)
+
+    def _add(self, sid, prev):
+        db = self._db
+        db.execute('CREATE TEMP TABLE IF NOT EXISTS walk '
+                   '(path TEXT PRIMARY KEY, inode INTEGER)')
+        db.execute('DELETE FROM walk')
+
+        # ranges of prev are still open and the manifest has the rest
+        changed = (prev is not None
+                   and sid.info.strValue('changes_base', '') == prev)
+        if changed:
+            try:
+                db.executemany('INSERT OR REPLACE INTO walk VALUES (?, ?)',
+                               self._changes(sid))
+
+            except (OSError, EOFError, ValueError, zlib.error) as e:
+                logger.error(f'Failed to read change manifest of {sid}: '
+                             f'{str(e)}', self)
+                db.execute('DELETE FROM walk')
+                changed = False
+
+        if not changed:
+            db.executemany('INSERT OR IGNORE INTO walk VALUES (?, ?)',
+                           self._walk(sid.pathBackup()))
+
+        db.execute('INSERT OR IGNORE INTO paths (path) '
+                   'SELECT path FROM walk WHERE inode IS NOT NULL')
+
+        # close ranges of paths which are gone or have a new inode
+        if changed:
+            # only paths in the manifest may have changed
+            db.execute('''
+                UPDATE ranges SET last = ? WHERE last IS NULL
+                    AND path_id IN (SELECT paths.id FROM walk
+                                    JOIN paths ON paths.path = walk.path)
+                    AND NOT EXISTS (
+                        SELECT 1 FROM walk JOIN paths ON paths.path = walk.path
+                        WHERE paths.id = ranges.path_id
+                            AND walk.inode = ranges.inode)
+            ''', (prev,))
+
+        else:
+            db.execute('''
+                UPDATE ranges SET last = ? WHERE last IS NULL AND NOT EXISTS (
+                    SELECT 1 FROM walk JOIN paths ON paths.path = walk.path
+                    WHERE paths.id = ranges.path_id
+                        AND walk.inode = ranges.inode)
+            ''', (prev,))
+
+        # open ranges for new paths and new inodes
+        db.execute('''
+            INSERT INTO ranges (path_id, first, last, inode)
+            SELECT paths.id, ?, NULL, walk.inode
+            FROM walk JOIN paths ON paths.path = walk.path
+            WHERE walk.inode IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM ranges
+                WHERE ranges.path_id = paths.id
+                    AND ranges.inode = walk.inode
+                    AND ranges.last IS NULL)
+        ''', (sid.sid,))
+
+        db.execute('DELETE FROM walk')
+        self._setMeta('last', sid.sid)
+        db.commit()
+
+    def _changes(self, sid):
+        """
+        Iterate over the paths in the change manifest of ``sid`` with their
+        current inode in ``sid``.
+
+        Yields:
+            tuple:  (escaped full path, inode, ``0`` for folders or ``None``
+                    if the path doesn't exist anymore)
+        """
+        for path, *_ in sid.changes():
+            # the walk doesn't index the root folder either
+            if path == b'/':
+                continue
+
+            try:
+                st = os.lstat(sid.pathBackup(os.fsdecode(path)))
+
+            except OSError:
+                yield snapshots.escapeRsync(path), None
+                continue
+
+            if stat.S_ISDIR(st.st_mode):
+                yield snapshots.escapeRsync(path), 0
+
+            else:
+                yield snapshots.escapeRsync(path), st.st_ino
+
+    def _walk(self, root):
+        """
+        Iterate over everything below ``root`` without calling ``stat``.
+
+        Yields:
+            tuple:  (escaped full path, inode or ``0`` for folders)
+        """
+        root = os.fsencode(root.rstrip(os.sep))
+        head = len(root)
+        stack = [root]
+
+        while stack:
+            folder = stack.pop()
+
+            try:
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        path = snapshots.escapeRsync(entry.path[head:])
+
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                            yield path, 0
+
+                        else:
+                            yield path, entry.inode()
+
+            except OSError as e:
+                logger.error(f'Failed to list {folder}: {str(e)}', self)
+
+    def search(self, pattern):
+        """
+        Find paths in all indexed snapshots.
+
+        Args:
+            pattern (str):  glob pattern (with ``*``, ``?`` or ``[``) which
+                            has to match the end of the full path or
+                            otherwise any part of the path
+
+        Returns:
+            list:           sorted tuples of (path, first, last, inode)
+                            with :py:class:`bytes` path, first and last
+                            snapshot ID of the range and inode (``0`` for
+                            folders)
+        """
+        # paths are stored escaped like in rsync's output
+        pattern = snapshots.escapeRsync(os.fsencode(pattern))
+        if any(char in pattern for char in '*?['):
+            if not pattern.startswith(('/', '*')):
+                pattern = '*' + pattern
+            condition = 'paths.path GLOB ?'
+
+        else:
+            condition = 'instr(paths.path, ?) > 0'
+
+        last = self.lastSID()
+        rows = self._db.execute(f'''
+            SELECT paths.path, ranges.first, ranges.last, ranges.inode
+            FROM paths JOIN ranges ON ranges.path_id = paths.id
+            WHERE {condition}
+            ORDER BY paths.path, ranges.first
+        ''', (pattern,))
+
+        return [(snapshots.unescapeRsync(path.encode()), first,
+                 last if end is None else end, inode)
+                for path, first, end, inode in rows]
+
+
+def rangeSIDs(ids, first, last):
+    """
+    Snapshots which still exist in a range returned by
+    :py:func:`SearchIndex.search`.
+
+    Args:
+        ids (list): sorted IDs (:py:class:`str`) of all existing snapshots
+        first (str): first snapshot ID of the range
+        last (str): last snapshot ID of the range
+
+    Returns:
+        list: IDs of ``ids`` within the range
+    """
+    return ids[bisect.bisect_left(ids, first):bisect.bisect_right(ids, last)]
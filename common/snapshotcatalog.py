@@ -0,0 +1,193 @@
+# Back In Time
+# Copyright (C) 2008-2022 Oprea Dan, Bart de Koning, Richard Bailey,
+# Germar Reitze
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""Catalog of all snapshots of a profile.
+
+Listing the snapshots needs several file system calls per snapshot which are
+expensive on network file systems like sshfs. The catalog keeps the snapshot
+IDs together with the details shown in the timeline (name, failed flag, last
+check) in one file in the local data folder.
+"""
+import os
+import json
+import time
+
+import logger
+
+
+class SnapshotCatalog:
+    """
+    Catalog file of the snapshots in
+    :py:func:`config.Config.snapshotsFullPath`.
+
+    The catalog stores the path and modification time of the snapshots
+    folder. It is kept outside of that folder, so writing it doesn't change
+    the time again. As long
+    as it didn't change no snapshot was added or removed and the catalog is
+    used as is. Otherwise the folder is listed once and only new snapshots
+    are described again. Changes inside a snapshot (name, failed flag,
+    last check) don't touch the folder and need to be reported with
+    :py:func:`update`.
+
+    Args:
+        cfg (config.Config):    current config
+        profile_id (str):       profile ID, current profile if ``None``
+    """
+    # written into the snapshots folder by older versions
+    FILENAME = 'catalog.json'
+    VERSION = 2
+
+    # Changes within the same timestamp tick as the listing would go
+    # unnoticed. Like git's "racily clean" index entries, a folder modified
+    # less than this ago (nanoseconds) is listed again next time.
+    RACY_TIME = 2 * 10**9
+
+    def __init__(self, cfg, profile_id=None):
+        self.config = cfg
+        self.folder = cfg.snapshotsFullPath(profile_id)
+        self.filename = cfg.snapshotCatalogFile(profile_id)
+
+    def _folderMTime(self):
+        return os.stat(self.folder).st_mtime_ns
+
+    def load(self):
+        """
+        Read the catalog file.
+
+        Returns:
+            tuple:  folder modification time and a dict of entries with
+                    snapshot ID as key. ``(None, None)`` if there is no
+                    usable catalog.
+        """
+        try:
+            with open(self.filename, 'rt') as f:
+                data = json.load(f)
+
+            if data.get('version') != self.VERSION \
+                    or data.get('folder') != self.folder:
+                return None, None
+
+            return data['mtime'], data['snapshots']
+
+        except FileNotFoundError:
+            pass
+
+        # a concurrent write or an older/broken file; it will be rebuild
+        except (OSError, ValueError, KeyError, AttributeError) as exc:
+            logger.debug(f'Failed to read snapshot catalog '
+                         f'{self.filename}: {str(exc)}', self)
+
+        return None, None
+
+    def save(self, mtime, entries):
+        """
+        Write the catalog file.
+
+        Args:
+            mtime (int):        modification time of the snapshots folder in
+                                nanoseconds the ``entries`` are based on
+            entries (dict):     entries with snapshot ID as key
+
+        Returns:
+            bool:               ``True`` if successful
+        """
+        data = {'version': self.VERSION,
+                'folder': self.folder,
+                'mtime': mtime,
+                'snapshots': entries}
+
+        tmp = self.filename + '.tmp'
+        try:
+            # concurrent readers never see a half written file
+            with open(tmp, 'wt') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp, self.filename)
+
+            return True
+
+        except OSError as exc:
+            logger.debug(f'Failed to write snapshot catalog '
+                         f'{self.filename}: {str(exc)}', self)
+
+        return False
+
+    def entries(self, describe):
+        """
+        Up-to-date catalog entries of all snapshots.
+
+        Args:
+            describe (method):  called with a folder name and returns the
+                                entry for that snapshot or ``None`` if the
+                                folder is not a snapshot
+
+        Returns:
+            dict:               entries with snapshot ID as key
+        """
+        mtime = self._folderMTime()
+        saved_mtime, entries = self.load()
+
+        if entries is not None and saved_mtime == mtime:
+            return entries
+
+        known = entries or {}
+        entries = {}
+
+        for item in os.listdir(self.folder):
+            if item in known:
+                entries[item] = known[item]
+                continue
+
+            if item == self.FILENAME:
+                continue
+
+            entry = describe(item)
+            if entry is not None:
+                entries[item] = entry
+
+        if abs(time.time_ns() - mtime) < self.RACY_TIME:
+            mtime = None
+
+        self.save(mtime, entries)
+
+        return entries
+
+    def update(self, sid, entry):
+        """
+        Add or replace the entry of snapshot ``sid``. Nothing is done if
+        there is no catalog yet.
+
+        Args:
+            sid (str):      snapshot ID
+            entry (dict):   new entry
+        """
+        mtime, entries = self.load()
+
+        if entries is not None:
+            entries[sid] = entry
+            self.save(mtime, entries)
+
+    def remove(self, sid):
+        """
+        Remove the entry of snapshot ``sid``.
+
+        Args:
+            sid (str):      snapshot ID
+        """
+        mtime, entries = self.load()
+
+        if entries is not None and entries.pop(sid, None) is not None:
+            self.save(mtime, entries)
@@ -0,0 +1,209 @@
+# Back In Time
+# Copyright (C) 2008-2022 Oprea Dan, Bart de Koning, Richard Bailey,
+# Germar Reitze
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""Compare the folder trees of two snapshots.
+
+Files which didn't change between snapshots are hard links to the same
+inode (rsync ``--link-dest``). Both trees are walked side by side folder by
+folder and every entry with the same inode in both snapshots is skipped
+without calling ``stat``. Only entries with different inodes are compared
+by type, permissions, owner, size, modification time and link target.
+"""
+import os
+import stat
+
+import logger
+
+ADDED = 'A'
+DELETED = 'D'
+MODIFIED = 'M'
+TYPE_CHANGED = 'T'
+
+
+def diff(sid1, sid2, path='/', callback=None):
+    """
+    Find all differences between two snapshots. Entries of new or removed
+    folders are reported one by one.
+
+    Args:
+        sid1 (snapshots.SID):   old snapshot
+        sid2 (snapshots.SID):   new snapshot
+        path (str):             only compare this folder or file
+        callback (method):      called with each compared folder (bytes
+                                path relative to the snapshot)
+
+    Yields:
+        tuple:                  (status, path) with status one of
+                                :py:data:`ADDED`, :py:data:`DELETED`,
+                                :py:data:`MODIFIED` or
+                                :py:data:`TYPE_CHANGED` and the full path
+                                as :py:class:`bytes`. Folders are followed
+                                by their content, both sorted by name.
+    """
+    path = os.fsencode(path).rstrip(b'/')
+    root1 = os.fsencode(sid1.pathBackup()).rstrip(b'/')
+    root2 = os.fsencode(sid2.pathBackup()).rstrip(b'/')
+
+    try:
+        st1 = _lstat(root1 + path)
+        st2 = _lstat(root2 + path)
+    except OSError as e:
+        logger.error(f'Failed to compare {path}: {str(e)}')
+        return
+
+    isdir1 = st1 is not None and stat.S_ISDIR(st1.st_mode)
+    isdir2 = st2 is not None and stat.S_ISDIR(st2.st_mode)
+
+    if isdir1 and isdir2:
+        yield from _diffFolder(root1, root2, path, callback)
+        return
+
+    # a single file or a folder which is missing in one snapshot
+    if st1 is not None and st2 is not None and st1.st_ino == st2.st_ino:
+        return
+
+    try:
+        status = _compare(st1, st2, root1 + path, root2 + path)
+    except OSError as e:
+        logger.error(f'Failed to compare {path}: {str(e)}')
+        return
+
+    if status is None:
+        return
+
+    yield status, path
+    if isdir1:
+        yield from _walk(root1, path, DELETED)
+    elif isdir2:
+        yield from _walk(root2, path, ADDED)
+
+
+def _lstat(path):
+    try:
+        return os.lstat(path)
+    except FileNotFoundError:
+        return None
+
+
+def _scandir(path):
+    try:
+        with os.scandir(path) as it:
+            return {entry.name: entry for entry in it}
+    except OSError as e:
+        logger.error(f'Failed to list {path}: {str(e)}')
+        return {}
+
+
+def _entryStat(entry):
+    if entry is None:
+        return None
+
+    return entry.stat(follow_symlinks=False)
+
+
+def _isDir(entry):
+    return entry is not None and entry.is_dir(follow_symlinks=False)
+
+
+def _compare(st1, st2, path1, path2):
+    """
+    Compare two entries with different inodes.
+
+    Returns:
+        str:    status or ``None`` if both are equal
+    """
+    if st1 is None:
+        return ADDED if st2 is not None else None
+
+    if st2 is None:
+        return DELETED
+
+    if stat.S_IFMT(st1.st_mode) != stat.S_IFMT(st2.st_mode):
+        return TYPE_CHANGED
+
+    if stat.S_ISDIR(st1.st_mode):
+        return None
+
+    # a new inode only because of chmod or chown
+    if (stat.S_IMODE(st1.st_mode) != stat.S_IMODE(st2.st_mode)
+            or st1.st_uid != st2.st_uid
+            or st1.st_gid != st2.st_gid):
+        return MODIFIED
+
+    if stat.S_ISLNK(st1.st_mode):
+        if os.readlink(path1) != os.readlink(path2):
+            return MODIFIED
+        return None
+
+    if st1.st_size != st2.st_size or st1.st_mtime_ns != st2.st_mtime_ns:
+        return MODIFIED
+
+    return None
+
+
+def _diffFolder(root1, root2, folder, callback):
+    if callback:
+        callback(folder)
+
+    entries1 = _scandir(root1 + folder)
+    entries2 = _scandir(root2 + folder)
+
+    for name in sorted(entries1.keys() | entries2.keys()):
+        entry1 = entries1.get(name)
+        entry2 = entries2.get(name)
+        isdir1 = _isDir(entry1)
+        isdir2 = _isDir(entry2)
+        current = folder + b'/' + name
+
+        if isdir1 and isdir2:
+            yield from _diffFolder(root1, root2, current, callback)
+            continue
+
+        # unchanged files are hard linked by rsync --link-dest
+        if (entry1 is not None and entry2 is not None
+                and not isdir1 and not isdir2
+                and entry1.inode() == entry2.inode()):
+            continue
+
+        try:
+            status = _compare(_entryStat(entry1), _entryStat(entry2),
+                              root1 + current, root2 + current)
+        except OSError as e:
+            logger.error(f'Failed to compare {current}: {str(e)}')
+            continue
+
+        if status is None:
+            continue
+
+        yield status, current
+
+        if isdir1:
+            yield from _walk(root1, current, DELETED)
+        elif isdir2:
+            yield from _walk(root2, current, ADDED)
+
+
+def _walk(root, path, status):
+    """
+    Report everything below ``root + path`` with ``status``.
+    """
+    for name, entry in sorted(_scandir(root + path).items()):
+        current = path + b'/' + name
+        yield status, current
+
+        if _isDir(entry):
+            yield from _walk(root, current, status)
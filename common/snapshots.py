@@ -10,18 +10,29 @@
 # General Public License v2 (GPLv2). See file/folder LICENSE or go to
 # <https://spdx.org/licenses/GPL-2.0-or-later.html>.
 import os
+import array
 from pathlib import Path
 import stat
 import datetime
 import gettext
+import hashlib
 import bz2
 import pwd
 import getpass
 import grp
 import subprocess
 import shutil
+import shlex
 import time
 import re
+import bisect
+import glob
+import threading
+import zlib
+import gzip
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from tempfile import TemporaryDirectory
 import config
 import configfile
@@ -31,6 +42,12 @@ import encfstools
 import mount
 import progress
 import snapshotlog
+import snapshotcatalog
+import fileinfo
+import hashcache
+import scancache
+import dedup
+import localcopy
 import flock
 from applicationinstance import ApplicationInstance
 from exceptions import MountException, LastSnapshotSymlink
@@ -54,6 +71,30 @@ class Snapshots:
     """
     SNAPSHOT_VERSION = 3
 
+    # Minimal interval in seconds between two updates of the message and
+    # progress file while rsync is running
+    RSYNC_STATUS_INTERVAL = 0.5
+
+    # Folder inside the snapshots folder holding snapshots waiting for
+    # deletion in background
+    TRASH = '.trash'
+
+    # Folder rsync keeps partially transferred files in, relative to the
+    # folder of each file (rsync's default name)
+    PARTIAL_DIR = '.rsync-partial'
+
+    # Minimal interval in seconds between two progress messages while
+    # restoring permissions
+    RESTORE_PROGRESS_INTERVAL = 1.0
+
+    # change flags of deleted entries in the change manifest, like
+    # rsync itemizes deletions
+    DELETED = '*deleting'
+
+    # Number of threads stat'ing the same file in all snapshots in
+    # :py:func:`filter`. Mostly waiting for sshfs round trips.
+    FILTER_WORKERS = 8
+
     def __init__(self, cfg = None):
         self.config = cfg
         if self.config is None:
@@ -74,10 +115,40 @@ class Snapshots:
                                           r'(-?\d*[,\.]?\d*[KkMGT]?B/s)\s+' #speed
                                           r'([\d\?]+:[\d\?]{2}:[\d\?]{2})'  #estimated time of arrival
                                           r'(.*$)')                         #trash at the end
+        #size and mtime at the end of itemized lines:
+        #BACKINTIME: >f+++++++++ foo/bar 1,234 2023/11/05-12:34:56
+        self.reRsyncItemized = re.compile(r'(BACKINTIME: .*) '              #itemized line
+                                          r'(\d[\d,\.]*) '                  #size
+                                          r'(\d{4}/\d\d/\d\d-[\d:]{8})$')    #mtime
 
         self.lastBusyCheck = datetime.datetime(1, 1, 1)
         self.restorePermissionFailed = False
 
+        # latest rsync status which wasn't written to disk yet
+        self._rsyncMessage = None
+        self._rsyncMessageTime = 0.0
+        self._rsyncProgress = None
+        self._rsyncProgressTime = 0.0
+
+        # called with every progress written by _saveRsyncProgress
+        self._rsyncProgressCallback = None
+
+        # predicts percent and ETA while rsync takes a snapshot
+        self._progressEstimator = None
+
+        # names of files and folders itemized by rsync while taking a
+        # snapshot (bytes, relative to the source root); ``None`` if not
+        # tracked
+        self._itemized = None
+
+        # change manifest (gzip file) of the snapshot which is taken
+        self._changes = None
+
+        # source scan cache (scancache.ScanCache) of the snapshot which is
+        # taken and the fingerprint of its rsync options
+        self._scanCache = None
+        self._scanFingerprint = None
+
     # TODO: make own class for takeSnapshotMessage
     def clearTakeSnapshotMessage(self):
         """Delete message and progress file"""
@@ -161,6 +232,21 @@ class Snapshots:
                      ignore the timeout value!
         """
 
+        # Error message?
+        if type_id == 1:
+            self.snapshotLog.append('[E] ' + message, 1)
+        else:
+            self.snapshotLog.append('[I] ' + message, 3)
+
+        self._sendTakeSnapshotMessage(type_id, message, timeout)
+
+    def _sendTakeSnapshotMessage(self, type_id, message, timeout=-1):
+        """Write the message file and dispatch the message to the plug-ins
+        without logging it. See :py:func:`setTakeSnapshotMessage`.
+        """
+        # A newer message replaces the rsync status which is still pending
+        self._rsyncMessage = None
+
         message_fn = self.config.takeSnapshotMessageFile()
 
         try:
@@ -172,12 +258,6 @@ class Snapshots:
             logger.debug('Failed to set takeSnapshot message '
                          f'to {message_fn}: {str(exc)}', self)
 
-        # Error message?
-        if type_id == 1:
-            self.snapshotLog.append('[E] ' + message, 1)
-        else:
-            self.snapshotLog.append('[I] ' + message, 3)
-
         try:
             profile_id = self.config.currentProfile()
             profile_name = self.config.profileName(profile_id)
@@ -428,6 +508,144 @@ class Snapshots:
                 pass
             self.restoreCallback(callback, ok, "chmod %s %04o" % (path.decode(errors = 'ignore'), info[0]))
 
+    def restorePermissions(self, entries, callback = None, max_workers = 1):
+        """
+        Restore permissions (owner, group and mode) of many files and folders
+        like :py:func:`restorePermission` but much faster on large restores.
+
+        Entries are grouped by their parent folder. Every group is done with
+        ``dir_fd``-relative calls on one file descriptor of that folder and
+        a single ``lstat`` per entry. Entries which already have the right
+        owner, group and mode are skipped. Groups are done deepest folder
+        first, so folders are changed only after their content. Groups of
+        the same depth can run in parallel. Symlinks are skipped.
+
+        Args:
+            entries (dict):         dict of: {path: (permission, user, group)}
+                                    with the current :py:class:`bytes`
+                                    path of every file and folder
+            callback (method):      callable instance which will handle
+                                    messages
+            max_workers (int):      maximum number of threads
+        """
+        groups = {}
+        for path, (mode, user, group) in entries.items():
+            parent, name = os.path.split(path)
+            if not name:
+                # root folder is changed through a descriptor of itself
+                parent, name = b'', b'.'
+
+            # resolve names in this thread, the caches are not thread-safe
+            groups.setdefault(parent, []).append(
+                (name, mode, self.uid(user, callback), self.gid(group, callback)))
+
+        levels = {}
+        for parent in groups:
+            depth = parent.rstrip(b'/').count(b'/') + 1 if parent else 0
+            levels.setdefault(depth, []).append(parent)
+
+        lock = threading.Lock()
+        total = len(entries)
+        count = 0
+        lastProgress = time.monotonic()
+
+        def report(ok, msg):
+            with lock:
+                self.restoreCallback(callback, ok, msg)
+
+        def task(parent):
+            nonlocal count, lastProgress
+            items = groups[parent]
+
+            try:
+                fd = os.open(parent or b'/', os.O_RDONLY | os.O_DIRECTORY)
+
+            except OSError:
+                # nothing was restored in here
+                fd = None
+
+            if fd is not None:
+                try:
+                    for item in items:
+                        self._restorePermissionAt(fd, parent, *item, report)
+
+                finally:
+                    os.close(fd)
+
+            with lock:
+                count += len(items)
+                now = time.monotonic()
+                if now - lastProgress >= self.RESTORE_PROGRESS_INTERVAL:
+                    lastProgress = now
+                    self.restoreCallback(
+                        callback, True, '{}: {}/{}'.format(
+                            _('Restore permissions'), count, total))
+
+        if max_workers > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for depth in sorted(levels, reverse=True):
+                    # wait for all deeper folders before changing their parents
+                    list(executor.map(task, levels[depth]))
+
+        else:
+            for depth in sorted(levels, reverse=True):
+                for parent in levels[depth]:
+                    task(parent)
+
+    def _restorePermissionAt(self, fd, parent, name, mode, uid, gid, report):
+        """
+        Restore owner, group and mode of ``name`` in the folder opened as
+        ``fd``. See :py:func:`restorePermissions`.
+        """
+        try:
+            st = os.stat(name, dir_fd=fd, follow_symlinks=False)
+
+        except OSError:
+            return
+
+        if stat.S_ISLNK(st.st_mode):
+            return
+
+        chown = uid != -1 and uid != st.st_uid
+        chgrp = gid != -1 and gid != st.st_gid
+        if not chown and not chgrp and mode == st.st_mode:
+            return
+
+        cur_mode = st.st_mode
+        path = (os.path.join(parent, name) if parent else b'/').decode(errors = 'ignore')
+
+        ok = False
+        if chown:
+            try:
+                os.chown(name, uid, gid, dir_fd=fd, follow_symlinks=False)
+                ok = True
+            except OSError:
+                pass
+            report(ok, "chown %s %s : %s" % (path, uid, gid))
+
+        #if restore uid/gid failed try to restore at least gid
+        if not ok and chgrp:
+            try:
+                os.chown(name, -1, gid, dir_fd=fd, follow_symlinks=False)
+                ok = True
+            except OSError:
+                pass
+            report(ok, "chgrp %s %s" % (path, gid))
+
+        if ok:
+            # chown might drop setuid and setgid bits
+            cur_mode &= ~(stat.S_ISUID | stat.S_ISGID)
+
+        #restore perms
+        if mode != cur_mode:
+            ok = False
+            try:
+                os.chmod(name, mode, dir_fd=fd)
+                ok = True
+            except OSError:
+                pass
+            report(ok, "chmod %s %04o" % (path, mode))
+
     def restore(self,
                 sid,
                 paths,
@@ -435,19 +653,24 @@ class Snapshots:
                 restore_to = '',
                 delete = False,
                 backup = True,
-                only_new = False):
+                only_new = False,
+                progress = None):
         """
         Restore one or more files from snapshot ``sid`` to either original
         or a different destination. Restore is done with rsync. If available
-        permissions will be restored from ``fileinfo.bz2``.
+        permissions will be restored from ``fileinfo.idx`` (or
+        ``fileinfo.bz2``). Only the entries of the restored paths are loaded.
 
         Args:
             sid (SID):                  snapshot from whom to restore
             paths (:py:class:`list`, :py:class:`tuple` or :py:class:`str`):
                                         single path (str) or multiple
                                         paths (list, tuple) that should be
-                                        restored. For every path this will run
-                                        a new rsync process. Permissions will be
+                                        restored. All paths are passed to one
+                                        rsync process with ``--files-from``.
+                                        Only if ``restore_to`` is used paths
+                                        from different folders need one process
+                                        per folder. Permissions will be
                                         restored for all paths in one run
             callback (method):          callable instance which will handle
                                         messages
@@ -460,6 +683,9 @@ class Snapshots:
             only_new (bool):            Only restore files which do not exist
                                         or are newer than those in destination.
                                         Using ``rsync --update`` option.
+            progress (method):          called with ``percent``, ``sent``,
+                                        ``speed`` and ``eta`` of all restored
+                                        paths about twice a second
         """
         instance = ApplicationInstance(
             pidFile=self.config.restoreInstanceFile(),
@@ -487,6 +713,12 @@ class Snapshots:
         cmd_prefix = tools.rsyncPrefix(self.config, no_perms=False, use_mode=['ssh'])
         cmd_prefix.extend(('-R', '-v'))
 
+        # There are no statistics to estimate the totals of a restore, so
+        # rsync builds the whole file list first to show the overall
+        # progress.
+        if '--info=progress2' in cmd_prefix:
+            cmd_prefix.append('--no-inc-recursive')
+
         if backup:
             cmd_prefix.extend(('--backup', '--suffix=%s' % self.backupSuffix()))
 
@@ -499,46 +731,56 @@ class Snapshots:
         if only_new:
             cmd_prefix.append('--update')
 
+        # paths restored by one rsync process are relative to the same
+        # folder in the snapshot
+        batches = {}
         restored_paths = []
 
         for path in paths:
             tools.makeDirs(os.path.dirname(path))
-            src_path = path
-            src_delta = 0
-            src_base = sid.pathBackup(use_mode = ['ssh'])
-
-            if not src_base.endswith(os.sep):
-                src_base += os.sep
-
-            cmd = cmd_prefix[:]
 
             if restore_to:
-                items = os.path.split(src_path)
-                aux = items[0].lstrip(os.sep)
-
-                # bugfix: restore system root ended in <src_base>//.<src_path>
-                if aux:
-                    src_base = os.path.join(src_base, aux) + '/'
-
-                src_path = '/' + items[1]
-
-                if items[0] == '/':
-                    src_delta = 0
-                else:
-                    src_delta = len(items[0])
+                base, name = os.path.split(path)
+            else:
+                base, name = '/', path.lstrip(os.sep)
 
-            cmd.append(self.rsyncRemotePath('%s.%s' % (src_base, src_path), use_mode=['ssh'], quote=''))
-            cmd.append('%s/' % restore_to)
+            # number of leading bytes which are not part of the destination
+            src_delta = 0 if base == '/' else len(base.encode())
+            batches.setdefault(base, []).append(name or '.')
+            restored_paths.append((path, src_delta))
 
-            proc = tools.Execute(cmd,
-                                 callback=callback,
-                                 filters=(self.filterRsyncProgress,),
-                                 parent=self)
+        src_root = sid.pathBackup(use_mode = ['ssh'])
+        self._rsyncProgressCallback = progress
 
-            self.restoreCallback(callback, True, proc.printable_cmd)
-            proc.run()
-            self.restoreCallback(callback, True, ' ')
-            restored_paths.append((path, src_delta))
+        try:
+            with TemporaryDirectory() as tmp:
+                for idx, (base, names) in enumerate(batches.items()):
+                    # NUL separated list of all paths of this batch
+                    files_from = os.path.join(tmp, 'files-from-%d' % idx)
+                    with open(files_from, 'wb') as f:
+                        f.write(b'\0'.join(name.encode() for name in names))
+
+                    src_base = os.path.join(src_root, base.lstrip(os.sep))
+                    if not src_base.endswith(os.sep):
+                        src_base += os.sep
+
+                    cmd = cmd_prefix[:]
+                    cmd.extend(('--from0', '--files-from=%s' % files_from))
+                    cmd.append(self.rsyncRemotePath(src_base, use_mode=['ssh'], quote=''))
+                    cmd.append('%s/' % restore_to)
+
+                    proc = tools.Execute(cmd,
+                                         callback=callback,
+                                         filters=(self.filterRsyncProgress,),
+                                         parent=self)
+
+                    self.restoreCallback(callback, True, proc.printable_cmd)
+                    proc.run()
+                    self.flushRsyncStatus()
+                    self.restoreCallback(callback, True, ' ')
+
+        finally:
+            self._rsyncProgressCallback = None
 
         try:
             os.remove(self.config.takeSnapshotProgressFile())
@@ -553,7 +795,9 @@ class Snapshots:
         self.restoreCallback(
             callback, True, '{}:'.format(_('Restore permissions')))
         self.restorePermissionFailed = False
-        fileInfoDict = sid.fileInfo
+        fileInfoDict = sid.fileInfoSubtrees(
+            [path.encode() if isinstance(path, str) else path
+             for path, src_delta in restored_paths])
 
         #cache uids/gids
         for uid, name in info.listValue('user', ('int:uid', 'str:name')):
@@ -562,45 +806,40 @@ class Snapshots:
             self.gid(name.encode(), callback = callback, backup = gid)
 
         if fileInfoDict:
-            all_dirs = [] #restore dir permissions after all files are done
+            if isinstance(restore_to, str):
+                restore_to = restore_to.encode()
+
+            # dict is used as ordered set of {current path: permissions}
+            entries = {}
+            keys = sorted(fileInfoDict)
             for path, src_delta in restored_paths:
-                #explore items
-                snapshot_path_to = sid.pathBackup(path).rstrip('/')
-                root_snapshot_path_to = sid.pathBackup().rstrip('/')
                 #use bytes instead of string from here
                 if isinstance(path, str):
                     path = path.encode()
-                if isinstance(restore_to, str):
-                    restore_to = restore_to.encode()
+                path = path.rstrip(b'/') or b'/'
 
                 if not restore_to:
-                    path_items = path.strip(b'/').split(b'/')
+                    #restore parent folders too
                     curr_path = b'/'
-                    for path_item in path_items:
+                    for path_item in path.strip(b'/').split(b'/')[:-1]:
                         curr_path = os.path.join(curr_path, path_item)
-                        if curr_path not in all_dirs:
-                            all_dirs.append(curr_path)
-                else:
-                    if path not in all_dirs:
-                        all_dirs.append(path)
-
-                if os.path.isdir(snapshot_path_to) and not os.path.islink(snapshot_path_to):
-                    head = len(root_snapshot_path_to.encode())
-                    for explore_path, dirs, files in os.walk(snapshot_path_to.encode()):
-                        for item in dirs:
-                            item_path = os.path.join(explore_path, item)[head:]
-                            if item_path not in all_dirs:
-                                all_dirs.append(item_path)
-
-                        for item in files:
-                            item_path = os.path.join(explore_path, item)[head:]
-                            real_path = restore_to + item_path[src_delta:]
-                            self.restorePermission(item_path, real_path, fileInfoDict, callback)
-
-            all_dirs.reverse()
-            for item_path in all_dirs:
-                real_path = restore_to + item_path[src_delta:]
-                self.restorePermission(item_path, real_path, fileInfoDict, callback)
+                        if curr_path in fileInfoDict:
+                            entries[curr_path] = fileInfoDict[curr_path]
+
+                if path in fileInfoDict:
+                    entries[restore_to + path[src_delta:]] = fileInfoDict[path]
+
+                prefix = path.rstrip(b'/') + b'/'
+                # b'0' follows b'/' so this is everything below path
+                first = bisect.bisect_left(keys, prefix)
+                last = bisect.bisect_left(keys, path.rstrip(b'/') + b'0')
+                for item_path in keys[first:last]:
+                    entries[restore_to + item_path[src_delta:]] = fileInfoDict[item_path]
+
+            self.restorePermissions(
+                entries,
+                callback,
+                self.config.restorePermissionsWorkers())
 
             self.restoreCallback(callback, True, '')
 
@@ -627,10 +866,14 @@ class Snapshots:
         """
         return '.backup.' + datetime.date.today().strftime('%Y%m%d')
 
-    def remove(self, sid):
+    def remove(self, sid, callback=None):
         """
         Remove snapshot ``sid``.
 
+        Snapshots on a local (or locally mounted encrypted) destination are
+        removed with :py:func:`tools.removeTree`. The following applies only
+        to remote snapshots.
+
         BUHTZ 2022-10-11: From my understanding rsync is used here to sync the
         directory of a concrete snapshot (``sid``) against an empty temporary
         directory. In the consequence the sid directory is empty but not
@@ -645,6 +888,9 @@ class Snapshots:
 
         Args:
             sid (SID):              snapshot to remove
+            callback (method):      called with the number of removed files
+                                    and folders while removing local
+                                    snapshots
 
         Returns:
             (bool): ``True`` if succeeded otherwise ``False``.
@@ -653,6 +899,13 @@ class Snapshots:
         if isinstance(sid, RootSnapshot):
             return
 
+        if self.config.snapshotsMode() in ('local', 'local_encfs'):
+            if not tools.removeTree(sid.path(), callback=callback):
+                return False
+
+            snapshotcatalog.SnapshotCatalog(self.config).remove(sid.sid)
+            return True
+
         # build the rsync command and it's arguments
         rsync = tools.rsyncRemove(self.config)
 
@@ -684,6 +937,8 @@ class Snapshots:
                     'See previous WARNING message in the logs for details.')
                 return False
 
+            snapshotcatalog.SnapshotCatalog(self.config).remove(sid.sid)
+
             # Delete the sid dir. BUT here isn't the remote path used but the
             # temporary mounted variant of it.
             # e.g. /home/user/.local/share/backintime/mnt/4_8030/backintime/ \
@@ -692,6 +947,142 @@ class Snapshots:
 
             return True
 
+    def backgroundRemove(self):
+        """
+        Check if snapshots removed by :py:func:`freeSpace` should be moved
+        into the trash and deleted in background.
+
+        Returns:
+            bool:   ``True`` if enabled and supported by the current mode
+        """
+        return (self.config.backgroundRemoveEnabled()
+                and self.config.snapshotsMode() == 'local')
+
+    def trashPath(self):
+        """
+        Folder of snapshots waiting for deletion in background.
+
+        Returns:
+            str:    full path of the trash folder
+        """
+        return os.path.join(self.config.snapshotsFullPath(), self.TRASH)
+
+    def moveToTrash(self, sid):
+        """
+        Remove snapshot ``sid`` from the list of snapshots by renaming it into
+        :py:func:`trashPath`. Renaming is atomic and fast so the snapshot
+        disappears immediately while the actual deletion is left for
+        :py:func:`emptyTrash`. If renaming fails the snapshot is removed
+        with :py:func:`remove` instead.
+
+        Args:
+            sid (SID):  snapshot to remove
+
+        Returns:
+            bool:       ``True`` if succeeded otherwise ``False``
+        """
+        if isinstance(sid, RootSnapshot):
+            return
+
+        trash = self.trashPath()
+
+        try:
+            os.makedirs(trash, exist_ok=True)
+            os.rename(sid.path(), os.path.join(trash, sid.sid))
+
+        except OSError as e:
+            logger.warning(f'Failed to move snapshot {sid} into trash: '
+                           f'{str(e)}. Remove it now.', self)
+            return self.remove(sid)
+
+        snapshotcatalog.SnapshotCatalog(self.config).remove(sid.sid)
+        return True
+
+    def emptyTrash(self, callback=None):
+        """
+        Delete all snapshots in :py:func:`trashPath`. Only one process per
+        profile will empty the trash at a time. Snapshots which were only
+        partly deleted (e.g. after a crash) are continued.
+
+        Args:
+            callback (method):  called with the number of removed files and
+                                folders
+
+        Returns:
+            bool:               ``True`` if the trash is empty
+        """
+        trash = self.trashPath()
+        instance = ApplicationInstance(
+            self.config.emptyTrashInstanceFile(), False, flock=True)
+
+        if not instance.check():
+            logger.info('The trash is already being emptied by process '
+                        f'{instance.pidFile}', self)
+            return False
+
+        instance.startApplication()
+        ret = True
+
+        try:
+            # repeat as long as a backup running in parallel moves more
+            # snapshots into the trash
+            while True:
+                try:
+                    items = os.listdir(trash)
+
+                except FileNotFoundError:
+                    break
+
+                if not items:
+                    break
+
+                for item in items:
+                    logger.debug(f'Delete {item} from trash', self)
+                    if not tools.removeTree(os.path.join(trash, item),
+                                            callback=callback):
+                        ret = False
+
+                if not ret:
+                    break
+
+        finally:
+            instance.exitApplication()
+
+        return ret
+
+    def emptyTrashAsync(self):
+        """
+        Start a new backintime process with 'empty-trash' command in
+        background with lowest CPU and IO priority. It is detached and
+        doesn't hold any lock of this process.
+        """
+        cmd = ['nice', '-n19']
+        if tools.checkCommand('ionice'):
+            cmd.extend(('ionice', '-c3'))
+        cmd.append('backintime')
+        if '1' != self.config.currentProfile():
+            cmd.extend(('--profile-id', str(self.config.currentProfile())))
+        if self.config._LOCAL_CONFIG_PATH is not self.config._DEFAULT_CONFIG_PATH:
+            cmd.extend(('--config', self.config._LOCAL_CONFIG_PATH))
+        if self.config._LOCAL_DATA_FOLDER is not self.config._DEFAULT_LOCAL_DATA_FOLDER:
+            cmd.extend(('--share-path', self.config.DATA_FOLDER_ROOT))
+        if logger.DEBUG:
+            cmd.append('--debug')
+        cmd.append('empty-trash')
+
+        logger.debug(f'Empty trash in background: {cmd}', self)
+
+        try:
+            subprocess.Popen(cmd,
+                             stdin=subprocess.DEVNULL,
+                             stdout=subprocess.DEVNULL,
+                             stderr=subprocess.DEVNULL,
+                             start_new_session=True)
+
+        except OSError as e:
+            logger.error(f'Failed to start emptying the trash: {str(e)}',
+                         self)
+
     # TODO Refactor: This functions is extremely difficult to understand:
     #  - Nested "if"s
     #  - Fuzzy names of classes, attributes and methods
@@ -928,6 +1319,12 @@ class Snapshots:
                                 self.setTakeSnapshotMessage(
                                     0, _('Please be patient. Finalizing…'))
 
+                            # also continues an interrupted deletion
+                            if (self.backgroundRemove()
+                                    and os.path.isdir(self.trashPath())
+                                    and os.listdir(self.trashPath())):
+                                self.emptyTrashAsync()
+
                         time.sleep(2)
                         sleep = False
 
@@ -975,6 +1372,10 @@ class Snapshots:
         Filter rsync's stdout for progress information and store them in
         '~/.local/share/backintime/worker<N>.progress' file.
 
+        Only the latest progress is kept in memory and the file is written
+        at most every :py:data:`RSYNC_STATUS_INTERVAL` seconds. Call
+        :py:func:`flushRsyncStatus` after rsync finished.
+
         Args:
             line (str): stdout line from rsync
 
@@ -982,30 +1383,78 @@ class Snapshots:
             str:        ``line`` if it had no progress infos. ``None`` if
                         ``line`` was a progress
         """
+        # cheap check for the vast majority of lines (itemized changes)
+        if '%' not in line:
+            return line
+
         ret = []
         for l in line.split('\n'):
             m = self.reRsyncProgress.match(l)
             if m:
                 # if m.group(5).strip():
                 #     return
-                pg = progress.ProgressFile(self.config)
-                pg.setIntValue('status', pg.RSYNC)
-                pg.setStrValue('sent', m.group(1))
-                pg.setIntValue('percent', int(m.group(2)))
-                pg.setStrValue('speed', m.group(3))
-                #pg.setStrValue('eta', m.group(4))
-                pg.save()
-                del pg
+                self._rsyncProgress = m.groups()
             else:
                 ret.append(l)
+
+        if self._rsyncProgress:
+            now = time.monotonic()
+            if now - self._rsyncProgressTime >= self.RSYNC_STATUS_INTERVAL:
+                self._rsyncProgressTime = now
+                self._saveRsyncProgress()
+
         return '\n'.join(ret)
 
+    def _saveRsyncProgress(self):
+        """Write the pending progress of :py:func:`filterRsyncProgress` into
+        the progress file.
+        """
+        sent, percent, speed, eta, trash = self._rsyncProgress
+        self._rsyncProgress = None
+
+        pg = progress.ProgressFile(self.config)
+        pg.setIntValue('status', pg.RSYNC)
+        pg.setStrValue('sent', sent)
+
+        # rsync's own percent and ETA only cover the part of the file list
+        # which incremental recursion has built so far
+        if self._progressEstimator is not None:
+            percent, eta = self._progressEstimator.update(sent, percent, trash)
+            if eta:
+                pg.setStrValue('eta', eta)
+
+        pg.setIntValue('percent', int(percent))
+        pg.setStrValue('speed', speed)
+        pg.save()
+
+        if self._rsyncProgressCallback:
+            self._rsyncProgressCallback(int(percent), sent, speed, eta)
+
+    def flushRsyncStatus(self):
+        """Write the latest status collected by :py:func:`rsyncCallback` and
+        :py:func:`filterRsyncProgress` which is still pending and reset the
+        update interval for the next rsync process.
+        """
+        if self._rsyncMessage:
+            self._sendTakeSnapshotMessage(0, self._rsyncMessage)
+
+        if self._rsyncProgress:
+            self._saveRsyncProgress()
+
+        self._rsyncMessageTime = 0.0
+        self._rsyncProgressTime = 0.0
+
     def rsyncCallback(self, line, params):
         """
         Parse rsync's stdout, send it to takeSnapshotMessage and
         takeSnapshotLog. Also check if there has been changes or errors in
         current rsync.
 
+        Every line is added to the snapshot log but the message file and the
+        plug-ins are updated at most every :py:data:`RSYNC_STATUS_INTERVAL`
+        seconds with the latest line. Errors are sent immediately. Call
+        :py:func:`flushRsyncStatus` after rsync finished.
+
         Args:
             line (str):     stdout line from rsync
             params (list):  list of two bool '[error, changes]'.
@@ -1019,26 +1468,224 @@ class Snapshots:
         if not line:
             return
 
+        size = mtime = None
+        if line.startswith('BACKINTIME: '):
+            # The prefix is created by rsync via the argument
+            # "--out-format=BACKINTIME: %i %n%L %l %M". Remove size and mtime
+            # so the line is logged like before.
+            m = self.reRsyncItemized.match(line)
+            if m:
+                line, size, mtime = m.groups()
+
         # Warning (2023-11): Do not modify the source string.
         # See #1559 for details.
-        self.setTakeSnapshotMessage(
-            0, _('Take snapshot') + " (rsync: %s)" % line)
+        message = _('Take snapshot') + " (rsync: %s)" % line
+        self.snapshotLog.append('[I] ' + message, 3)
+
+        if line.startswith('BACKINTIME: '):
+            if len(line) >= 13 and line[12] != '.' and line[12:14] != 'cd':
+                params[1] = True
+                self.snapshotLog.append('[C] ' + line[12:], 2)
+
+                if self._changes is not None:
+                    self.addChange(line[12:23], line[24:], size, mtime)
+
+            if self._itemized is not None:
+                self._itemized.update(self.itemizedNames(line[24:]))
 
         # Did rsync report an error?
-        if line.endswith(')'):
-            if line.startswith('rsync:'):
-                if not line.startswith('rsync: chgrp ') and not line.startswith('rsync: chown '):
-                    # matches rsync error lines like:
-                    # rsync: [generator] link [...] failed: Invalid cross-device link (18)
-                    params[0] = True
-                    self.setTakeSnapshotMessage(1, 'Error: ' + line)
-
-        if len(line) >= 13:
-            # The prefix is created by rsync via the argument "--out-format=BACKINTIME: %i %n%L"
-            if line.startswith('BACKINTIME: '):
-                if line[12] != '.' and line[12:14] != 'cd':
-                    params[1] = True
-                    self.snapshotLog.append('[C] ' + line[12:], 2)
+        elif line.endswith(')') and line.startswith('rsync:'):
+            if not line.startswith('rsync: chgrp ') and not line.startswith('rsync: chown '):
+                # matches rsync error lines like:
+                # rsync: [generator] link [...] failed: Invalid cross-device link (18)
+                params[0] = True
+                self.setTakeSnapshotMessage(1, 'Error: ' + line)
+                self._rsyncMessageTime = time.monotonic()
+                return
+
+        now = time.monotonic()
+        if now - self._rsyncMessageTime >= self.RSYNC_STATUS_INTERVAL:
+            self._rsyncMessageTime = now
+            self._sendTakeSnapshotMessage(0, message)
+
+        else:
+            self._rsyncMessage = message
+
+    def openChanges(self, sid):
+        """
+        Open the change manifest of ``sid`` for appending. See
+        :py:func:`SID.changes`.
+
+        Args:
+            sid (SID):  snapshot which is taken
+
+        Returns:
+            file:       gzip file opened in text mode or ``None`` if it
+                        couldn't be opened
+        """
+        try:
+            return gzip.open(sid.path(SID.CHANGES), 'at', encoding='utf-8')
+
+        except OSError as e:
+            logger.error('Failed to open change manifest of {}: {}'
+                         .format(sid.sid, str(e)), self)
+
+        return None
+
+    def addChange(self, flags, name, size, mtime):
+        """
+        Add one entry itemized by rsync to the change manifest.
+
+        Args:
+            flags (str):    ``%i`` part of the line
+            name (str):     ``%n%L`` part of the line
+            size (str):     ``%l`` part of the line or ``None``
+            mtime (str):    ``%M`` part of the line or ``None``
+        """
+        # remove " => HARDLINK" or " -> SYMLINK"
+        sep = None
+        if flags[0] == 'h':
+            sep = ' => '
+        elif flags[1:2] == 'L':
+            sep = ' -> '
+
+        if sep is not None and sep in name:
+            name = name[:name.index(sep)]
+
+        size = int(size.replace(',', '').replace('.', '')) if size else 0
+        if mtime:
+            mtime = int(time.mktime(time.strptime(mtime, '%Y/%m/%d-%H:%M:%S')))
+
+        self.writeChange(flags, size, mtime or 0, name)
+
+    def writeChange(self, flags, size, mtime, name):
+        """
+        Write one line to the change manifest.
+
+        Args:
+            flags (str):    itemized flags like rsync's ``%i``
+            size (int):     size in bytes
+            mtime (int):    modification time in seconds since epoch
+            name (str):     path relative to the source root, escaped like
+                            in rsync's output
+        """
+        self._changes.write('%s %d %d /%s\n' % (
+            flags, size, mtime, name.strip('/')))
+
+    def addFileInfoChanges(self, sid, prev_sid):
+        """
+        Add all entries of ``prev_sid`` which don't exist in ``sid`` and all
+        folders which are new in ``sid`` to the change manifest of ``sid``.
+        rsync doesn't report deleted entries because it creates the new
+        snapshot from scratch with ``--link-dest``. For the same reason it
+        reports every folder as created, so its folder lines are not
+        written. Both are found by merging the sorted permission files of
+        the snapshots. Size and mtime are taken from ``prev_sid`` for
+        deleted entries and from ``sid`` for new folders.
+
+        Args:
+            sid (SID):      new snapshot with its ``fileinfo.idx``
+            prev_sid (SID): previous snapshot or ``None``
+
+        Returns:
+            bool:           ``True`` if both permission files were merged
+                            and the manifest lists all changes against
+                            ``prev_sid``
+        """
+        if prev_sid is None:
+            return False
+
+        prev = prev_sid.fileInfoReader()
+        if prev is None:
+            # taken by an older version
+            return False
+
+        new = sid.fileInfoReader()
+        if new is None:
+            prev.close()
+            return False
+
+        def write(f, flags, snapshot, path):
+            try:
+                st = os.lstat(snapshot.pathBackup(os.fsdecode(path)))
+                size, mtime = st.st_size, int(st.st_mtime)
+
+            except OSError:
+                size, mtime = 0, 0
+
+            f.write('%s %d %d %s\n' % (flags, size, mtime, escapeRsync(path)))
+
+        def folder(f, path):
+            # the permission file follows symlinks
+            try:
+                st = os.lstat(sid.pathBackup(os.fsdecode(path)))
+
+            except OSError:
+                return
+
+            if stat.S_ISDIR(st.st_mode):
+                f.write('cd+++++++++ %d %d %s\n' % (
+                    st.st_size, int(st.st_mtime), escapeRsync(path)))
+
+        with prev, new:
+            prevItems, newItems = prev.items(), new.items()
+
+            try:
+                with gzip.open(sid.path(SID.CHANGES), 'at', encoding='utf-8') as f:
+                    old = next(prevItems, None)
+                    cur = next(newItems, None)
+
+                    while old is not None or cur is not None:
+                        if cur is None or (old is not None
+                                           and old[0] < cur[0]):
+                            write(f, self.DELETED, prev_sid, old[0])
+                            old = next(prevItems, None)
+                            continue
+
+                        if old is None or cur[0] < old[0]:
+                            if stat.S_ISDIR(cur[1][0]):
+                                folder(f, cur[0])
+
+                        else:
+                            if (stat.S_ISDIR(cur[1][0])
+                                    and not stat.S_ISDIR(old[1][0])):
+                                folder(f, cur[0])
+                            old = next(prevItems, None)
+
+                        cur = next(newItems, None)
+
+            except (OSError, ValueError, zlib.error) as e:
+                logger.error('Failed to add permission file changes to change '
+                             'manifest of {}: {}'.format(sid.sid, str(e)),
+                             self)
+                return False
+
+        return True
+
+    @staticmethod
+    def itemizedNames(name):
+        """
+        Possible file names in the ``%n%L`` part of an rsync output line.
+        The ``%L`` suffix (" -> SYMLINK" or " => HARDLINK") can't be told
+        apart from a file name containing the same characters, so all
+        candidates are returned.
+
+        Args:
+            name (str):     ``%n%L`` part of the line
+
+        Returns:
+            list:           file names as :py:class:`bytes` without
+                            trailing slash
+        """
+        names = [name]
+
+        for sep in (' -> ', ' => '):
+            i = name.find(sep)
+            while i >= 0:
+                names.append(name[:i])
+                i = name.find(sep, i + 1)
+
+        return [unescapeRsync(n.encode()).rstrip(b'/') for n in names]
 
     def makeDirs(self, path):
         """
@@ -1115,13 +1762,17 @@ class Snapshots:
                         f' command was {cmd}. Also see the previous '
                         'WARNING message for a more details.', parent=self)
 
-    def _backup_info_file(self, sid):
+    def _backup_info_file(self, sid, stats=None, changes_base=None):
         """
         Save infos about the snapshot into the 'info' file. The result is
         stored in 'sid.info' also.
 
         Args:
             sid (SID): Snapshot that should get the info file.
+            stats (dict): Statistics like :py:func:`snapshotStats` returns.
+            changes_base (str): ID of the snapshot the change manifest of
+                ``sid`` lists all changes against or ``None`` if it is
+                incomplete.
         """
         logger.debug(
             f'Create info file for snapshot "{sid.displayName}".', self)
@@ -1141,15 +1792,56 @@ class Snapshots:
         i.setListValue(
             'group', ('int:gid', 'str:name'), list(self.groupCache.items()))
 
+        for key, value in (stats or {}).items():
+            i.setIntValue('stats.' + key, int(value))
+
+        if changes_base:
+            i.setStrValue('changes_base', changes_base)
+
         sid.info = i
 
-    def backupPermissions(self, sid):
+    def snapshotStats(self, sid):
+        """
+        Statistics of the rsync run which took ``sid``. They predict the
+        progress of the next snapshot (see
+        :py:class:`progress.ProgressEstimator`).
+
+        Args:
+            sid (SID): Snapshot or ``None``.
+
+        Returns:
+            dict: number of ``files``, ``size`` in bytes and ``duration`` in
+            seconds. Empty if ``sid`` is ``None`` or was taken by an older
+            version.
+        """
+        if sid is None:
+            return {}
+
+        info = sid.info
+        stats = {key: info.intValue('stats.' + key, 0)
+                 for key in ('files', 'size', 'duration')}
+
+        if not any(stats.values()):
+            return {}
+
+        return stats
+
+    def backupPermissions(self, sid, prev_sid=None, itemized=None):
         """
         Save permissions (owner, group, read-, write- and executable)
         for all files in Snapshot ``sid`` into snapshots fileInfoDict.
 
+        Files and folders in local snapshots are listed with
+        :py:func:`os.scandir`, in remote snapshots with an rsync dry-run.
+        If ``itemized`` is given, all other entries are unchanged since
+        ``prev_sid`` and their permissions are taken from its fileinfo
+        instead of the source.
+
         Args:
-            sid (SID):  snapshot that should be scanned
+            sid (SID):          snapshot that should be scanned
+            prev_sid (SID):     snapshot ``sid`` was hard-linked against
+            itemized (set):     names (bytes, relative to the source root)
+                                rsync itemized while taking ``sid``
 
         Returns:
             int: Return code of rsync.
@@ -1157,6 +1849,13 @@ class Snapshots:
         logger.info('Save permissions', self)
         self.setTakeSnapshotMessage(0, _('Saving permissions…'))
 
+        if itemized is not None and prev_sid is not None:
+            logger.debug(f'{len(itemized)} files and folders changed since '
+                         f'{prev_sid}', self)
+
+        if self.config.snapshotsMode() in ('local', 'local_encfs'):
+            return self._backupPermissionsLocal(sid, prev_sid, itemized)
+
         fileInfoDict = FileInfoDict()
 
         if self.config.snapshotsMode() == 'ssh_encfs':
@@ -1164,9 +1863,15 @@ class Snapshots:
         else:
             decode = encfstools.Bounce()
 
+        prev = {}
+        if prev_sid is not None and itemized is not None:
+            prev = prev_sid.fileInfo
+
+        user_data = (fileInfoDict, decode, prev, itemized)
+
         # backup permissions of /
         # bugfix for https://github.com/bit-team/backintime/issues/708
-        self.backupPermissionsCallback(b'/', (fileInfoDict, decode))
+        self.collectPermission(fileInfoDict, b'/')
 
         rsync = ['rsync', '--dry-run', '-s', '-r', '--out-format=%n']
         rsync.extend(tools.rsyncSshArgs(self.config))
@@ -1185,7 +1890,7 @@ class Snapshots:
 
             proc = tools.Execute(rsync,
                                  callback=self.backupPermissionsCallback,
-                                 user_data=(fileInfoDict, decode),
+                                 user_data=user_data,
                                  parent=self,
                                  conv_str=False,
                                  join_stderr=False)
@@ -1195,17 +1900,117 @@ class Snapshots:
 
         return rc
 
-    def backupPermissionsCallback(self, line, user_data):
+    def _backupPermissionsLocal(self, sid, prev_sid, itemized):
         """
-        Rsync callback for :py:func:`Snapshots.backupPermissions`.
+        :py:func:`backupPermissions` for local snapshots. The snapshot is
+        walked in the order of the paths in the fileinfo file. So every
+        entry is written into the file when found and the fileinfo of
+        ``prev_sid`` is read sequentially. Nothing is collected in memory.
 
-        Args:
-            line(bytes):        output from rsync command
-            user_data (tuple):  two item tuple of (:py:class:`FileInfoDict`,
-                                :py:class:`encfstools.Decode`)
+        Returns:
+            int:    ``0`` if successful
+        """
+        rc = 0
+        reader = None
+        lookup = None
+
+        if prev_sid is not None and itemized is not None:
+            reader = prev_sid.fileInfoReader()
+            if reader is not None:
+                lookup = reader.lookup()
+            else:
+                lookup = prev_sid.fileInfo.get
+
+        root = os.fsencode(sid.pathBackup())
+
+        def listFolder(folder):
+            try:
+                with os.scandir(os.path.join(root, folder)) as it:
+                    entries = list(it)
+
+            except OSError as e:
+                nonlocal rc
+                logger.error(f'Failed to list {folder}: {str(e)}', self)
+                rc = 1
+                return iter(())
+
+            # The content of a folder is sorted at 'name/' and not directly
+            # after the folder itself (e.g. 'name.txt' is in between). So
+            # descending into it is a separate item.
+            items = []
+            for entry in entries:
+                name = os.path.join(folder, entry.name)
+                items.append((name, entry.is_symlink(), False))
+
+                if entry.is_dir(follow_symlinks=False):
+                    items.append((name + b'/', None, True))
+
+            items.sort()
+            return iter(items)
+
+        try:
+            with fileinfo.FileInfoWriter(sid.path(SID.FILEINFO)) as writer:
+                # backup permissions of /
+                # bugfix for https://github.com/bit-team/backintime/issues/708
+                writer.add(b'/', self.permission(b'/')
+                           or FileInfoDict()[b'/'])
+
+                stack = [listFolder(b'')]
+
+                while stack:
+                    for name, is_symlink, descend in stack[-1]:
+                        if descend:
+                            stack.append(listFolder(name[:-1]))
+                            break
+
+                        path = b'/' + name
+                        info = None
+
+                        # permissions of a link target might have changed
+                        if lookup is not None and not is_symlink \
+                                and name not in itemized:
+                            info = lookup(path)
+
+                        if info is None:
+                            info = self.permission(path)
+
+                        if info is not None:
+                            writer.add(path, info)
+
+                    else:
+                        stack.pop()
+
+        except OSError as e:
+            logger.error('Failed to write {}: {}'.format(SID.FILEINFO, str(e)),
+                         self)
+            rc = 1
+
+        finally:
+            if reader is not None:
+                reader.close()
+
+        return rc
+
+    def backupPermissionsCallback(self, line, user_data):
+        """
+        Rsync callback for :py:func:`Snapshots.backupPermissions`.
+
+        Args:
+            line(bytes):        output from rsync command
+            user_data (tuple):  four item tuple of (:py:class:`FileInfoDict`,
+                                :py:class:`encfstools.Decode`, fileinfo of
+                                the previous snapshot, itemized names)
         """
-        fileInfoDict, decode = user_data
-        self.collectPermission(fileInfoDict, b'/' + decode.path(line).rstrip(b'/'))
+        fileInfoDict, decode, prev, itemized = user_data
+        line = unescapeRsync(line)
+        path = b'/' + decode.path(line).rstrip(b'/')
+
+        if itemized is not None and path in prev \
+                and line.rstrip(b'/') not in itemized:
+            fileInfoDict[path] = prev[path]
+
+        else:
+            self.collectPermission(fileInfoDict, path)
 
     def collectPermission(self, fileinfo, path):
         """
@@ -1220,18 +2025,40 @@ class Snapshots:
             path (bytes): Full path to file or directory.
         """
         assert isinstance(path, bytes), 'path is not bytes type: %s' % path
-        if path and os.path.exists(path):
+        info = self.permission(path)
+
+        if info is not None:
+            fileinfo[path] = info
+
+    def permission(self, path):
+        """
+        Permission, user and group of ``path``.
+
+        Args:
+            path (bytes):   Full path to file or directory.
+
+        Returns:
+            tuple:          (permission, user, group) or ``None`` if
+                            ``path`` doesn't exist
+        """
+        if not path:
+            return None
+
+        try:
             info = os.stat(path)
-            mode = info.st_mode
-            user = self.userName(info.st_uid).encode('utf-8', 'replace')
-            group = self.groupName(info.st_gid).encode('utf-8', 'replace')
-            fileinfo[path] = (mode, user, group)
+
+        except OSError:
+            return None
+
+        return (info.st_mode,
+                self.userName(info.st_uid).encode('utf-8', 'replace'),
+                self.groupName(info.st_gid).encode('utf-8', 'replace'))
 
     def takeSnapshot(self, sid, now, include_folders):
         """This is the main backup routine.
 
         It will take a new snapshot and store permissions of included files
-        and folders into ``fileinfo.bz2``.
+        and folders into ``fileinfo.idx``.
 
         Args:
             sid (SID): snapshot ID which the new snapshot should get
@@ -1261,7 +2088,9 @@ class Snapshots:
         # error-prone.  Use a mutable data structure with named elements
         # instead, e.g. a DataClass
 
-        if new_snapshot.exists() and new_snapshot.saveToContinue:
+        continued = new_snapshot.exists() and new_snapshot.saveToContinue
+
+        if continued:
             logger.info(f"Found leftover snapshot '{new_snapshot.displayID}' "
                         "that can be continued.", self)
 
@@ -1320,15 +2149,18 @@ class Snapshots:
         # rsync prefix & suffix
         rsync_prefix = tools.rsyncPrefix(self.config, no_perms=False)
 
+        # rsync options specific for taking a snapshot
+        rsync_options = []
+
         if self.config.excludeBySizeEnabled():
-            rsync_prefix.append('--max-size=%sM' % self.config.excludeBySize())
+            rsync_options.append('--max-size=%sM' % self.config.excludeBySize())
 
         rsync_suffix = self.rsyncSuffix(include_folders)
 
         # When there is no snapshots it takes the last snapshot from the other folders
         # It should delete the excluded folders then
-        rsync_prefix.extend(('--delete', '--delete-excluded'))
-        rsync_prefix.append('-v')
+        rsync_options.extend(('--delete', '--delete-excluded'))
+        rsync_options.append('-v')
 
         # Use a fixed logging format for the rsync "changed files" list to
         # make it parsable e.g. in rsyncCallback()
@@ -1337,56 +2169,271 @@ class Snapshots:
         # %n = the filename (short form; trailing "/" on dir)
         # %L = the string " -> SYMLINK", " => HARDLINK", or ""
         # (where SYMLINK or HARDLINK is a filename)
+        # %l = the length of the file in bytes
+        # %M = the last-modified time of the file
         # (see log format section in "man rsyncd.conf")
-        rsync_prefix.extend(('-i', '--out-format=BACKINTIME: %i %n%L'))
+        # Size and mtime are split off again in rsyncCallback().
+        rsync_options.extend(('-i', '--out-format=BACKINTIME: %i %n%L %l %M'))
 
         if prev_sid:
             link_dest = encode.path(os.path.join(prev_sid.sid, 'backup'))
             link_dest = os.path.join(os.pardir, os.pardir, link_dest)
-            rsync_prefix.append('--link-dest=%s' % link_dest)
+            rsync_options.append('--link-dest=%s' % link_dest)
+
+        # Keep partially transferred files of an interrupted snapshot for
+        # the next run. Local transfers copy whole files and don't use them.
+        # A relative partial dir is created next to each file, so files
+        # with the same name in different folders don't collide. It must
+        # neither be sent from the source nor be deleted by
+        # --delete-excluded before rsync picks up the partial files.
+        # Leftovers are removed by removePartialDirs().
+        if (self.config.continueInterruptedEnabled()
+                and self.config.snapshotsMode() in ('ssh', 'ssh_encfs')):
+            rsync_options.extend(('--partial-dir=%s' % self.PARTIAL_DIR,
+                                  '--filter=P %s/' % self.PARTIAL_DIR,
+                                  '--exclude=%s/' % self.PARTIAL_DIR))
+
+        rsync_prefix.extend(rsync_options)
+
+        # No quoting (quote='') because of new argument protection of rsync.
+        rsync_dest = self.rsyncRemotePath(
+            new_snapshot.pathBackup(use_mode=['ssh', 'ssh_encfs']),
+            quote='')
+
+        # only transfer the changes found by scanning the source
+        scan = None
+        if (not continued
+                and self.config.scanCacheEnabled()
+                and self.config.snapshotsMode() == 'local'):
+            self._scanFingerprint = self.rsyncFingerprint(
+                [opt for opt in rsync_options
+                 if not opt.startswith('--link-dest=')],
+                rsync_suffix)
+            scan = self.scanSource(
+                prev_sid, include_folders, self._scanFingerprint)
+
+        if (scan is not None
+                and len(scan) == 0
+                and not self.config.takeSnapshotRegardlessOfChanges()):
+            self.remove(new_snapshot)
+            self.nothingChanged(prev_sid, has_errors=False)
+            self.closeScanCache(prev_sid, full=False)
+
+            return [False, False]
+
+        local_copy = scan is None and self.localCopyEnabled()
+
+        # check for changes before rsync creates the hard-link tree
+        if (prev_sid
+                and scan is None
+                and not local_copy
+                and not continued
+                and self.config.checkForChanges()
+                and not self.config.takeSnapshotRegardlessOfChanges()):
+
+            # Without progress information the dry run can stop on the
+            # first change.
+            cmd = tools.rsyncPrefix(self.config, no_perms=False, progress=False)
+            cmd.extend(rsync_options)
+            cmd.append('--dry-run')
+            cmd.extend(rsync_suffix)
+            cmd.append(rsync_dest)
+
+            if self.rsyncDryRunHasChanges(cmd) is False:
+                self.remove(new_snapshot)
+                self.nothingChanged(prev_sid, has_errors=False)
+
+                return [False, False]
 
         # sync changed folders
         logger.info("Call rsync to take the snapshot", self)
         new_snapshot.saveToContinue = True
+
+        # Entries not itemized by rsync are hard-linked from prev_sid and
+        # keep their permissions. Not known for a continued snapshot.
+        if prev_sid and not continued:
+            self._itemized = set()
+        else:
+            self._itemized = None
+        self._changes = self.openChanges(new_snapshot)
+        changes_ok = self._changes is not None
         cmd = rsync_prefix + rsync_suffix
+        cmd.append(rsync_dest)
 
-        # No quoting (quote='') because of new argument protection of rsync.
-        cmd.append(self.rsyncRemotePath(
-            new_snapshot.pathBackup(use_mode=['ssh', 'ssh_encfs']),
-            quote=''))
+        restore_times = []
+        if scan is not None:
+            try:
+                self.linkSnapshot(prev_sid, new_snapshot)
+                restore_times = self.removeScanChanges(new_snapshot, scan)
+
+            except OSError as e:
+                logger.error(f'Failed to link {prev_sid} into the new '
+                             f'snapshot: {str(e)}. Take a full snapshot '
+                             'instead.', self)
+                scan = None
+
+                try:
+                    cleaned = tools.removeTree(new_snapshot.pathBackup())
+                    if cleaned:
+                        os.makedirs(new_snapshot.pathBackup())
+
+                except OSError as e:
+                    logger.error(f'Failed to clean up the new snapshot: '
+                                 f'{str(e)}', self)
+                    cleaned = False
+
+                if not cleaned:
+                    # rsync would change inodes shared with prev_sid. Don't
+                    # continue this snapshot next time either.
+                    new_snapshot.saveToContinue = False
+                    self.setTakeSnapshotMessage(
+                        1,
+                        '{}: {}'.format(_("Can't remove directory"),
+                                        new_snapshot.pathBackup())
+                    )
+                    self._changes.close()
+                    self._changes = None
+                    self.closeScanCache()
+
+                    return [False, True]
+
+        if scan is not None:
+            logger.info(f'Transfer {len(scan.changed)} changed files and '
+                        f'folders only', self)
+            files_from = self.config.takeSnapshotFilesFromFile()
+            with open(files_from, 'wb') as f:
+                for path in scan.changed:
+                    f.write((path.lstrip(b'/') or b'.') + b'\0')
+
+            # rsync must not delete anything in the hard-linked tree.
+            # Removed files are gone already.
+            cmd = [opt for opt in rsync_prefix
+                   if not opt.startswith('--delete')]
+            cmd.extend(('--files-from=' + files_from,
+                        '--from0',
+                        '--no-recursive'))
+            cmd.extend(rsync_suffix)
+            cmd.append(rsync_dest)
+
+            if scan.deleted:
+                params[1] = True
 
         self.setTakeSnapshotMessage(0, _('Taking snapshot'))
 
-        # run rsync
-        proc = tools.Execute(cmd,
-                             # TODO
-                             # interprets the user_data in params as: list of
-                             # two bool [error, changes] but params is reused
-                             # as return value of this function with [changes,
-                             # error]. Use a separate variable to avoid
-                             # confusion!
-                             callback=self.rsyncCallback,
-                             user_data=params,
-                             filters=(self.filterRsyncProgress,),
-                             parent=self)
+        shards = []
+        fingerprint = None
+        workers = 1
+        if self.config.parallelRsyncEnabled():
+            workers = self.config.parallelRsyncWorkers()
+
+        if scan is None and not local_copy:
+            if not continued:
+                shards = self.includeShards(include_folders, workers)
+
+            if self.config.continueInterruptedEnabled():
+                fingerprint = self.rsyncFingerprint(rsync_options,
+                                                    rsync_suffix)
+                done = None
+                if continued:
+                    done = new_snapshot.checkpoints(fingerprint)
+
+                if done:
+                    # continue the rsync processes which didn't finish
+                    shards = [shard for shard in self.includeShards(
+                                  include_folders, workers)
+                              if shard not in done]
+                    logger.info(f'Skip {len(done)} include groups finished '
+                                'before', self)
+
+                elif len(shards) > 1:
+                    # each finished rsync process is a checkpoint for
+                    # continuing an interrupted snapshot
+                    new_snapshot.startCheckpoints(fingerprint)
 
-        # TODO
-        # introduce centralized log msg builder to avoid spread severity level
-        # indicators like "[I]" here?
-        self.snapshotLog.append('[I] ' + proc.printable_cmd, 3)
+                else:
+                    # A single rsync process has no checkpoints. Its output
+                    # can't tell when an include item is finished because
+                    # the generator itemizes the next items while the
+                    # receiver still transfers files. The continued run
+                    # transfers all include items again and skips the
+                    # files already in new_snapshot. With
+                    # --delete-excluded it also cleans up whatever the
+                    # interrupted run left.
+                    fingerprint = None
+
+        if local_copy:
+            rsync_exit_code = self.localCopy(
+                new_snapshot, prev_sid, include_folders, params)
+
+        elif fingerprint is not None:
+            rsync_exit_code = self.rsyncShards(
+                shards, rsync_options, rsync_dest, params, workers,
+                lambda shard: new_snapshot.addCheckpoint(fingerprint, shard))
+
+        elif len(shards) > 1:
+            rsync_exit_code = self.rsyncShards(
+                shards, rsync_options, rsync_dest, params)
 
-        # TODO
-        # Process return value with rsync exit code to recognize errors that
-        # cannot be recognized by parsing the rsync output currently
-
-        rsync_exit_code = proc.run()
-            # Fix for #1491 and #489
-            # Note that the return value (containing the exit code) of the
-            # rsync child process is not the only way to detect errors (and
-            # sometimes not reliably delivers <> 0 in case of an error):
-            # Errors are also indicated via the pass-by-ref argument
-            # user_data="params" list (updated by the callback function that
-            # parses the rsync output for error message patterns).
+        else:
+            # run rsync
+            proc = tools.Execute(cmd,
+                                 # TODO
+                                 # interprets the user_data in params as: list of
+                                 # two bool [error, changes] but params is reused
+                                 # as return value of this function with [changes,
+                                 # error]. Use a separate variable to avoid
+                                 # confusion!
+                                 callback=self.rsyncCallback,
+                                 user_data=params,
+                                 filters=(self.filterRsyncProgress,),
+                                 parent=self,
+                                 streaming=True)
+
+            # TODO
+            # introduce centralized log msg builder to avoid spread severity level
+            # indicators like "[I]" here?
+            self.snapshotLog.append('[I] ' + proc.printable_cmd, 3)
+
+            # TODO
+            # Process return value with rsync exit code to recognize errors that
+            # cannot be recognized by parsing the rsync output currently
+
+            self._progressEstimator = progress.ProgressEstimator(
+                **self.snapshotStats(prev_sid))
+            rsync_exit_code = proc.run()
+                # Fix for #1491 and #489
+                # Note that the return value (containing the exit code) of the
+                # rsync child process is not the only way to detect errors (and
+                # sometimes not reliably delivers <> 0 in case of an error):
+                # Errors are also indicated via the pass-by-ref argument
+                # user_data="params" list (updated by the callback function that
+                # parses the rsync output for error message patterns).
+
+        self.flushRsyncStatus()
+
+        # statistics for the progress of the next snapshot. Runs which
+        # didn't see the whole source keep those of the previous snapshot.
+        estimator = self._progressEstimator
+        self._progressEstimator = None
+        stats = self.snapshotStats(prev_sid)
+        if estimator is not None and estimator.complete and scan is None:
+            stats = {'files': estimator.files,
+                     'size': estimator.sent,
+                     'duration': time.monotonic() - estimator.start}
+
+        # folders which lost entries in the hard-linked tree
+        for folder, st in restore_times:
+            try:
+                os.utime(folder, ns=(st.st_atime_ns, st.st_mtime_ns))
+            except OSError:
+                pass
+
+        itemized = self._itemized
+        self._itemized = None
+
+        if self._changes is not None:
+            self._changes.close()
+            self._changes = None
 
         # cleanup
         try:
@@ -1397,6 +2444,10 @@ class Snapshots:
                          % (self.config.takeSnapshotProgressFile(), str(e)),
                          self)
 
+        if scan is not None:
+            Path(self.config.takeSnapshotFilesFromFile()).unlink(
+                missing_ok=True)
+
         # handle errors
         # TODO
         # Fix inconsistent usage: Collects return value, but errors are also
@@ -1437,11 +2488,27 @@ class Snapshots:
                    + _("Negative rsync exit codes are signal numbers, see "
                        "'kill -l' and 'man kill'"))
 
+        # the scanned state of the source is only kept if rsync
+        # transferred everything
+        scan_ok = rsync_exit_code in (0, 24) and not params[0]
+
+        # an interrupted snapshot (signal, lost connection, timeout) is
+        # continued by the next run
+        if (self.config.continueInterruptedEnabled()
+                and (rsync_exit_code < 0
+                     or rsync_exit_code in (12, 20, 30, 35, 255))):
+            logger.info('Keep the interrupted snapshot to continue it next '
+                        'time', self)
+            self.closeScanCache()
+
+            return [False, True]
+
         # params[0] -> error?
         if params[0]:
 
             if not self.config.continueOnErrors():
                 self.remove(new_snapshot)
+                self.closeScanCache()
 
                 return [False, True]
 
@@ -1452,24 +2519,27 @@ class Snapshots:
         if not params[1] and not self.config.takeSnapshotRegardlessOfChanges():
 
             self.remove(new_snapshot)
-
-            logger.info("Nothing changed, no new snapshot necessary", self)
-            self.snapshotLog.append(
-                '[I] ' + _('Nothing changed, no new snapshot necessary'), 3)
-
-            if prev_sid:
-                prev_sid.setLastChecked()
-
-            if not has_errors:
-                tools.writeTimeStamp(self.config.anacronSpoolFile())
+            self.nothingChanged(prev_sid, has_errors)
+            self.closeScanCache(prev_sid if scan_ok else None,
+                                full=scan is None)
 
             # Part of fix for #1491:
             # Returns "has_errors" instead of False now to signal rsync errors
             # (which may have prevented processing any changes)
             return [False, has_errors]
 
+        if (self.config.continueInterruptedEnabled()
+                and self.config.snapshotsMode() in ('ssh', 'ssh_encfs')):
+            self.removePartialDirs(new_snapshot)
+
         self.backupConfig(new_snapshot)
-        self.backupPermissions(new_snapshot)
+        self.backupPermissions(new_snapshot, prev_sid, itemized)
+        # Changes of a continued snapshot may be spread over runs with
+        # different results of openChanges()
+        changes_base = None
+        if (self.addFileInfoChanges(new_snapshot, prev_sid)
+                and changes_ok and not continued):
+            changes_base = prev_sid.sid
 
         # copy snapshot log
         try:
@@ -1489,6 +2559,7 @@ class Snapshots:
             # ignored (just logged)!
 
         new_snapshot.saveToContinue = False
+        new_snapshot.removeCheckpoints()
 
         # rename snapshot
         os.rename(new_snapshot.path(), sid.path())
@@ -1503,10 +2574,16 @@ class Snapshots:
                 .format(new_path=new_snapshot.path(), path=sid.path())
             )
             time.sleep(2)  # max 1 backup / second
+            self.closeScanCache()
 
             return [False, True]
 
-        self._backup_info_file(sid)
+        self._backup_info_file(sid, stats, changes_base)
+        sid.updateCatalog()
+        self.closeScanCache(sid if scan_ok else None, full=scan is None)
+
+        if self.config.dedupEnabled():
+            self.deduplicate(sid)
 
         if not has_errors:
             tools.writeTimeStamp(self.config.anacronSpoolFile())
@@ -1516,6 +2593,555 @@ class Snapshots:
 
         return [True, has_errors]
 
+    def removePartialDirs(self, new_snapshot):
+        """Remove the :py:data:`PARTIAL_DIR` folders in ``new_snapshot``.
+        rsync keeps partially transferred files there if it couldn't finish
+        them, e.g. because the source file vanished in between. These are
+        protected from ``--delete-excluded`` and would end up in the
+        snapshot otherwise.
+
+        The folders are searched with ``find`` on the remote host instead
+        of walking the whole snapshot over the mount.
+
+        Args:
+            new_snapshot (NewSnapshot): snapshot before it is renamed
+        """
+        path = new_snapshot.pathBackup(use_mode=['ssh', 'ssh_encfs'])
+        cmd = self.config.sshCommand(['find', shlex.quote(path),
+                                      '-type', 'd',
+                                      '-name', self.PARTIAL_DIR,
+                                      '-prune',
+                                      '-exec', 'rm', '-rf', '{}', '+'],
+                                     nice=False,
+                                     ionice=False)
+        rc = tools.Execute(cmd).run()
+
+        if rc != 0:
+            logger.warning(f'Failed to remove {self.PARTIAL_DIR} folders in '
+                           f'{path}: find returned {rc}', self)
+
+    def includeShards(self, include_folders, count):
+        """Split ``include_folders`` into at most ``count`` shards which can
+        be transferred by concurrent rsync processes.
+
+        Include items nested inside another include item stay in the same
+        shard as their parent item, so that no path is transferred by two
+        processes. If ``/`` is included there is nothing to split.
+
+        Args:
+            include_folders (list): Folders to include. List of tuples
+                (item, int) where ``int`` is ``0`` if ``item`` is a folder
+                or ``1`` if ``item`` is a file.
+            count (int): Maximum number of shards.
+
+        Returns:
+            list: List of shards, each a list like ``include_folders``.
+        """
+        if any(item[0] == '/' for item in include_folders):
+            return [list(include_folders)]
+
+        # group nested items together; sorting by path components makes sure
+        # that all items inside a folder follow that folder directly
+        groups = []
+        for item in sorted(include_folders,
+                           key=lambda i: i[0].rstrip('/').split('/')):
+            if groups:
+                root = groups[-1][0][0].rstrip('/')
+                if item[0] == root or item[0].startswith(root + '/'):
+                    groups[-1].append(item)
+                    continue
+
+            groups.append([item])
+
+        shards = [[] for _ in range(min(max(1, count), len(groups)))]
+        for idx, group in enumerate(groups):
+            shards[idx % len(shards)].extend(group)
+
+        return shards
+
+    def rsyncShards(self, shards, rsync_options, rsync_dest, params,
+                    workers=None, checkpoint=None):
+        """Take the snapshot with one rsync process per shard running
+        concurrently into the same destination. See :py:func:`includeShards`.
+
+        ``--delete-excluded`` is not used because each process would delete
+        the files of all other shards. This is safe only because the
+        destination is a fresh ``new_snapshot`` or one continued with the
+        same options.
+
+        Args:
+            shards (list): Include lists for each rsync process.
+            rsync_options (list): rsync options used by
+                :py:func:`takeSnapshot`.
+            rsync_dest (str): rsync destination argument.
+            params (list): List of two bool ``[error, changes]`` set like in
+                :py:func:`rsyncCallback` if any of the shards reported errors
+                or changes.
+            workers (int): Maximum number of concurrent processes. All
+                shards run at once if ``None``. A single worker shows the
+                progress of the current shard.
+            checkpoint (method): Called with each shard which finished
+                without errors.
+
+        Returns:
+            int: The first exit code treated as error by
+            :py:func:`takeSnapshot` or the highest exit code of all shards.
+        """
+        options = [opt for opt in rsync_options if opt != '--delete-excluded']
+        lock = threading.Lock()
+        shard_params = []
+        procs = []
+        progress = workers == 1
+
+        def callback(line, user_data):
+            # one combined snapshot log and message file for all shards
+            with lock:
+                self.rsyncCallback(line, user_data)
+
+        def finished(idx, code):
+            if checkpoint is not None \
+                    and code in (0, 24) and not shard_params[idx][0]:
+                with lock:
+                    checkpoint(shards[idx])
+
+        for shard in shards:
+            # progress of concurrent processes can't be combined
+            cmd = tools.rsyncPrefix(self.config, no_perms=False,
+                                    progress=progress)
+            cmd.extend(options)
+            cmd.extend(self.rsyncSuffix(shard))
+            cmd.append(rsync_dest)
+
+            shard_params.append([False, False])
+            proc = tools.Execute(cmd,
+                                 callback=callback,
+                                 user_data=shard_params[-1],
+                                 filters=(self.filterRsyncProgress,)
+                                 if progress else (),
+                                 parent=self,
+                                 streaming=True)
+            self.snapshotLog.append('[I] ' + proc.printable_cmd, 3)
+            procs.append(proc)
+
+        logger.info(f'Run {len(procs)} rsync processes '
+                    f'{"one by one" if progress else "in parallel"}', self)
+        codes = tools.runParallel(procs, workers or len(procs), finished)
+
+        params[0] = params[0] or any(p[0] for p in shard_params)
+        params[1] = params[1] or any(p[1] for p in shard_params)
+
+        for code in codes:
+            if code not in (0, 23, 24):
+                return code
+
+        return max(codes, default=0)
+
+    def rsyncFingerprint(self, rsync_options, rsync_suffix):
+        """Hash of the rsync arguments which decide what a snapshot
+        contains.
+
+        Args:
+            rsync_options (list): rsync options used by
+                :py:func:`takeSnapshot`.
+            rsync_suffix (list): include and exclude arguments.
+
+        Returns:
+            str: md5 hex digest
+        """
+        return hashlib.md5('\0'.join(
+            tools.rsyncPrefix(self.config, no_perms=False, progress=False)
+            + rsync_options
+            + rsync_suffix).encode()).hexdigest()
+
+    def scanSource(self, prev_sid, include_folders, fingerprint):
+        """Update the source scan cache of the profile and decide if the
+        snapshot can be taken with only the changes found. See
+        :py:mod:`scancache`.
+
+        A full rsync run is needed if the cache doesn't belong to
+        ``prev_sid`` or other settings, if there are too many changes, if
+        a folder couldn't be listed or if the last full run is older than
+        ``snapshots.scan_cache.full_days``. The cache stays open until
+        :py:func:`closeScanCache`.
+
+        Args:
+            prev_sid (SID): previous snapshot or ``None``
+            include_folders (list): folders to include. list of tuples
+                (item, int) where ``int`` is 0 if ``item`` is a folder or 1
+                if ``item`` is a file
+            fingerprint (str): hash of all rsync options which change what
+                is included in a snapshot
+
+        Returns:
+            scancache.ScanResult: differences since ``prev_sid`` or ``None``
+            if a full rsync run is needed
+        """
+        logger.info('Scan source for changes', self)
+        self.setTakeSnapshotMessage(0, _('Scanning for changes…'))
+
+        try:
+            self._scanCache = scancache.ScanCache(self.config.scanCacheFile())
+            self._scanCache.open()
+
+        except sqlite3.Error as e:
+            logger.error(f'Failed to open scan cache: {str(e)}', self)
+            self._scanCache = None
+            return None
+
+        cache = self._scanCache
+        incremental = (prev_sid is not None
+                       and cache.isValid(prev_sid.sid, fingerprint))
+        if not incremental:
+            cache.clear()
+
+        age = time.time() - cache.lastFullScan()
+        if age > self.config.scanCacheFullDays() * 24 * 60 * 60:
+            incremental = False
+
+        # rsync copies the targets of symlinks which the scan doesn't follow
+        if self.config.copyLinks() or self.config.copyUnsafeLinks():
+            incremental = False
+
+        result = cache.scan(include_folders,
+                            exclude=self.sourceExcludeFilter(),
+                            one_file_system=self.config.oneFileSystem(),
+                            limit=self.config.scanCacheMaxChanges())
+
+        logger.debug(f'Scanned {result.count} files and folders, '
+                     f'{len(result.changed)} changed, '
+                     f'{len(result.deleted)} deleted', self)
+
+        if result.overflow or result.errors or not incremental:
+            return None
+
+        return result
+
+    def closeScanCache(self, sid=None, full=True):
+        """Close the cache opened by :py:func:`scanSource`. If ``sid`` is
+        given the scanned state is kept for the next snapshot, otherwise it
+        is dropped.
+
+        Args:
+            sid (SID): snapshot which contains the scanned state of the
+                source. That is the new snapshot or the previous one if
+                nothing changed
+            full (bool): ``True`` if ``sid`` was taken with a full rsync run
+        """
+        if self._scanCache is None:
+            return
+
+        try:
+            if sid is not None:
+                self._scanCache.commit(sid.sid, self._scanFingerprint, full)
+            self._scanCache.close()
+
+        except sqlite3.Error as e:
+            logger.error(f'Failed to save scan cache: {str(e)}', self)
+
+        self._scanCache = None
+
+    def linkSnapshot(self, sid, new_snapshot):
+        """Recreate the backup folder of ``sid`` in ``new_snapshot`` with
+        hard links. Folders are created with the mode, owner and times of
+        the folders in ``sid``.
+
+        Args:
+            sid (SID): snapshot to link to
+            new_snapshot (NewSnapshot): snapshot with an empty backup folder
+
+        Raises:
+            OSError: if an entry couldn't be linked or created
+        """
+        source = os.fsencode(sid.pathBackup())
+        dest = os.fsencode(new_snapshot.pathBackup())
+        folders = [(source, dest)]
+        done = []
+
+        while folders:
+            src_folder, dest_folder = folders.pop()
+            done.append((src_folder, dest_folder))
+
+            with os.scandir(src_folder) as it:
+                for entry in it:
+                    target = os.path.join(dest_folder, entry.name)
+
+                    if entry.is_dir(follow_symlinks=False):
+                        os.mkdir(target)
+                        folders.append((entry.path, target))
+                    else:
+                        os.link(entry.path, target, follow_symlinks=False)
+
+        # children first, so their creation doesn't change the times again
+        for src_folder, dest_folder in reversed(done):
+            st = os.lstat(src_folder)
+            try:
+                os.lchown(dest_folder, st.st_uid, st.st_gid)
+            except PermissionError:
+                pass
+            shutil.copystat(src_folder, dest_folder, follow_symlinks=False)
+
+    def removeScanChanges(self, new_snapshot, result):
+        """Remove all entries found by :py:func:`scanSource` from the tree
+        created by :py:func:`linkSnapshot`. rsync would change files in
+        place otherwise and with them the previous snapshot, which shares
+        their inodes. Folders which are still folders in the source stay.
+
+        Args:
+            new_snapshot (NewSnapshot): new snapshot
+            result (scancache.ScanResult): changes found by the scan
+
+        Returns:
+            list: (folder, :py:class:`os.stat_result`) tuples of all folders
+            in ``new_snapshot`` which must get back their times after rsync
+            ran, because they contain removed entries but are not synced
+            themselves
+        """
+        root = os.fsencode(new_snapshot.pathBackup())
+        changed = set(result.changed)
+        parents = {}
+        # folders made writable for their owner and their original mode
+        modes = {}
+
+        try:
+            for path in result.deleted + result.changed:
+                target = root + path
+
+                try:
+                    st = os.lstat(target)
+                except FileNotFoundError:
+                    continue
+
+                if stat.S_ISDIR(st.st_mode) and path in changed \
+                        and os.path.isdir(path) and not os.path.islink(path):
+                    continue
+
+                parent = os.path.dirname(path)
+                parent_st = os.lstat(os.path.dirname(target))
+                if parent not in changed and parent not in parents:
+                    parents[parent] = parent_st
+
+                # folders are copied with their mode by linkSnapshot
+                if parent not in modes \
+                        and parent_st.st_mode & stat.S_IRWXU != stat.S_IRWXU:
+                    os.chmod(root + parent, parent_st.st_mode | stat.S_IRWXU)
+                    modes[parent] = parent_st.st_mode
+
+                if stat.S_ISDIR(st.st_mode):
+                    if not tools.removeTree(os.fsdecode(target)):
+                        raise OSError(f'Failed to remove {target}')
+                else:
+                    os.remove(target)
+
+        finally:
+            for parent, mode in modes.items():
+                try:
+                    os.chmod(root + parent, mode)
+                except FileNotFoundError:
+                    pass
+
+        return [(root + parent, st) for parent, st in parents.items()]
+
+    def sourceExcludeFilter(self):
+        """Exclude patterns of the profile plus the folders rsync always
+        excludes (see :py:func:`rsyncSuffix`).
+
+        Returns:
+            scancache.ExcludeFilter: filter for paths in the source
+        """
+        return scancache.ExcludeFilter(
+            [self.config.snapshotsPath(),
+             self.config._LOCAL_DATA_FOLDER,
+             self.config._MOUNT_ROOT]
+            + self.config.exclude())
+
+    def localCopyEnabled(self):
+        """Check if the snapshot is taken with :py:mod:`localcopy` instead
+        of rsync. Only in mode 'local' and if no option is used which only
+        rsync supports.
+
+        Returns:
+            bool: ``True`` if copy engine 'python' is used
+        """
+        if self.config.copyEngine() != 'python' \
+                or self.config.snapshotsMode() != 'local':
+            return False
+
+        unsupported = []
+        if self.config.copyLinks() or self.config.copyUnsafeLinks():
+            unsupported.append('copy links')
+        if self.config.preserveAcl() or self.config.preserveXattr():
+            unsupported.append('ACL and extended attributes')
+        if self.config.useChecksum() or self.config.forceUseChecksum:
+            unsupported.append('checksums')
+        if self.config.bwlimitEnabled():
+            unsupported.append('bandwidth limit')
+        if self.config.rsyncOptionsEnabled():
+            unsupported.append('additional rsync options')
+
+        patterns = self.sourceExcludeFilter().unsupported
+        if patterns:
+            unsupported.append('exclude patterns ' + ', '.join(patterns))
+
+        if unsupported:
+            logger.info('Copy engine \'python\' doesn\'t support {}. '
+                        'Use rsync instead.'.format('; '.join(unsupported)),
+                        self)
+            return False
+
+        return True
+
+    def localCopy(self, new_snapshot, prev_sid, include_folders, params):
+        """Take the snapshot with :py:class:`localcopy.LocalCopy` instead of
+        rsync. Changes are reported through :py:func:`localCopyCallback`
+        just like rsync's output through :py:func:`rsyncCallback`.
+
+        Args:
+            new_snapshot (NewSnapshot): snapshot to fill
+            prev_sid (SID): previous snapshot to hard link to or ``None``
+            include_folders (list): folders to include. list of tuples
+                (item, int) where ``int`` is 0 if ``item`` is a folder or 1
+                if ``item`` is a file
+            params (list): list of two bool '[error, changes]' like in
+                :py:func:`rsyncCallback`
+
+        Returns:
+            int: exit code like rsync's. 0 on success, 23 if some entries
+            couldn't be copied or 24 if some vanished while copying
+        """
+        max_size = 0
+        if self.config.excludeBySizeEnabled():
+            max_size = self.config.excludeBySize() * 1024 * 1024
+
+        engine = localcopy.LocalCopy(
+            include_folders,
+            new_snapshot.pathBackup(),
+            link_dest=prev_sid.pathBackup() if prev_sid else None,
+            exclude=self.sourceExcludeFilter(),
+            workers=self.config.copyEngineWorkers(),
+            one_file_system=self.config.oneFileSystem(),
+            max_size=max_size)
+
+        self.snapshotLog.append('[I] Copy with copy engine \'python\'', 3)
+
+        if engine.run(lambda change: self.localCopyCallback(change, params)):
+            # vanished files are only a warning like with rsync
+            exit_code = 24 if engine.vanished else 0
+        else:
+            for error in engine.errors:
+                self.setTakeSnapshotMessage(1, 'Error: ' + error)
+            params[0] = True
+            exit_code = 23
+
+        logger.info(f'Copy engine linked {engine.linked} and copied '
+                    f'{engine.copied} files ({engine.copiedBytes} bytes)',
+                    self)
+
+        return exit_code
+
+    def localCopyCallback(self, change, params):
+        """Count, log and record one :py:class:`localcopy.Change` like
+        :py:func:`rsyncCallback` does with an itemized line of rsync.
+
+        Args:
+            change (localcopy.Change): created or updated entry
+            params (list): list of two bool '[error, changes]'
+        """
+        name = escapeRsync(change.path)
+        message = _('Take snapshot') + ' (%s %s)' % (change.flags, name)
+        self.snapshotLog.append('[I] ' + message, 3)
+
+        if change.flags[0] != '.' and change.flags[:2] != 'cd':
+            params[1] = True
+            self.snapshotLog.append('[C] %s %s' % (change.flags, name), 2)
+
+            if self._changes is not None:
+                self.writeChange(change.flags, change.size, change.mtime,
+                                 name)
+
+        if self._itemized is not None:
+            self._itemized.add(change.path.rstrip(b'/'))
+
+        now = time.monotonic()
+        if now - self._rsyncMessageTime >= self.RSYNC_STATUS_INTERVAL:
+            self._rsyncMessageTime = now
+            self._sendTakeSnapshotMessage(0, message)
+
+        else:
+            self._rsyncMessage = message
+
+    def nothingChanged(self, prev_sid, has_errors):
+        """Log that no new snapshot was necessary and mark the previous
+        snapshot ``prev_sid`` as checked right now.
+
+        Args:
+            prev_sid (SID): Previous snapshot or ``None``.
+            has_errors (bool): ``True`` if errors happened while checking.
+        """
+        logger.info("Nothing changed, no new snapshot necessary", self)
+        self.snapshotLog.append(
+            '[I] ' + _('Nothing changed, no new snapshot necessary'), 3)
+
+        if prev_sid:
+            prev_sid.setLastChecked()
+
+        if not has_errors:
+            tools.writeTimeStamp(self.config.anacronSpoolFile())
+
+    def rsyncDryRunHasChanges(self, cmd):
+        """Run ``cmd`` (an rsync dry run using the itemized
+        ``--out-format`` of :py:func:`takeSnapshot`) and check if it would
+        transfer or delete anything. rsync is terminated on the first change.
+
+        Args:
+            cmd (list): rsync command including ``--dry-run``.
+
+        Returns:
+            bool: ``True`` if there are changes, ``False`` if there are none
+            or ``None`` if that is unknown because rsync reported errors.
+        """
+        logger.info('Check for changes with rsync dry run', self)
+        self.setTakeSnapshotMessage(0, _('Checking for changes…'))
+
+        # [changes, error, Execute instance]
+        params = [False, False, None]
+        proc = tools.Execute(cmd,
+                             callback=self.rsyncDryRunCallback,
+                             user_data=params,
+                             parent=self)
+        params[2] = proc
+        rc = proc.run()
+
+        if params[0]:
+            return True
+
+        if rc != 0 or params[1]:
+            logger.warning('rsync dry run failed with exit code '
+                           f'{rc}. Take the snapshot anyway.', self)
+            return None
+
+        return False
+
+    def rsyncDryRunCallback(self, line, params):
+        """
+        Callback for :py:func:`rsyncDryRunHasChanges`. Uses the same rules as
+        :py:func:`rsyncCallback` to detect changes and errors but doesn't log
+        anything.
+
+        Args:
+            line (str):     stdout line from rsync
+            params (list):  list of ``[changes, error, Execute]``
+        """
+        if line.startswith('rsync:') and line.endswith(')'):
+            if not line.startswith(('rsync: chgrp ', 'rsync: chown ')):
+                params[1] = True
+
+        elif (len(line) >= 13
+                and line.startswith('BACKINTIME: ')
+                and line[12] != '.'
+                and line[12:14] != 'cd'):
+            params[0] = True
+            params[2].terminate()
+
     def smartRemoveKeepAll(self,
                            snapshots,
                            min_date,
@@ -1652,80 +3278,141 @@ class Snapshots:
         if now_full is None:
             now_full = datetime.datetime.today()
 
-        now = now_full.date()
+        keep = self.smartRemoveKeep(snapshots,
+                                    now_full.date(),
+                                    keep_all,
+                                    keep_one_per_day,
+                                    keep_one_per_week,
+                                    keep_one_per_month)
+
+        logger.debug(f'Keep snapshots: {keep}', self)
+
+        return [sid for sid in snapshots if sid not in keep]
+
+    def smartRemoveKeep(self,
+                        snapshots,
+                        now,
+                        keep_all,
+                        keep_one_per_day,
+                        keep_one_per_week,
+                        keep_one_per_month):
+        """
+        Apply the Smart Removal rules to ``snapshots`` and collect the
+        reasons why a snapshot is kept.
+
+        The snapshot IDs are sorted once. Each time interval of a rule is
+        then resolved with a binary search instead of scanning all
+        snapshots for every interval. Same as in
+        :py:func:`smartRemoveKeepFirst` the newest healthy snapshot of each
+        interval is kept or the newest one if all have failed.
+
+        Args:
+            snapshots (list):           :py:class:`SID` objects sorted
+                                        newest first like
+                                        :py:func:`listSnapshots` returns them
+            now (datetime.date):        date when takeSnapshot was started
+            keep_all (int):             keep all snapshots for the
+                                        last ``keep_all`` days
+            keep_one_per_day (int):     keep one snapshot per day for the
+                                        last ``keep_one_per_day`` days
+            keep_one_per_week (int):    keep one snapshot per week for the
+                                        last ``keep_one_per_week`` weeks
+            keep_one_per_month (int):   keep one snapshot per month for the
+                                        last ``keep_one_per_month`` months
+
+        Returns:
+            dict:                       snapshots that should be kept as keys
+                                        and a list of reasons (str) as values
+        """
+        keep = {}
+
+        if not snapshots:
+            return keep
+
+        # ascending order for bisect. Compare on the date only, the tag of
+        # the SIDs may differ from the current profile's tag
+        oldest_first = snapshots[::-1]
+        dates = [sid.date for sid in oldest_first]
+
+        # index of the newest healthy snapshot up to each index or -1
+        healthy = []
+        last_healthy = -1
+        for idx, sid in enumerate(oldest_first):
+            if not sid.failed:
+                last_healthy = idx
+            healthy.append(last_healthy)
+
+        def interval(min_date, max_date):
+            # index range of snapshots >= min_date and < max_date
+            min_date = datetime.datetime.combine(min_date, datetime.time())
+            max_date = datetime.datetime.combine(max_date, datetime.time())
+            return (bisect.bisect_left(dates, min_date),
+                    bisect.bisect_left(dates, max_date))
+
+        def add(sid, reason):
+            keep.setdefault(sid, []).append(reason)
+
+        def keepFirst(min_date, max_date, reason):
+            first, end = interval(min_date, max_date)
+            if first == end:
+                return
+
+            idx = healthy[end - 1]
+            if idx < first:
+                # all snapshots failed: keep the newest no matter if it has
+                # errors
+                idx = end - 1
+
+            add(oldest_first[idx], reason)
 
         # keep the last snapshot
-        keep = set([snapshots[0]])
+        add(snapshots[0], 'last snapshot')
 
         # keep all for the last keep_all days
         if keep_all > 0:
-            keep |= self.smartRemoveKeepAll(
-                snapshots,
-                now - datetime.timedelta(days=keep_all-1),
-                now + datetime.timedelta(days=1))
+            first, end = interval(now - datetime.timedelta(days=keep_all-1),
+                                  now + datetime.timedelta(days=1))
+            for sid in oldest_first[first:end]:
+                add(sid, f'all for the last {keep_all} days')
 
         # keep one per day for the last keep_one_per_day days
-        if keep_one_per_day > 0:
-            d = now
-            for i in range(0, keep_one_per_day):
-                keep |= self.smartRemoveKeepFirst(
-                    snapshots,
-                    d,
-                    d + datetime.timedelta(days=1),
-                    keep_healthy=True)
-                d -= datetime.timedelta(days=1)
+        d = now
+        for i in range(0, keep_one_per_day):
+            keepFirst(d, d + datetime.timedelta(days=1), f'one per day ({d})')
+            d -= datetime.timedelta(days=1)
 
         # keep one per week for the last keep_one_per_week weeks
-        if keep_one_per_week > 0:
-            d = now - datetime.timedelta(days=now.weekday() + 1)
-
-            for i in range(0, keep_one_per_week):
-                keep |= self.smartRemoveKeepFirst(
-                    snapshots,
-                    d,
-                    d + datetime.timedelta(days=8),
-                    keep_healthy=True)
-                d -= datetime.timedelta(days=7)
+        d = now - datetime.timedelta(days=now.weekday() + 1)
+        for i in range(0, keep_one_per_week):
+            keepFirst(d, d + datetime.timedelta(days=8),
+                      f'one per week (from {d})')
+            d -= datetime.timedelta(days=7)
 
         # keep one per month for the last keep_one_per_month months
-        if keep_one_per_month > 0:
-            d1 = datetime.date(now.year, now.month, 1)
-            d2 = self.incMonth(d1)
-
-            for i in range(0, keep_one_per_month):
-                keep |= self.smartRemoveKeepFirst(
-                    snapshots, d1, d2, keep_healthy=True)
-                d2 = d1
-                d1 = self.decMonth(d1)
+        d1 = datetime.date(now.year, now.month, 1)
+        d2 = self.incMonth(d1)
+        for i in range(0, keep_one_per_month):
+            keepFirst(d1, d2, f'one per month ({d1:%Y-%m})')
+            d2 = d1
+            d1 = self.decMonth(d1)
 
         # keep one per year for all years
-        first_year = int(snapshots[-1].sid[:4])
-
+        first_year = snapshots[-1].date.year
         for i in range(first_year, now.year+1):
-            keep |= self.smartRemoveKeepFirst(snapshots,
-                                              datetime.date(i, 1, 1),
-                                              datetime.date(i+1, 1, 1),
-                                              keep_healthy=True)
-
-        logger.debug(f'Keep snapshots: {keep}', self)
-
-        del_snapshots = []
-
-        for sid in snapshots:
-            if sid in keep:
-                continue
+            keepFirst(datetime.date(i, 1, 1),
+                      datetime.date(i+1, 1, 1),
+                      f'one per year ({i})')
 
-            if self.config.dontRemoveNamedSnapshots():
-                if sid.name:
+        if self.config.dontRemoveNamedSnapshots():
+            for sid in snapshots:
+                if sid not in keep and sid.name:
                     logger.debug(
                         f'Keep snapshot: {sid}, because it has a name', self)
-                    continue
-
-            del_snapshots.append(sid)
+                    add(sid, 'has a name')
 
-        return del_snapshots
+        return keep
 
-    def smartRemove(self, del_snapshots, log = None):
+    def smartRemove(self, del_snapshots, log = None, trash = False):
         """
         Remove multiple snapshots either with
         :py:func:`Snapshots.remove` or in background on the remote host
@@ -1735,6 +3422,8 @@ class Snapshots:
         Args:
             del_snapshots (list):   list of :py:class:`SID` that should be removed
             log (method):           callable method that will handle progress log
+            trash (bool):           move local snapshots into the trash with
+                                    :py:func:`moveToTrash` instead
         """
         if not del_snapshots:
             return
@@ -1817,8 +3506,13 @@ class Snapshots:
                         %del_snapshots, self)
 
             for i, sid in enumerate(del_snapshots, 1):
-                log(_('Smart removal') + ' %s/%s' %(i, len(del_snapshots)))
-                self.remove(sid)
+                msg = _('Smart removal') + ' %s/%s' %(i, len(del_snapshots))
+                log(msg)
+                if trash:
+                    self.moveToTrash(sid)
+                else:
+                    self.remove(sid,
+                                callback=lambda count: log(f'{msg} ({count})'))
 
     def freeSpace(self, now):
         """
@@ -1831,6 +3525,10 @@ class Snapshots:
 
         'last_snapshot' symlink will be fixed when done.
 
+        If :py:func:`backgroundRemove` is enabled the snapshots are moved
+        into the trash instead. Space and inodes still used by snapshots in
+        the trash are counted as free.
+
         Args:
             now (datetime.datetime):    date and time when takeSnapshot was
                                         started
@@ -1842,6 +3540,12 @@ class Snapshots:
 
         last_snapshot = snapshots[-1]
 
+        background = self.backgroundRemove()
+        if background:
+            remove = self.moveToTrash
+        else:
+            remove = self.remove
+
         #remove old backups
         if self.config.removeOldSnapshotsEnabled():
             self.setTakeSnapshotMessage(0, _('Removing old snapshots'))
@@ -1862,23 +3566,85 @@ class Snapshots:
 
                 msg = 'Remove snapshot {} because it is older than {}'
                 logger.debug(msg.format(snapshots[0].withoutTag, oldBackupId.withoutTag), self)
-                self.remove(snapshots[0])
+                remove(snapshots[0])
                 del snapshots[0]
 
-        # smart remove
-        enabled, keep_all, keep_one_per_day, keep_one_per_week, keep_one_per_month = self.config.smartRemove()
+        # smart remove
+        enabled, keep_all, keep_one_per_day, keep_one_per_week, keep_one_per_month = self.config.smartRemove()
+
+        if enabled:
+            self.setTakeSnapshotMessage(0, _('Smart removal'))
+            del_snapshots = self.smartRemoveList(now,
+                                                 keep_all,
+                                                 keep_one_per_day,
+                                                 keep_one_per_week,
+                                                 keep_one_per_month)
+            self.smartRemove(del_snapshots, trash = background)
+
+        # Remove all snapshots needed for min free space and inodes in
+        # batches planned by their estimated usage and measure only after
+        # each batch. Over sshfs neither hard links can be recognized nor
+        # walking the snapshots is cheap, so the loops below remove one
+        # snapshot at a time there.
+        minFreeSpace = None
+        minFreeInodes = None
+        if self.config.minFreeSpaceEnabled():
+            minFreeSpace = self.config.minFreeSpaceMib()
+        if self.config.minFreeInodesEnabled():
+            minFreeInodes = self.config.minFreeInodes()
+
+        # space and inodes which will be freed by emptying the trash
+        pending = [0, 0]
+        links = {}
+
+        if (background
+                and (minFreeSpace or minFreeInodes)
+                and os.path.isdir(self.trashPath())):
+            pending = list(self.diskUsage(self.trashPath(), links))
+
+        planned = ((minFreeSpace or minFreeInodes)
+                   and self.config.snapshotsMode() == 'local')
+
+        if planned:
+            self.setTakeSnapshotMessage(0, _('Trying to keep min free space'))
+
+            snapshots = listSnapshots(self.config, reverse = False)
+
+            while True:
+                # Removed snapshots are really gone without the trash. So
+                # their hard links must not be counted again.
+                if not background:
+                    links = {}
+
+                usage = {}
+                plan = self.freeSpacePlan(snapshots,
+                                          minFreeSpace,
+                                          minFreeInodes,
+                                          pending = tuple(pending),
+                                          links = links,
+                                          usage = usage)
+                if not plan:
+                    break
 
-        if enabled:
-            self.setTakeSnapshotMessage(0, _('Smart removal'))
-            del_snapshots = self.smartRemoveList(now,
-                                                 keep_all,
-                                                 keep_one_per_day,
-                                                 keep_one_per_week,
-                                                 keep_one_per_month)
-            self.smartRemove(del_snapshots)
+                if not background:
+                    # Files hard linked from outside of this profile's
+                    # snapshots (e.g. by deduplication) never count as
+                    # freed, so the plan might be too big. Remove the older
+                    # half only and measure again.
+                    plan = plan[:(len(plan) + 1) // 2]
+
+                for sid in plan:
+                    logger.debug(f'Remove snapshot {sid.withoutTag} to free '
+                                 'space and inodes', self)
+                    remove(sid)
+                    snapshots.remove(sid)
+                    if background:
+                        # moving into the trash frees nothing yet
+                        pending[0] += usage[sid][0]
+                        pending[1] += usage[sid][1]
 
         # try to keep min free space
-        if self.config.minFreeSpaceEnabled():
+        if self.config.minFreeSpaceEnabled() and not planned:
             self.setTakeSnapshotMessage(0, _('Trying to keep min free space'))
 
             minFreeSpace = self.config.minFreeSpaceMib()
@@ -1910,11 +3676,11 @@ class Snapshots:
 
                 msg = "free disk space: {} MiB. Remove snapshot {}"
                 logger.debug(msg.format(free_space, snapshots[0].withoutTag), self)
-                self.remove(snapshots[0])
+                remove(snapshots[0])
                 del snapshots[0]
 
         #try to keep free inodes
-        if self.config.minFreeInodesEnabled():
+        if self.config.minFreeInodesEnabled() and not planned:
             minFreeInodes = self.config.minFreeInodes()
             self.setTakeSnapshotMessage(
                 0,
@@ -1952,13 +3718,151 @@ class Snapshots:
                 logger.debug("free inodes: %.2f%%. Remove snapshot %s"
                             %((100.0 / max_inodes * free_inodes), snapshots[0].withoutTag),
                             self)
-                self.remove(snapshots[0])
+                remove(snapshots[0])
                 del snapshots[0]
 
         #set correct last snapshot again
         if last_snapshot is not snapshots[-1]:
             self.createLastSnapshotSymlink(snapshots[-1])
 
+    def freeSpacePlan(self,
+                      snapshots,
+                      minFreeSpace,
+                      minFreeInodes,
+                      pending = (0, 0),
+                      links = None,
+                      usage = None):
+        """
+        Estimate which of the oldest snapshots need to be removed to get
+        ``minFreeSpace`` MiB and ``minFreeInodes`` percent free inodes on the
+        backup filesystem.
+
+        The snapshots are walked oldest first. A file only frees its space
+        and inode if all its hard links are inside snapshots planned for
+        removal. So unchanged files shared with newer snapshots are not
+        counted. The newest snapshot and named snapshots (if configured) are
+        never part of the plan.
+
+        Args:
+            snapshots (list):       :py:class:`SID` objects, oldest first
+            minFreeSpace (int):     minimum free space in MiB or ``None``
+            minFreeInodes (int):    minimum free inodes in percent or
+                                    ``None``
+            pending (tuple):        space in bytes and inodes which will be
+                                    freed anyway (e.g. by emptying the
+                                    trash)
+            links (dict):           hard links already found while measuring
+                                    ``pending``. See :py:func:`diskUsage`.
+                                    Will be updated.
+            usage (dict):           will be filled with the space in bytes
+                                    and inodes freed by each planned
+                                    snapshot
+
+        Returns:
+            list:                   :py:class:`SID` objects to remove,
+                                    oldest first
+        """
+        path = self.config.snapshotsFullPath()
+
+        try:
+            info = os.statvfs(path)
+
+        except OSError as e:
+            logger.debug(f'Failed to get free space for {path}: {str(e)}',
+                         self)
+            return []
+
+        freed_space, freed_inodes = pending
+
+        need_space = 0
+        if minFreeSpace:
+            need_space = minFreeSpace * 1024 * 1024 \
+                - info.f_frsize * info.f_bavail
+
+        need_inodes = 0
+        if minFreeInodes:
+            need_inodes = info.f_files * minFreeInodes / 100.0 - info.f_favail
+
+        if freed_space >= need_space and freed_inodes >= need_inodes:
+            return []
+
+        keep_named = self.config.dontRemoveNamedSnapshots()
+        if links is None:
+            links = {}
+        plan = []
+
+        for sid in snapshots[:-1]:
+            if keep_named and sid.name:
+                continue
+
+            space, inodes = self.diskUsage(sid.path(), links)
+            freed_space += space
+            freed_inodes += inodes
+            plan.append(sid)
+            if usage is not None:
+                usage[sid] = (space, inodes)
+
+            if freed_space >= need_space and freed_inodes >= need_inodes:
+                break
+
+        logger.debug(f'Removing {len(plan)} snapshots will free about '
+                     f'{freed_space // (1024 * 1024)} MiB and '
+                     f'{freed_inodes} inodes', self)
+
+        return plan
+
+    def diskUsage(self, path, links):
+        """
+        Space and inodes which would be freed by removing ``path``. A file
+        with multiple hard links only counts once the last of its links was
+        found. Calling this for multiple folders with the same ``links``
+        gives the usage of removing all of them.
+
+        Args:
+            path (str):     folder to measure
+            links (dict):   inode numbers of files with hard links found so
+                            far and how many of their links were seen.
+                            Will be updated.
+
+        Returns:
+            tuple:          space in bytes and number of inodes
+        """
+        space = 0
+        inodes = 0
+        folders = [path]
+
+        while folders:
+            try:
+                with os.scandir(folders.pop()) as it:
+                    entries = list(it)
+
+            except OSError as e:
+                logger.debug(f'Failed to scan {path}: {str(e)}', self)
+                continue
+
+            for entry in entries:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+
+                except OSError:
+                    continue
+
+                if stat.S_ISDIR(st.st_mode):
+                    folders.append(entry.path)
+
+                elif st.st_nlink > 1:
+                    seen = links.get(st.st_ino, 0) + 1
+                    if seen < st.st_nlink:
+                        links[st.st_ino] = seen
+                        continue
+
+                    links.pop(st.st_ino, None)
+
+                space += st.st_blocks * 512
+                inodes += 1
+
+        return space, inodes
+
     def statFreeSpaceLocal(self, path):
         """
         Get free space on filesystem containing ``path`` in MiB using
@@ -2024,11 +3928,17 @@ class Snapshots:
                snapshotsList,
                list_diff_only=False,
                flag_deep_check=False,
-               list_equal_to=''):
+               list_equal_to='',
+               callback=None,
+               cancel=None):
         """Filter snapshots from ``snapshotsList`` based on whether
         ``base_path`` file is included and optional if the snapshot is unique
         or equal to ``list_equal_to``.
 
+        ``base_path`` is stat'ed only once in every snapshot. These calls run
+        in :py:data:`FILTER_WORKERS` threads because snapshots are often on
+        a remote sshfs mount.
+
         Args:
             base_sid (SID):         snapshot ID that contained the original
                                     file ``base_path``
@@ -2038,85 +3948,110 @@ class Snapshots:
             list_diff_only (bool):  if ``True`` only return unique snapshots.
                                     Which means if a file is exactly the same in
                                     different snapshots only the first snapshot
-                                    will be listed
-            flag_deep_check (bool): use md5sum to check uniqueness of files.
-                                    More accurate but slow
+                                    will be listed. Hardlinks to the same inode
+                                    are always the same.
+            flag_deep_check (bool): compare the content hashes of files.
+                                    More accurate but slow the first time.
+                                    Hashes are computed in parallel and kept
+                                    in :py:class:`hashcache.HashCache`
             list_equal_to (str):    full path to file. If not empty only return
                                     snapshots which have exactly the same file
                                     as this file
+            callback (method):      called with every matching :py:class:`SID`
+                                    as soon as it is known
+            cancel (method):        called between snapshots and files. Stop
+                                    filtering as soon as it returns ``True``
         Returns:
             list:                   filtered list of :py:class:`SID` objects
         """
         snapshotsFiltered = []
 
-        base_full_path = base_sid.pathBackup(base_path)
-        if not os.path.lexists(base_full_path):
+        try:
+            base_mode = os.lstat(base_sid.pathBackup(base_path)).st_mode
+        except OSError:
             return []
 
         allSnapshotsList = [RootSnapshot(self.config)]
         allSnapshotsList.extend(snapshotsList)
 
-        # links
-        if os.path.islink(base_full_path):
-            targets = []
+        # links and directories have to be of the same type only, files
+        # need to be regular files in all snapshots
+        fmt = stat.S_IFMT(base_mode)
+        if not (stat.S_ISLNK(base_mode) or stat.S_ISDIR(base_mode)):
+            fmt = stat.S_IFREG
 
-            for sid in allSnapshotsList:
-                path = sid.pathBackup(base_path)
+        entries = self._lstatSnapshots(allSnapshotsList, base_path, cancel)
+        uniqueness = None
+        hash_cache = None
 
-                if os.path.lexists(path) and os.path.islink(path):
+        if fmt == stat.S_IFREG and (list_diff_only or list_equal_to):
+            if flag_deep_check:
+                try:
+                    hash_cache = hashcache.HashCache.fromConfig(self.config)
+                except sqlite3.Error as e:
+                    logger.error(f'Failed to open hash cache: {str(e)}', self)
 
-                    if list_diff_only:
-                        target = os.readlink(path)
+            uniqueness = UniquenessSet(
+                flag_deep_check, follow_symlink=False, equal_to=list_equal_to,
+                hash_cache=hash_cache, cancel=cancel)
 
-                        if target in targets:
-                            continue
+            if hash_cache is not None:
+                # hash all files in parallel before checking them in order
+                entries = list(entries)
+                uniqueness.prepare([(path, st) for sid, path, st in entries
+                                    if st is not None
+                                    and stat.S_ISREG(st.st_mode)])
 
-                        targets.append(target)
+        targets = set()
 
-                    snapshotsFiltered.append(sid)
+        try:
+            for sid, path, st in entries:
+                if cancel is not None and cancel():
+                    break
 
-            return snapshotsFiltered
+                if st is None or stat.S_IFMT(st.st_mode) != fmt:
+                    continue
 
-        # directories
-        if os.path.isdir(base_full_path):
+                if fmt == stat.S_IFLNK and list_diff_only:
+                    target = os.readlink(path)
 
-            for sid in allSnapshotsList:
-                path = sid.pathBackup(base_path)
+                    if target in targets:
+                        continue
 
-                if (os.path.exists(path)
-                        and not os.path.islink(path)
-                        and os.path.isdir(path)):
-                    snapshotsFiltered.append(sid)
+                    targets.add(target)
 
-            return snapshotsFiltered
+                if uniqueness is not None and not uniqueness.check(path, st):
+                    continue
 
-        # files
-        if not list_diff_only and not list_equal_to:
+                snapshotsFiltered.append(sid)
+                if callback:
+                    callback(sid)
 
-            for sid in allSnapshotsList:
-                path = sid.pathBackup(base_path)
+        finally:
+            if hash_cache is not None:
+                hash_cache.close()
 
-                if (os.path.exists(path)
-                        and not os.path.islink(path)
-                        and os.path.isfile(path)):
-                    snapshotsFiltered.append(sid)
+        return snapshotsFiltered
 
-            return snapshotsFiltered
+    def _lstatSnapshots(self, sids, path, cancel=None):
+        """
+        ``lstat`` ``path`` in all snapshots ``sids`` in parallel. Pending
+        calls are skipped as soon as ``cancel`` returns ``True``.
 
-        # check for duplicates
-        uniqueness = UniquenessSet(
-            flag_deep_check, follow_symlink=False, list_equal_to=list_equal_to)
+        Yields:
+            tuple:  (sid, full path, :py:class:`os.stat_result` or ``None``)
+                    in the same order as ``sids``
+        """
+        paths = [sid.pathBackup(path) for sid in sids]
 
-        for sid in allSnapshotsList:
-            path = sid.pathBackup(base_path)
+        def lstat(full_path):
+            if cancel is not None and cancel():
+                return None
 
-            if (os.path.exists(path)
-                    and not os.path.islink(path)
-                    and os.path.isfile(path)
-                    and uniqueness.check(path)):
-                snapshotsFiltered.append(sid)
+            return tools.lstatOrNone(full_path)
 
-        return snapshotsFiltered
+        with ThreadPoolExecutor(max_workers=self.FILTER_WORKERS) as executor:
+            yield from zip(sids, paths, executor.map(lstat, paths))
 
     def rsyncRemotePath(self, path, use_mode = ['ssh', 'ssh_encfs'], quote = '"'):
         """
@@ -2187,6 +4122,49 @@ class Snapshots:
             os.remove(full_path)
         os.chmod(dirname, dir_st.st_mode)
 
+    def deduplicate(self, sid):
+        """
+        Replace files in snapshot ``sid`` with hard links to identical files
+        in older snapshots of all profiles on the same destination. See
+        :py:mod:`dedup`. Only used in mode 'local' because other modes
+        can't hard link on the remote side or have encrypted file content.
+
+        Args:
+            sid (SID):  new snapshot
+        """
+        if self.config.snapshotsMode() != 'local':
+            return
+
+        self.setTakeSnapshotMessage(0, _('Deduplicating files…'))
+        root = sid.pathBackup()
+
+        # backintime/<host>/<user>/<profile>/<snapshot>/backup
+        pattern = os.path.join(self.config.snapshotsPath(), 'backintime',
+                               '*', '*', '*',
+                               '[0-9]' * 8 + '-' + '[0-9]' * 6 + '*',
+                               'backup')
+        roots = sorted(path for path in glob.glob(pattern)
+                       if not os.path.islink(os.path.dirname(path))
+                       and os.path.realpath(path) != os.path.realpath(root))
+
+        try:
+            with dedup.DedupIndex(self.config.dedupIndexFile()) as index:
+                index.prune()
+                for path in roots:
+                    if not index.isIndexed(path):
+                        index.add(path)
+
+                linked, saved, hashed = index.deduplicate(
+                    root, budget=self.config.dedupBudget() * 1024 * 1024)
+
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f'Failed to deduplicate {sid}: {str(e)}', self)
+            return
+
+        if linked:
+            self.snapshotLog.append(
+                f'[I] Deduplicated {linked} files ({saved} bytes)', 3)
+
     def createLastSnapshotSymlink(self, sid):
         """
         Create symlink 'last_snapshot' to snapshot ``sid``
@@ -2366,22 +4344,86 @@ class FileInfoDict(dict):
     """
     A :py:class:`dict` that maps a path (as :py:class:`bytes`) to a
     tuple (:py:class:`int`, :py:class:`bytes`, :py:class:`bytes`).
+
+    To save memory with millions of paths the tuples are not stored. The
+    dict maps each path to a row in :py:class:`array.array` columns for
+    the permission and the indexes of user and group names in a table of
+    unique names. Tuples are created on access.
     """
     def __init__(self):
+        super(FileInfoDict, self).__init__()
+        self._modes = array.array('I')
+        self._users = array.array('I')
+        self._groups = array.array('I')
+        self._names = []
+        self._nameIndex = {}
+
         # default permissions for /
         # only used if fileinfo.bz2 does not contain a value for /
         # when it was created with version <= 1.1.12
         # bugfix for https://github.com/bit-team/backintime/issues/708
         self[b'/'] = (16877, b'root', b'root')
 
+    def _name(self, name):
+        index = self._nameIndex.get(name)
+
+        if index is None:
+            index = self._nameIndex[name] = len(self._names)
+            self._names.append(name)
+
+        return index
+
     def __setitem__(self, key, value):
-        assert isinstance(key, bytes), "key '{}' is not bytes instance".format(key)
-        assert isinstance(value, tuple), "value '{}' is not tuple instance".format(value)
-        assert len(value) == 3, "value '{}' does not have 3 items".format(value)
-        assert isinstance(value[0], int), "first value '{}' is not int instance".format(value[0])
-        assert isinstance(value[1], bytes), "second value '{}' is not bytes instance".format(value[1])
-        assert isinstance(value[2], bytes), "third value '{}' is not bytes instance".format(value[2])
-        super(FileInfoDict, self).__setitem__(key, value)
+        mode, user, group = value
+        row = super(FileInfoDict, self).get(key)
+
+        if row is None:
+            super(FileInfoDict, self).__setitem__(key, len(self._modes))
+            self._modes.append(mode)
+            self._users.append(self._name(user))
+            self._groups.append(self._name(group))
+
+        else:
+            self._modes[row] = mode
+            self._users[row] = self._name(user)
+            self._groups[row] = self._name(group)
+
+    def _row(self, row):
+        return (self._modes[row],
+                self._names[self._users[row]],
+                self._names[self._groups[row]])
+
+    def __getitem__(self, key):
+        return self._row(super(FileInfoDict, self).__getitem__(key))
+
+    def get(self, key, default=None):
+        row = super(FileInfoDict, self).get(key)
+
+        if row is None:
+            return default
+
+        return self._row(row)
+
+    def items(self):
+        for key, row in super(FileInfoDict, self).items():
+            yield key, self._row(row)
+
+    def values(self):
+        for row in super(FileInfoDict, self).values():
+            yield self._row(row)
+
+    def __eq__(self, other):
+        if not isinstance(other, dict) or len(self) != len(other):
+            return False
+
+        return all(key in other and other[key] == value
+                   for key, value in self.items())
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, dict(self.items()))
 
 
 class SID:
@@ -2409,8 +4451,15 @@ class SID:
     INFO     = 'info'
     NAME     = 'name'
     FAILED   = 'failed'
-    FILEINFO = 'fileinfo.bz2'
+    FILEINFO = 'fileinfo.idx'
+    # format up to version 1.5
+    FILEINFO_BZ2 = 'fileinfo.bz2'
     LOG      = 'takesnapshot.log.bz2'
+    CHANGES  = 'changes.gz'
+
+    # Details read from the snapshot catalog instead of the snapshot folder.
+    # See :py:func:`iterSnapshots`.
+    _catalogEntry = None
 
     def __init__(self, date, cfg):
         self.config = cfg
@@ -2692,6 +4741,9 @@ class SID:
         Returns:
             str:        name of this snapshot
         """
+        if self._catalogEntry is not None:
+            return self._catalogEntry['name']
+
         nameFile = self.path(self.NAME)
         if not os.path.isfile(nameFile):
             return ''
@@ -2716,6 +4768,8 @@ class SID:
                          self.sid, str(e)),
                          self)
 
+        self.updateCatalog()
+
     @property
     def lastChecked(self):
         """
@@ -2726,6 +4780,9 @@ class SID:
         Returns:
             str:    date and time of last check (YYYY-MM-DD HH:MM:SS)
         """
+        if self._catalogEntry is not None:
+            return self._catalogEntry['last_checked']
+
         info = self.path(self.INFO)
         if os.path.exists(info):
             return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(os.path.getatime(info)))
@@ -2740,6 +4797,7 @@ class SID:
         info = self.path(self.INFO)
         if os.path.exists(info):
             os.utime(info, None)
+            self.updateCatalog()
 
     @property
     def failed(self):
@@ -2752,6 +4810,9 @@ class SID:
         Returns:
             bool:           ``True`` if flag is set
         """
+        if self._catalogEntry is not None:
+            return self._catalogEntry['failed']
+
         failedFile = self.path(self.FAILED)
         return os.path.isfile(failedFile)
 
@@ -2770,6 +4831,29 @@ class SID:
         elif os.path.exists(failedFile):
             os.remove(failedFile)
 
+        self.updateCatalog()
+
+    def catalogEntry(self):
+        """
+        Details of this snapshot stored in the snapshot catalog.
+
+        Returns:
+            dict:   name, failed flag and last check of this snapshot
+        """
+        self._catalogEntry = None
+
+        return {'name': self.name,
+                'failed': self.failed,
+                'last_checked': self.lastChecked}
+
+    def updateCatalog(self):
+        """
+        Write changed details of this snapshot into the snapshot catalog.
+        See :py:class:`snapshotcatalog.SnapshotCatalog`.
+        """
+        catalog = snapshotcatalog.SnapshotCatalog(self.config, self.profileID)
+        catalog.update(self.sid, self.catalogEntry())
+
     @property
     def info(self):
         """
@@ -2794,7 +4878,8 @@ class SID:
     @property
     def fileInfo(self):
         """
-        Load/save "fileinfo.bz2"
+        Load/save "fileinfo.idx". Snapshots taken with older versions are
+        loaded from "fileinfo.bz2".
 
         Args:
             d (FileInfoDict): dict of: {path: (permission, user, group)}
@@ -2803,13 +4888,133 @@ class SID:
             FileInfoDict:     dict of: {path: (permission, user, group)}
         """
         d = FileInfoDict()
+
+        for path, info in self._iterFileInfo():
+            d[path] = info
+
+        return d
+
+    @fileInfo.setter
+    def fileInfo(self, d):
+        assert isinstance(d, FileInfoDict), 'd is not FileInfoDict type: {}'.format(d)
+        try:
+            fileinfo.write(self.path(self.FILEINFO), d)
+        except OSError as e:
+            logger.error('Failed to write {}: {}'.format(self.FILEINFO, str(e)))
+
+    def fileInfoSubtrees(self, paths):
+        """
+        Load only the entries needed to restore ``paths``: each path, its
+        parent folders and everything below it.
+
+        Args:
+            paths (list):   full paths (:py:class:`bytes`)
+
+        Returns:
+            FileInfoDict:   dict of: {path: (permission, user, group)}
+        """
+        d = FileInfoDict()
+        paths = [path.rstrip(b'/') or b'/' for path in paths]
+
+        parents = set()
+        for path in paths:
+            while path != b'/':
+                path = os.path.dirname(path)
+                parents.add(path)
+
+        reader = self.fileInfoReader()
+
+        if reader is None:
+            # old format needs to be read completely
+            for path, info in self._iterFileInfoBz2():
+                if path in parents or any(
+                        path == p or path.startswith(p + b'/') for p in paths):
+                    d[path] = info
+
+            return d
+
+        with reader:
+            for path in sorted(parents):
+                info = reader.get(path)
+                if info is not None:
+                    d[path] = info
+
+            for path in sorted(paths):
+                for item, info in reader.subtree(path):
+                    d[item] = info
+
+        return d
+
+    def fileInfoReader(self):
+        """
+        Open "fileinfo.idx".
+
+        Returns:
+            fileinfo.FileInfoReader: reader or ``None`` if the snapshot has
+                                     no (readable) file in this format
+        """
         infoFile = self.path(self.FILEINFO)
         if not os.path.isfile(infoFile):
-            return d
+            return None
+
+        try:
+            return fileinfo.FileInfoReader(infoFile)
+
+        except (OSError, ValueError) as e:
+            logger.error('Failed to load {} from snapshot {}: {}'.format(
+                         self.FILEINFO, self.sid, str(e)),
+                         self)
+
+        return None
+
+    def changes(self):
+        """
+        Iterate over the change manifest "changes.gz". It has one entry for
+        every file or folder which was created, updated or deleted while
+        taking this snapshot, compared to the snapshot before. If nothing
+        is missing the ID of that snapshot is ``changes_base`` in the
+        "info" file.
+
+        Yields:
+            tuple:      (path, flags, size, mtime) with the full
+                        :py:class:`bytes` path, the change flags of
+                        ``rsync --itemize-changes`` (``'*deleting'`` for
+                        deleted entries), size in bytes and mtime in seconds
+                        since epoch
+
+        Raises:
+            OSError:    if the manifest can't be read e.g. because the
+                        snapshot was taken by an older version
+        """
+        with gzip.open(self.path(self.CHANGES), 'rt', encoding='utf-8') as f:
+            for line in f:
+                flags, size, mtime, path = line.rstrip('\n').split(' ', 3)
+                yield unescapeRsync(path.encode()), flags, int(size), int(mtime)
+
+    def _iterFileInfo(self):
+        reader = self.fileInfoReader()
+
+        if reader is None:
+            yield from self._iterFileInfoBz2()
+            return
+
+        with reader:
+            try:
+                yield from reader.items()
+
+            except (OSError, ValueError, IndexError, zlib.error) as e:
+                logger.error('Failed to load {} from snapshot {}: {}'.format(
+                             self.FILEINFO, self.sid, str(e)),
+                             self)
+
+    def _iterFileInfoBz2(self):
+        infoFile = self.path(self.FILEINFO_BZ2)
+        if not os.path.isfile(infoFile):
+            return
 
         try:
-            with bz2.BZ2File(infoFile, 'rb') as fileinfo:
-                for line in fileinfo:
+            with bz2.BZ2File(infoFile, 'rb') as f:
+                for line in f:
                     line = line.strip(b'\n')
                     if not line:
                         continue
@@ -2821,26 +5026,11 @@ class SID:
                         continue
                     info = line[:index].strip().split(b' ')
                     if len(info) == 3:
-                        d[f] = (int(info[0]), info[1], info[2]) #perms, user, group
+                        yield f, (int(info[0]), info[1], info[2]) #perms, user, group
         except (FileNotFoundError, PermissionError) as e:
             logger.error('Failed to load {} from snapshot {}: {}'.format(
-                         self.FILEINFO, self.sid, str(e)),
+                         self.FILEINFO_BZ2, self.sid, str(e)),
                          self)
-        return d
-
-    @fileInfo.setter
-    def fileInfo(self, d):
-        assert isinstance(d, FileInfoDict), 'd is not FileInfoDict type: {}'.format(d)
-        try:
-            with bz2.BZ2File(self.path(self.FILEINFO), 'wb') as f:
-                for path, info in d.items():
-                    f.write(b' '.join((str(info[0]).encode('utf-8', 'replace'),
-                                       info[1],
-                                       info[2],
-                                       path))
-                                       + b'\n')
-        except PermissionError as e:
-            logger.error('Failed to write {}: {}'.format(self.FILEINFO, str(e)))
 
     # TODO use @property decorator? IMHO not because it is not a "getter" but processes data
     # TODO Should have an action name like "loadLogFile"
@@ -2919,6 +5109,10 @@ class GenericNonSnapshot(SID):
     def withoutTag(self):
         return self.name
 
+    def updateCatalog(self):
+        # not part of the snapshot catalog
+        pass
+
 
 class NewSnapshot(GenericNonSnapshot):
     """
@@ -2930,6 +5124,7 @@ class NewSnapshot(GenericNonSnapshot):
 
     NEWSNAPSHOT    = 'new_snapshot'
     SAVETOCONTINUE = 'save_to_continue'
+    CHECKPOINTS    = 'checkpoints.json'
 
     def __init__(self, cfg):
         self.config = cfg
@@ -2986,6 +5181,71 @@ class NewSnapshot(GenericNonSnapshot):
             except Exception as e:
                 logger.error("Failed to remove 'save_to_continue' flag: %s" %str(e)) # should be "safe", throughout
 
+    def startCheckpoints(self, fingerprint):
+        """
+        Start recording finished include items of this snapshot.
+
+        Args:
+            fingerprint (str):  rsync options of this snapshot, see
+                                :py:func:`Snapshots.rsyncFingerprint`
+        """
+        self._saveCheckpoints(fingerprint, [])
+
+    def checkpoints(self, fingerprint):
+        """
+        Include items finished before this snapshot was interrupted.
+
+        Args:
+            fingerprint (str):  rsync options of the current run
+
+        Returns:
+            list:               finished shards like
+                                :py:func:`Snapshots.includeShards` returns
+                                or ``None`` if there are no checkpoints
+                                taken with ``fingerprint``
+        """
+        try:
+            with open(self.path(self.CHECKPOINTS), 'rt') as f:
+                data = json.load(f)
+
+        except (OSError, ValueError):
+            return None
+
+        if data.get('fingerprint') != fingerprint:
+            return None
+
+        return [[tuple(item) for item in shard] for shard in data['done']]
+
+    def addCheckpoint(self, fingerprint, shard):
+        """
+        Record that ``shard`` is finished.
+
+        Args:
+            fingerprint (str):  rsync options of the current run
+            shard (list):       include items of one rsync process
+        """
+        done = self.checkpoints(fingerprint) or []
+        done.append([tuple(item) for item in shard])
+        self._saveCheckpoints(fingerprint, done)
+
+    def _saveCheckpoints(self, fingerprint, done):
+        filename = self.path(self.CHECKPOINTS)
+
+        try:
+            # never leave a truncated file if interrupted right now
+            with open(filename + '.tmp', 'wt') as f:
+                json.dump({'fingerprint': fingerprint, 'done': done}, f)
+            os.replace(filename + '.tmp', filename)
+
+        except OSError as e:
+            logger.error(f'Failed to save checkpoints: {str(e)}', self)
+
+    def removeCheckpoints(self):
+        """
+        Remove checkpoints before the snapshot is finished.
+        """
+        Path(self.path(self.CHECKPOINTS)).unlink(missing_ok=True)
+
     @property
     def hasChanges(self):
         """
@@ -3065,6 +5325,10 @@ def iterSnapshots(cfg, includeNewSnapshot = False):
     """
     A generator to iterate over snapshots in current snapshot path.
 
+    The snapshots are taken from the snapshot catalog which is only
+    refreshed if the snapshot path has changed since the last call. See
+    :py:class:`snapshotcatalog.SnapshotCatalog`.
+
     Args:
         cfg (config.Config):        current config
         includeNewSnapshot (bool):  include a NewSnapshot instance if
@@ -3078,21 +5342,21 @@ def iterSnapshots(cfg, includeNewSnapshot = False):
     if not os.path.exists(path):
         return None
 
-    for item in os.listdir(path):
-
-        if item == NewSnapshot.NEWSNAPSHOT:
-            newSid = NewSnapshot(cfg)
+    if includeNewSnapshot:
+        newSid = NewSnapshot(cfg)
 
-            if newSid.exists() and includeNewSnapshot:
-                yield newSid
+        if newSid.exists():
+            yield newSid
 
-            continue
+    def describe(item):
+        if item in (NewSnapshot.NEWSNAPSHOT, Snapshots.TRASH):
+            return None
 
         try:
             sid = SID(item, cfg)
 
             if sid.exists():
-                yield sid
+                return sid.catalogEntry()
 
         # REFACTOR!
         # LastSnapshotSymlink is an exception instance and could be caught
@@ -3102,6 +5366,15 @@ def iterSnapshots(cfg, includeNewSnapshot = False):
                 logger.debug(
                     "'{}' is not a snapshot ID: {}".format(item, str(e)))
 
+        return None
+
+    catalog = snapshotcatalog.SnapshotCatalog(cfg)
+
+    for item, entry in catalog.entries(describe).items():
+        sid = SID(item, cfg)
+        sid._catalogEntry = entry
+        yield sid
+
 
 def listSnapshots(cfg, includeNewSnapshot = False, reverse = True):
     """
@@ -3136,6 +5409,57 @@ def lastSnapshot(cfg):
         return sids[0]
 
 
+# rsync escapes non-printable characters in file names as "\#ooo" (octal)
+_RSYNC_ESCAPE = re.compile(rb'\\#([0-7]{3})')
+
+
+def escapeRsync(name):
+    """
+    Escape non-printable characters and invalid UTF-8 in a file name like
+    rsync does in its output. Reverted by :py:func:`unescapeRsync`.
+
+    Args:
+        name (bytes):   file name
+
+    Returns:
+        str:            escaped file name
+    """
+    ret = []
+    name = name.decode('utf-8', 'surrogateescape')
+
+    for idx, char in enumerate(name):
+        code = ord(char)
+        if 0xdc80 <= code <= 0xdcff:
+            # byte which is not valid UTF-8
+            code -= 0xdc00
+
+        elif not (code < 0x20 or code == 0x7f
+                  or (char == '\\' and name[idx + 1:idx + 2] == '#')):
+            ret.append(char)
+            continue
+
+        ret.append('\\#%03o' % code)
+
+    return ''.join(ret)
+
+
+def unescapeRsync(name):
+    """
+    Revert the escaping of non-printable characters in file names printed
+    by rsync.
+
+    Args:
+        name (bytes):   file name from rsync output
+
+    Returns:
+        bytes:          original file name
+    """
+    if b'\\#' not in name:
+        return name
+
+    return _RSYNC_ESCAPE.sub(lambda m: bytes((int(m.group(1), 8), )), name)
+
+
 if __name__ == '__main__':
     config = config.Config()
     snapshots = Snapshots(config)
@@ -0,0 +1,232 @@
+# Back In Time
+# Copyright (C) 2008-2022 Oprea Dan, Bart de Koning, Richard Bailey,
+# Germar Reitze
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import os
+import sys
+import stat
+import unittest
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import tools
+import dedup
+import snapshots
+from test import generic
+
+CONTENT = b'foo' * 1000
+OTHER = b'bar' * 1000
+
+
+class TestDedupIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, 'dedupindex.db')
+        self.old = os.path.join(self.tmp.name, 'old')
+        self.new = os.path.join(self.tmp.name, 'new')
+        os.makedirs(os.path.join(self.old, 'foo'))
+        os.makedirs(os.path.join(self.new, 'bar'))
+
+    def tearDown(self):
+        for folder, dirs, files in os.walk(self.tmp.name):
+            os.chmod(folder, 0o755)
+        self.tmp.cleanup()
+
+    def write(self, root, *path, content=CONTENT):
+        fullPath = os.path.join(root, *path)
+        with open(fullPath, 'wb') as f:
+            f.write(content)
+        os.utime(fullPath, ns=(0, 0))
+        return fullPath
+
+    def deduplicate(self, **kwargs):
+        with dedup.DedupIndex(self.filename) as index:
+            index.add(self.old)
+            return index.deduplicate(self.new, **kwargs)
+
+    def assertLinked(self, path1, path2, linked=True):
+        st1, st2 = os.stat(path1), os.stat(path2)
+        self.assertEqual(st1.st_ino == st2.st_ino, linked)
+
+    def test_moved(self):
+        old = self.write(self.old, 'foo', 'file')
+        new = self.write(self.new, 'bar', 'moved')
+
+        self.assertEqual(self.deduplicate(),
+                         (1, len(CONTENT), 2 * len(CONTENT)))
+        self.assertLinked(old, new)
+        with open(new, 'rb') as f:
+            self.assertEqual(f.read(), CONTENT)
+
+    def test_different_content(self):
+        old = self.write(self.old, 'foo', 'file')
+        new = self.write(self.new, 'bar', 'file', content=OTHER)
+
+        self.assertEqual(self.deduplicate()[0], 0)
+        self.assertLinked(old, new, False)
+
+    def test_unique_size_not_hashed(self):
+        self.write(self.old, 'foo', 'file')
+        self.write(self.new, 'bar', 'file', content=CONTENT + b'1')
+
+        with patch('tools.hashsum', wraps=tools.hashsum) as hashsum:
+            self.assertEqual(self.deduplicate(), (0, 0, 0))
+            hashsum.assert_not_called()
+
+    def test_different_metadata(self):
+        old = self.write(self.old, 'foo', 'file')
+        new = self.write(self.new, 'bar', 'file')
+        os.chmod(new, 0o600)
+
+        self.assertEqual(self.deduplicate()[0], 0)
+        self.assertLinked(old, new, False)
+
+        new = self.write(self.new, 'bar', 'file2')
+        os.utime(new, ns=(0, 1))
+        self.assertEqual(self.deduplicate()[0], 0)
+
+    def test_within_new_snapshot(self):
+        first = self.write(self.new, 'bar', 'first')
+        second = self.write(self.new, 'bar', 'second')
+
+        self.assertEqual(self.deduplicate()[0], 1)
+        self.assertLinked(first, second)
+
+    def test_known_inode_skipped(self):
+        old = self.write(self.old, 'foo', 'file')
+        os.link(old, os.path.join(self.new, 'bar', 'file'))
+
+        with patch('tools.hashsum', wraps=tools.hashsum) as hashsum:
+            self.assertEqual(self.deduplicate(), (0, 0, 0))
+            hashsum.assert_not_called()
+
+    def test_budget(self):
+        old = self.write(self.old, 'foo', 'file')
+        new = self.write(self.new, 'bar', 'file')
+
+        self.assertEqual(self.deduplicate(budget=len(CONTENT)),
+                         (0, 0, len(CONTENT)))
+        self.assertLinked(old, new, False)
+
+    def test_readonly_folder(self):
+        old = self.write(self.old, 'foo', 'file')
+        new = self.write(self.new, 'bar', 'file')
+        folder = os.path.dirname(new)
+        os.utime(folder, ns=(0, 0))
+        os.chmod(folder, 0o555)
+
+        self.assertEqual(self.deduplicate()[0], 1)
+        self.assertLinked(old, new)
+
+        st = os.stat(folder)
+        self.assertEqual(stat.S_IMODE(st.st_mode), 0o555)
+        self.assertEqual(st.st_mtime_ns, 0)
+        self.assertListEqual(os.listdir(folder), ['file'])
+
+    def test_changed_candidate_hashed_again(self):
+        old = self.write(self.old, 'foo', 'file')
+        self.write(self.new, 'bar', 'first')
+        self.assertEqual(self.deduplicate()[0], 1)
+
+        # same size and mtime, but only the ctime tells about new content
+        with open(old, 'r+b') as f:
+            f.write(OTHER)
+        os.utime(old, ns=(0, 0))
+
+        second = self.write(self.new, 'bar', 'second')
+        with dedup.DedupIndex(self.filename) as index:
+            self.assertEqual(index.deduplicate(self.new)[0], 0)
+        self.assertLinked(old, second, False)
+
+    def test_linked_candidate_not_hashed_again(self):
+        old = self.write(self.old, 'foo', 'file')
+        self.write(self.new, 'bar', 'first')
+        self.assertEqual(self.deduplicate()[0], 1)
+
+        # two more snapshots hard link the file with rsync --link-dest
+        for name in ('linked1', 'linked2'):
+            root = os.path.join(self.tmp.name, name)
+            os.makedirs(os.path.join(root, 'foo'))
+            os.link(old, os.path.join(root, 'foo', 'file'))
+        moved = self.write(root, 'foo', 'moved')
+
+        with patch('tools.hashsum', wraps=tools.hashsum) as hashsum:
+            with dedup.DedupIndex(self.filename) as index:
+                self.assertEqual(index.deduplicate(root),
+                                 (1, len(CONTENT), len(CONTENT)))
+            hashsum.assert_called_once()
+            self.assertEqual(hashsum.call_args.args[0], os.fsencode(moved))
+        self.assertLinked(old, moved)
+
+    def test_chmod_failed(self):
+        old = self.write(self.old, 'foo', 'file')
+        new = self.write(self.new, 'bar', 'file')
+        folder = os.path.dirname(new)
+        os.chmod(folder, 0o555)
+
+        with patch('os.chmod', side_effect=PermissionError(1, 'denied')), \
+             patch('os.utime') as utime:
+            self.assertEqual(self.deduplicate()[0], 0)
+            utime.assert_not_called()
+        self.assertLinked(old, new, False)
+
+    def test_removed_snapshot(self):
+        old = self.write(self.old, 'foo', 'file')
+        with dedup.DedupIndex(self.filename) as index:
+            index.add(self.old)
+            self.assertTrue(index.isIndexed(self.old))
+
+        os.remove(old)
+        os.rmdir(os.path.join(self.old, 'foo'))
+        os.rmdir(self.old)
+        new = self.write(self.new, 'bar', 'file')
+
+        with dedup.DedupIndex(self.filename) as index:
+            index.prune()
+            self.assertFalse(index.isIndexed(self.old))
+            self.assertEqual(index.deduplicate(self.new)[0], 0)
+        self.assertTrue(os.path.isfile(new))
+
+
+class TestSnapshotsDeduplicate(generic.SnapshotsTestCase):
+    def setUp(self):
+        super(TestSnapshotsDeduplicate, self).setUp()
+        self.sid1 = snapshots.SID('20151219-010324-123', self.cfg)
+        self.sid2 = snapshots.SID('20151219-020324-123', self.cfg)
+        self.sid1.makeDirs('foo')
+        self.sid2.makeDirs('bar')
+
+        for sid, path in ((self.sid1, 'foo/file'), (self.sid2, 'bar/moved')):
+            with open(sid.pathBackup(path), 'wb') as f:
+                f.write(CONTENT)
+            os.utime(sid.pathBackup(path), ns=(0, 0))
+
+    def test_deduplicate(self):
+        self.sn.deduplicate(self.sid2)
+        self.assertEqual(os.stat(self.sid1.pathBackup('foo/file')).st_ino,
+                         os.stat(self.sid2.pathBackup('bar/moved')).st_ino)
+
+    def test_remote_mode(self):
+        with patch.object(self.cfg, 'snapshotsMode', return_value='ssh'):
+            self.sn.deduplicate(self.sid2)
+        self.assertNotEqual(os.stat(self.sid1.pathBackup('foo/file')).st_ino,
+                            os.stat(self.sid2.pathBackup('bar/moved')).st_ino)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+# Back In Time
+# Copyright (C) 2008-2022 Oprea Dan, Bart de Koning, Richard Bailey,
+# Germar Reitze
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import os
+import sys
+import unittest
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import fileinfo
+
+ENTRIES = {
+    b'/': (16877, b'root', b'root'),
+    b'/foo': (16877, b'user', b'user'),
+    b'/foo-bar': (33188, b'user', b'user'),
+    b'/foo/bar': (33188, b'user', b'users'),
+    b'/foo/baz': (33261, b'user', b'users'),
+    b'/foo/baz/\xff': (33188, b'nobody', b'nogroup'),
+    b'/foobar': (33188, b'user', b'user'),
+}
+
+
+class TestFileInfo(unittest.TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, 'fileinfo.idx')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_items(self):
+        fileinfo.write(self.filename, ENTRIES)
+
+        with fileinfo.FileInfoReader(self.filename) as reader:
+            self.assertEqual(reader.count, len(ENTRIES))
+            self.assertListEqual(list(reader.items()), sorted(ENTRIES.items()))
+
+    @patch('fileinfo.BLOCK_SIZE', 1)
+    def test_blocks(self):
+        fileinfo.write(self.filename, ENTRIES)
+
+        with fileinfo.FileInfoReader(self.filename) as reader:
+            self.assertEqual(len(reader._blocks), len(ENTRIES))
+            self.assertListEqual(list(reader.items()), sorted(ENTRIES.items()))
+            self.assertEqual(reader.get(b'/foo/baz'), ENTRIES[b'/foo/baz'])
+            self.assertIsNone(reader.get(b'/fo'))
+
+    def test_subtree(self):
+        fileinfo.write(self.filename, ENTRIES)
+
+        with fileinfo.FileInfoReader(self.filename) as reader:
+            self.assertListEqual([path for path, info in reader.subtree(b'/foo/')],
+                                 [b'/foo', b'/foo/bar', b'/foo/baz',
+                                  b'/foo/baz/\xff'])
+            self.assertListEqual([path for path, info in reader.subtree(b'/foo-bar')],
+                                 [b'/foo-bar'])
+            self.assertEqual(len(list(reader.subtree(b'/'))), len(ENTRIES))
+            self.assertListEqual(list(reader.subtree(b'/bar')), [])
+
+    def test_writer(self):
+        with fileinfo.FileInfoWriter(self.filename) as writer:
+            writer.add(b'/foo', ENTRIES[b'/foo'])
+            with self.assertRaises(ValueError):
+                writer.add(b'/', ENTRIES[b'/'])
+            writer.add(b'/foo/bar', ENTRIES[b'/foo/bar'])
+
+        with fileinfo.FileInfoReader(self.filename) as reader:
+            self.assertEqual(reader.count, 2)
+
+    def test_lookup(self):
+        fileinfo.write(self.filename, ENTRIES)
+
+        with fileinfo.FileInfoReader(self.filename) as reader:
+            lookup = reader.lookup()
+            self.assertEqual(lookup(b'/foo'), ENTRIES[b'/foo'])
+            self.assertIsNone(lookup(b'/foo-a'))
+            self.assertEqual(lookup(b'/foo/baz'), ENTRIES[b'/foo/baz'])
+            self.assertIsNone(lookup(b'/zzz'))
+
+    def test_empty(self):
+        fileinfo.write(self.filename, {})
+
+        with fileinfo.FileInfoReader(self.filename) as reader:
+            self.assertListEqual(list(reader.items()), [])
+            self.assertIsNone(reader.get(b'/'))
+
+    def test_broken(self):
+        fileinfo.write(self.filename, ENTRIES)
+        with open(self.filename, 'r+b') as f:
+            f.truncate(os.path.getsize(self.filename) - 1)
+
+        with self.assertRaises(ValueError):
+            fileinfo.FileInfoReader(self.filename)
+
+        with open(self.filename, 'wb') as f:
+            f.write(b'644 user user /foo\n')
+
+        with self.assertRaises(ValueError):
+            fileinfo.FileInfoReader(self.filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
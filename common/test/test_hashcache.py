@@ -0,0 +1,126 @@
+# Back In Time
+# Copyright (C) 2008-2022 Oprea Dan, Bart de Koning, Richard Bailey,
+# Germar Reitze
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import os
+import sys
+import hashlib
+import unittest
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import tools
+import hashcache
+
+
+class TestHashCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, 'hashcache.db')
+        self.files = []
+        for i, content in enumerate((b'foo', b'bar', b'foo')):
+            path = os.path.join(self.tmp.name, str(i))
+            with open(path, 'wb') as f:
+                f.write(content)
+            self.files.append(path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_hash(self):
+        with patch('tools.hashsum', wraps=tools.hashsum) as hashsum:
+            with hashcache.HashCache(self.filename) as cache:
+                self.assertEqual(cache.hash(self.files[0]),
+                                 hashlib.md5(b'foo').hexdigest())
+                self.assertEqual(cache.hash(self.files[0]),
+                                 hashlib.md5(b'foo').hexdigest())
+            self.assertEqual(hashsum.call_count, 1)
+
+            # persistent
+            with hashcache.HashCache(self.filename) as cache:
+                cache.hash(self.files[0], os.stat(self.files[0]))
+            self.assertEqual(hashsum.call_count, 1)
+
+    def test_hardlink(self):
+        link = os.path.join(self.tmp.name, 'link')
+        os.link(self.files[0], link)
+
+        with patch('tools.hashsum', wraps=tools.hashsum) as hashsum:
+            with hashcache.HashCache(self.filename) as cache:
+                cache.hash(self.files[0])
+                cache.hash(link)
+            self.assertEqual(hashsum.call_count, 1)
+
+    def test_modified(self):
+        with hashcache.HashCache(self.filename) as cache:
+            cache.hash(self.files[0])
+
+            with open(self.files[0], 'wb') as f:
+                f.write(b'baz')
+            os.utime(self.files[0], ns=(0, 1))
+
+            self.assertEqual(cache.hash(self.files[0]),
+                             hashlib.md5(b'baz').hexdigest())
+
+    def test_algorithm(self):
+        with hashcache.HashCache(self.filename) as cache:
+            cache.hash(self.files[0])
+
+        with hashcache.HashCache(self.filename, algorithm='blake2b') as cache:
+            self.assertEqual(cache.hash(self.files[0]),
+                             hashlib.blake2b(b'foo').hexdigest())
+
+    def test_hash_many(self):
+        files = [(path, os.stat(path)) for path in self.files]
+
+        with patch('tools.hashsum', wraps=tools.hashsum) as hashsum:
+            with hashcache.HashCache(self.filename, workers=2) as cache:
+                self.assertEqual(cache.hashMany(files), 3)
+                self.assertEqual(cache.hashMany(files), 0)
+                self.assertEqual(cache.hash(self.files[1]),
+                                 hashlib.md5(b'bar').hexdigest())
+            self.assertEqual(hashsum.call_count, 3)
+
+    def test_hash_many_cancel(self):
+        files = [(path, os.stat(path)) for path in self.files]
+
+        with patch('tools.hashsum', wraps=tools.hashsum) as hashsum:
+            with hashcache.HashCache(self.filename, workers=1) as cache:
+                cache.hashMany(files, cancel=lambda: hashsum.call_count >= 1)
+            hashsum.assert_called_once()
+
+            hashsum.reset_mock()
+            with hashcache.HashCache(self.filename) as cache:
+                self.assertEqual(cache.hashMany(files), 2)
+            self.assertEqual(hashsum.call_count, 2)
+
+    def test_eviction(self):
+        with hashcache.HashCache(self.filename, max_entries=2) as cache:
+            for path in self.files:
+                cache._now += 1
+                cache.hash(path)
+
+        with patch('tools.hashsum', wraps=tools.hashsum) as hashsum:
+            with hashcache.HashCache(self.filename) as cache:
+                for path in reversed(self.files):
+                    cache.hash(path)
+            hashsum.assert_called_once_with(self.files[0], 'md5')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,325 @@
+# Back In Time
+# Copyright (C) 2008-2022 Oprea Dan, Bart de Koning, Richard Bailey,
+# Germar Reitze
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import os
+import sys
+import stat
+import errno
+import unittest
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import localcopy
+import scancache
+import snapshots
+from test import generic
+
+
+class TestLocalCopy(unittest.TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, 'source')
+        self.old = os.path.join(self.tmp.name, 'old')
+        self.new = os.path.join(self.tmp.name, 'new')
+        os.makedirs(os.path.join(self.source, 'foo', 'bar'))
+        os.mkdir(self.old)
+        os.mkdir(self.new)
+        self.write('foo', 'file')
+        self.write('foo', 'bar', 'file', content='bar')
+        os.symlink('file', os.path.join(self.source, 'foo', 'link'))
+        self.include = [(self.source, 0)]
+
+    def tearDown(self):
+        for folder, dirs, files in os.walk(self.tmp.name):
+            os.chmod(folder, 0o755)
+        self.tmp.cleanup()
+
+    def write(self, *path, content='foo'):
+        fullPath = os.path.join(self.source, *path)
+        with open(fullPath, 'wt') as f:
+            f.write(content)
+        os.utime(fullPath, ns=(0, 1000000000))
+        return fullPath
+
+    def backup(self, root, *path):
+        return os.path.join(root, self.source.lstrip(os.sep), *path)
+
+    def copy(self, dest=None, link_dest=None, **kwargs):
+        changes = []
+        engine = localcopy.LocalCopy(self.include, dest or self.old,
+                                     link_dest=link_dest, workers=2, **kwargs)
+        ok = engine.run(changes.append)
+        return ok, engine, {c.path: c.flags for c in changes}
+
+    def assertLinked(self, path1, path2, linked=True):
+        st1, st2 = os.lstat(path1), os.lstat(path2)
+        self.assertEqual(st1.st_ino == st2.st_ino, linked)
+
+    def test_first_copy(self):
+        ok, engine, changes = self.copy()
+        self.assertTrue(ok)
+        self.assertEqual(engine.copied, 2)
+
+        path = self.backup(self.old, 'foo', 'bar', 'file')
+        with open(path, 'rt') as f:
+            self.assertEqual(f.read(), 'bar')
+        self.assertEqual(os.stat(path).st_mtime_ns, 1000000000)
+        self.assertEqual(os.readlink(self.backup(self.old, 'foo', 'link')),
+                         'file')
+
+        rel = os.fsencode(self.source.lstrip(os.sep))
+        self.assertEqual(changes[rel + b'/foo/bar/file'], '>f+++++++++')
+        self.assertEqual(changes[rel + b'/foo/link'], 'cL+++++++++')
+        self.assertEqual(changes[rel + b'/foo/'], 'cd+++++++++')
+        # folders above the include folder
+        self.assertIn(rel.split(b'/')[0] + b'/', changes)
+
+    def test_folder_attributes(self):
+        os.chmod(os.path.join(self.source, 'foo', 'bar'), 0o500)
+        os.utime(os.path.join(self.source, 'foo', 'bar'), ns=(0, 0))
+        self.copy()
+
+        st = os.stat(self.backup(self.old, 'foo', 'bar'))
+        self.assertEqual(stat.S_IMODE(st.st_mode), 0o500)
+        self.assertEqual(st.st_mtime_ns, 0)
+        with open(self.backup(self.old, 'foo', 'bar', 'file'), 'rt') as f:
+            self.assertEqual(f.read(), 'bar')
+
+    def test_continue_read_only(self):
+        os.chmod(os.path.join(self.source, 'foo', 'bar'), 0o500)
+        self.copy()
+        self.write('foo', 'bar', 'file', content='changed')
+        os.remove(os.path.join(self.source, 'foo', 'file'))
+
+        ok, engine, changes = self.copy()
+        self.assertTrue(ok)
+        with open(self.backup(self.old, 'foo', 'bar', 'file'), 'rt') as f:
+            self.assertEqual(f.read(), 'changed')
+        self.assertFalse(os.path.exists(self.backup(self.old, 'foo', 'file')))
+        self.assertEqual(stat.S_IMODE(os.stat(
+            self.backup(self.old, 'foo', 'bar')).st_mode), 0o500)
+
+    def test_unchanged_linked(self):
+        self.copy()
+        self.write('foo', 'file', content='changed')
+
+        ok, engine, changes = self.copy(self.new, self.old)
+        self.assertTrue(ok)
+        self.assertLinked(self.backup(self.old, 'foo', 'bar', 'file'),
+                          self.backup(self.new, 'foo', 'bar', 'file'))
+        self.assertLinked(self.backup(self.old, 'foo', 'link'),
+                          self.backup(self.new, 'foo', 'link'))
+        self.assertLinked(self.backup(self.old, 'foo', 'file'),
+                          self.backup(self.new, 'foo', 'file'), False)
+        self.assertEqual(engine.copied, 1)
+
+        rel = os.fsencode(self.source.lstrip(os.sep))
+        self.assertDictEqual(changes, {rel + b'/foo/file': '>f.s.......'})
+
+    def test_changed_attributes_copied(self):
+        self.copy()
+        os.chmod(os.path.join(self.source, 'foo', 'file'), 0o600)
+
+        ok, engine, changes = self.copy(self.new, self.old)
+        self.assertLinked(self.backup(self.old, 'foo', 'file'),
+                          self.backup(self.new, 'foo', 'file'), False)
+        self.assertEqual(stat.S_IMODE(os.stat(
+            self.backup(self.old, 'foo', 'file')).st_mode), 0o644)
+
+        rel = os.fsencode(self.source.lstrip(os.sep))
+        self.assertEqual(changes[rel + b'/foo/file'], '>f...p.....')
+
+    def test_changed_symlink(self):
+        self.copy()
+        os.remove(os.path.join(self.source, 'foo', 'link'))
+        os.symlink('bar', os.path.join(self.source, 'foo', 'link'))
+
+        ok, engine, changes = self.copy(self.new, self.old)
+        self.assertEqual(os.readlink(self.backup(self.new, 'foo', 'link')),
+                         'bar')
+        rel = os.fsencode(self.source.lstrip(os.sep))
+        self.assertEqual(changes[rel + b'/foo/link'][:3], 'cLc')
+
+    def test_hardlinks(self):
+        os.link(os.path.join(self.source, 'foo', 'file'),
+                os.path.join(self.source, 'foo', 'hardlink'))
+        ok, engine, changes = self.copy()
+        self.assertTrue(ok)
+        self.assertLinked(self.backup(self.old, 'foo', 'file'),
+                          self.backup(self.old, 'foo', 'hardlink'))
+
+    def test_special_file(self):
+        os.mkfifo(os.path.join(self.source, 'foo', 'fifo'))
+        ok, engine, changes = self.copy()
+        self.assertTrue(ok)
+        self.assertTrue(stat.S_ISFIFO(
+            os.lstat(self.backup(self.old, 'foo', 'fifo')).st_mode))
+
+    def test_device_not_permitted(self):
+        dev = os.path.join(self.source, 'foo', 'dev')
+        self.write('foo', 'dev')
+        st = os.lstat(dev)
+        st = os.stat_result((stat.S_IFCHR | 0o600,) + tuple(st)[1:])
+
+        copy = localcopy.LocalCopy(self.include, self.old)
+        copy.isRoot = False
+        with patch('os.mknod', side_effect=PermissionError(errno.EPERM,
+                                                           'not permitted')):
+            copy._entry(os.fsencode(dev), st)
+
+        self.assertListEqual(copy.errors, [])
+        self.assertFalse(os.path.lexists(self.backup(self.old, 'foo', 'dev')))
+
+    def test_exclude(self):
+        self.copy(exclude=scancache.ExcludeFilter(['bar']))
+        self.assertFalse(os.path.exists(self.backup(self.old, 'foo', 'bar')))
+        self.assertTrue(os.path.exists(self.backup(self.old, 'foo', 'file')))
+
+    def test_include_file(self):
+        self.include = [(os.path.join(self.source, 'foo', 'bar', 'file'), 1)]
+        self.copy()
+        self.assertTrue(os.path.exists(
+            self.backup(self.old, 'foo', 'bar', 'file')))
+        self.assertFalse(os.path.exists(self.backup(self.old, 'foo', 'file')))
+
+    def test_max_size(self):
+        self.write('foo', 'big', content='x' * 2000)
+        self.copy(max_size=1000)
+        self.assertFalse(os.path.exists(self.backup(self.old, 'foo', 'big')))
+        self.assertTrue(os.path.exists(self.backup(self.old, 'foo', 'file')))
+
+    def test_continue(self):
+        os.makedirs(self.backup(self.old, 'foo', 'gone'))
+        with open(self.backup(self.old, 'foo', 'file'), 'wt') as f:
+            f.write('partial')
+
+        ok, engine, changes = self.copy()
+        self.assertTrue(ok)
+        self.assertFalse(os.path.exists(self.backup(self.old, 'foo', 'gone')))
+        with open(self.backup(self.old, 'foo', 'file'), 'rt') as f:
+            self.assertEqual(f.read(), 'foo')
+
+    def test_copy_file_range_unsupported(self):
+        with patch('os.copy_file_range',
+                   side_effect=OSError(errno.EXDEV, 'cross-device')):
+            ok, engine, changes = self.copy()
+
+        self.assertTrue(ok)
+        self.assertFalse(engine._copyRange)
+        with open(self.backup(self.old, 'foo', 'file'), 'rt') as f:
+            self.assertEqual(f.read(), 'foo')
+
+    def test_vanished_while_walking(self):
+        folder = os.path.join(self.source, 'foo', 'bar')
+        for name in ('f1', 'f2', 'f3'):
+            self.write('foo', 'bar', name)
+        scandir = os.scandir
+
+        class Listing:
+            # remove f2 after readdir but before it is stat'ed
+            def __init__(self, path):
+                with scandir(path) as it:
+                    self.entries = list(it)
+                if path == os.fsencode(folder):
+                    os.remove(os.path.join(folder, 'f2'))
+
+            def __enter__(self):
+                return iter(self.entries)
+
+            def __exit__(self, *args):
+                pass
+
+        with patch('os.scandir', Listing):
+            ok, engine, changes = self.copy()
+
+        self.assertTrue(ok)
+        self.assertListEqual(engine.errors, [])
+        self.assertListEqual(engine.vanished,
+                             [os.fsencode(os.path.join(folder, 'f2'))])
+        self.assertTrue(os.path.exists(self.backup(self.old, 'foo', 'bar', 'f1')))
+        self.assertTrue(os.path.exists(self.backup(self.old, 'foo', 'bar', 'f3')))
+        self.assertFalse(os.path.exists(self.backup(self.old, 'foo', 'bar', 'f2')))
+
+    def test_vanished_while_copying(self):
+        real = open
+
+        def vanishing(file, *args, **kwargs):
+            if isinstance(file, bytes) and file.endswith(b'/bar/file'):
+                raise FileNotFoundError(2, 'No such file', file)
+            return real(file, *args, **kwargs)
+
+        with patch('builtins.open', vanishing):
+            ok, engine, changes = self.copy()
+
+        self.assertTrue(ok)
+        self.assertEqual(len(engine.vanished), 1)
+
+    @unittest.skipIf(os.geteuid() == 0, 'root can read everything')
+    def test_error(self):
+        os.chmod(os.path.join(self.source, 'foo', 'bar', 'file'), 0o000)
+        ok, engine, changes = self.copy()
+
+        self.assertFalse(ok)
+        self.assertEqual(len(engine.errors), 1)
+        self.assertTrue(os.path.exists(self.backup(self.old, 'foo', 'file')))
+
+
+class TestSnapshotsLocalCopy(generic.SnapshotsTestCase):
+    def setUp(self):
+        super(TestSnapshotsLocalCopy, self).setUp()
+        self.cfg.setCopyEngine('python')
+
+    def test_enabled(self):
+        self.assertTrue(self.sn.localCopyEnabled())
+
+        self.cfg.setCopyEngine('rsync')
+        self.assertFalse(self.sn.localCopyEnabled())
+
+    def test_unsupported_options(self):
+        self.cfg.setRsyncOptions(True, '--foo')
+        self.assertFalse(self.sn.localCopyEnabled())
+
+    def test_unsupported_exclude(self):
+        self.cfg.setExclude(['foo/***'])
+        self.assertFalse(self.sn.localCopyEnabled())
+
+    def test_remote_mode(self):
+        with patch.object(self.cfg, 'snapshotsMode', return_value='ssh'):
+            self.assertFalse(self.sn.localCopyEnabled())
+
+    def test_local_copy(self):
+        include = self.cfg.include()[0][0]
+        with open(os.path.join(include, 'file'), 'wt') as f:
+            f.write('foo')
+
+        new = snapshots.NewSnapshot(self.cfg)
+        new.makeDirs()
+        self.sn._itemized = set()
+        params = [False, False]
+
+        self.assertEqual(
+            self.sn.localCopy(new, None, self.cfg.include(), params), 0)
+        self.assertListEqual(params, [False, True])
+        self.assertTrue(os.path.isfile(new.pathBackup(include, 'file')))
+        self.assertIn(os.fsencode(include.lstrip(os.sep) + '/file'),
+                      self.sn._itemized)
+
+
+if __name__ == '__main__':
+    unittest.main()
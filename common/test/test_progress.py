@@ -0,0 +1,75 @@
+# Back In Time
+# Copyright (C) 2008-2022 Oprea Dan, Bart de Koning, Richard Bailey,
+# Germar Reitze
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import progress
+
+
+class TestProgressEstimator(unittest.TestCase):
+    def test_parse_size(self):
+        self.assertEqual(progress.ProgressEstimator.parseSize('1,234'), 1234)
+        self.assertEqual(progress.ProgressEstimator.parseSize('517.38K'), 517380)
+        self.assertEqual(progress.ProgressEstimator.parseSize('1,5G'), 1500000000)
+
+    def test_incomplete_file_list(self):
+        estimator = progress.ProgressEstimator(files=1000, size=10**9,
+                                               start=0)
+        # rsync knows only a small part of the file list yet
+        percent, eta = estimator.update('250.00M', '90',
+                                        ' (xfr#5, ir-chk=10/500)', now=10)
+        self.assertEqual(percent, 25)
+        self.assertEqual(eta, '0:00:30')
+
+        # files checked lag behind the bytes
+        percent, eta = estimator.update('600.00M', '95',
+                                        ' (xfr#9, ir-chk=10/210)', now=20)
+        self.assertEqual(percent, 25)
+
+    def test_complete_file_list(self):
+        estimator = progress.ProgressEstimator(files=1000, size=10**9,
+                                               start=0)
+        percent, eta = estimator.update('900.00M', '90',
+                                        ' (xfr#9, to-chk=100/1100)', now=10)
+        self.assertEqual(percent, 90)
+        self.assertTrue(estimator.complete)
+        self.assertEqual(estimator.files, 1100)
+
+    def test_never_backwards(self):
+        estimator = progress.ProgressEstimator(size=10**9, start=0)
+        self.assertEqual(estimator.update('500.00M', '50', '', now=1)[0], 50)
+        estimator.size = 2 * 10**9
+        self.assertEqual(estimator.update('600.00M', '50', '', now=2)[0], 50)
+
+    def test_previous_duration(self):
+        estimator = progress.ProgressEstimator(duration=100, start=0)
+        self.assertEqual(estimator.update('0', '0', '', now=10)[1], '0:01:30')
+
+    def test_no_statistics(self):
+        estimator = progress.ProgressEstimator(start=0)
+        percent, eta = estimator.update('1.00M', '40',
+                                        ' (xfr#1, ir-chk=5/10)', now=4)
+        self.assertEqual(percent, 40)
+        self.assertEqual(eta, '0:00:06')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -20,6 +20,7 @@ import sys
 import unittest
 import stat
 from tempfile import TemporaryDirectory
+from unittest.mock import patch
 
 from test import generic
 from test.constants import CURRENTUSER, CURRENTGROUP
@@ -63,6 +64,57 @@ class TestRestore(RestoreTestCase):
             self.assertEqual(f.read(), 'foo')
         self.assertEqual(33260, os.stat(restoreFile2).st_mode)
 
+    def test_restore_batch(self):
+        restoreFile1 = os.path.join(self.include.name, 'test')
+        restoreFile2 = os.path.join(self.include.name, 'foo', 'bar', 'baz')
+        restoreFile3 = os.path.join(self.include.name, 'file with spaces')
+        calls = []
+
+        def execute(cmd, **kwargs):
+            files_from = [i for i in cmd if i.startswith('--files-from=')][0]
+            with open(files_from[len('--files-from='):], 'rb') as f:
+                calls.append((cmd[-2:], f.read().split(b'\0')))
+            return unittest.mock.DEFAULT
+
+        with patch('tools.Execute', side_effect=execute):
+            self.sn.restore(self.sid, (restoreFile1, restoreFile2))
+
+            with TemporaryDirectory() as dest:
+                self.sn.restore(self.sid,
+                                (restoreFile1, restoreFile2, restoreFile3),
+                                restore_to = dest)
+
+        # one rsync process for all paths
+        src_root = self.sid.pathBackup()
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(calls[0][0], [src_root + '/', '/'])
+        self.assertListEqual(calls[0][1],
+                             [restoreFile1.lstrip('/').encode(),
+                              restoreFile2.lstrip('/').encode()])
+
+        # one rsync process for each source folder
+        self.assertEqual(calls[1][0][0], src_root + self.include.name + '/')
+        self.assertListEqual(calls[1][1], [b'test', b'file with spaces'])
+        self.assertEqual(calls[2][0][0],
+                         src_root + os.path.dirname(restoreFile2) + '/')
+        self.assertListEqual(calls[2][1], [b'baz'])
+
+    def test_restore_progress(self):
+        progress = []
+
+        def execute(cmd, filters, **kwargs):
+            for line in ('      1,234  50%    1.00MB/s    0:00:01 (xfr#1, to-chk=1/2)',
+                         '      2,468 100%    1.00MB/s    0:00:00 (xfr#2, to-chk=0/2)'):
+                filters[0](line)
+            return unittest.mock.DEFAULT
+
+        restoreFile = os.path.join(self.include.name, 'test')
+        with patch('tools.Execute', side_effect=execute):
+            self.sn.restore(self.sid, restoreFile,
+                            progress=lambda *args: progress.append(args))
+
+        self.assertEqual(progress[-1], (100, '2,468', '1.00MB/s', '0:00:00'))
+
     def test_restore_to_different_destination(self):
         restoreFile = os.path.join(self.include.name, 'test')
         self.prepairFileInfo(restoreFile)
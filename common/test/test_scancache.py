@@ -0,0 +1,202 @@
+# Back In Time
+# Copyright (C) 2008-2022 Oprea Dan, Bart de Koning, Richard Bailey,
+# Germar Reitze
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import os
+import sys
+import unittest
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import scancache
+
+
+class TestExcludeFilter(unittest.TestCase):
+    def test_basename(self):
+        exclude = scancache.ExcludeFilter(['*.tmp', '.cache/'])
+        self.assertTrue(exclude(b'/home/foo/bar.tmp', False))
+        self.assertFalse(exclude(b'/home/foo/bar.tmpx', False))
+        self.assertTrue(exclude(b'/home/foo/.cache', True))
+        self.assertFalse(exclude(b'/home/foo/.cache', False))
+
+    def test_path(self):
+        exclude = scancache.ExcludeFilter(['/home/foo/bar',
+                                           'baz/*.log',
+                                           '/srv/**/old',
+                                           '.local/share/[Tt]rash*'])
+        self.assertTrue(exclude(b'/home/foo/bar', False))
+        self.assertFalse(exclude(b'/x/home/foo/bar', False))
+        self.assertTrue(exclude(b'/x/baz/a.log', False))
+        self.assertFalse(exclude(b'/x/baz/a/b.log', False))
+        self.assertTrue(exclude(b'/srv/a/b/old', True))
+        self.assertTrue(exclude(b'/home/foo/.local/share/Trash', True))
+
+    def test_unknown_patterns_ignored(self):
+        exclude = scancache.ExcludeFilter(['foo/***', '- bar', '[abc'])
+        self.assertFalse(exclude(b'/foo/x', False))
+        self.assertFalse(exclude(b'/bar', False))
+        self.assertFalse(exclude(b'/[abc', False))
+
+
+class TestIncludeRoots(unittest.TestCase):
+    def test_nested(self):
+        include = [('/home/foo/bar', 0), ('/home/foo', 0),
+                   ('/home/foo2', 0), ('/etc/fstab', 1), ('/etc/fstab.d', 0)]
+        self.assertListEqual(scancache.includeRoots(include),
+                             [(b'/etc/fstab', False),
+                              (b'/etc/fstab.d', True),
+                              (b'/home/foo', True),
+                              (b'/home/foo2', True)])
+
+    def test_parent_folders(self):
+        self.assertListEqual(scancache.parentFolders(b'/home/foo/bar'),
+                             [b'/home', b'/home/foo'])
+        self.assertListEqual(scancache.parentFolders(b'/home'), [])
+
+
+class TestScanCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        # outside of the folders above the source which are scanned, too
+        self.tmpDb = TemporaryDirectory()
+        self.filename = os.path.join(self.tmpDb.name, 'scancache.db')
+        self.source = os.path.join(self.tmp.name, 'source')
+        os.makedirs(os.path.join(self.source, 'foo', 'bar'))
+        self.write('foo', 'file')
+        self.write('foo', 'bar', 'file')
+        self.include = [(self.source, 0)]
+        self.cache = scancache.ScanCache(self.filename, workers=2)
+        self.cache.open()
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+        self.tmpDb.cleanup()
+
+    def path(self, *path):
+        return os.fsencode(os.path.join(self.source, *path))
+
+    def write(self, *path, content='foo'):
+        with open(os.path.join(self.source, *path), 'wt') as f:
+            f.write(content)
+
+    def scan(self, **kwargs):
+        result = self.cache.scan(self.include, **kwargs)
+        self.cache.commit('20151219-010324-123', 'foo', True)
+        return result
+
+    def test_first_scan(self):
+        result = self.scan()
+        self.assertIn(self.path(), result.changed)
+        self.assertIn(self.path('foo', 'bar', 'file'), result.changed)
+        self.assertListEqual(result.deleted, [])
+        self.assertEqual(result.count, len(result.changed))
+
+    def test_unchanged(self):
+        self.scan()
+        result = self.scan()
+        self.assertEqual(len(result), 0)
+        self.assertGreater(result.count, 4)
+
+    def test_changed(self):
+        self.scan()
+        self.write('foo', 'bar', 'file', content='bar')
+        self.write('foo', 'new')
+        os.remove(os.path.join(self.source, 'foo', 'file'))
+
+        result = self.scan()
+        self.assertCountEqual(result.changed,
+                              [self.path('foo'),
+                               self.path('foo', 'bar', 'file'),
+                               self.path('foo', 'new')])
+        self.assertListEqual(result.deleted, [self.path('foo', 'file')])
+
+    def test_deleted_folder(self):
+        self.scan()
+        os.remove(os.path.join(self.source, 'foo', 'bar', 'file'))
+        os.rmdir(os.path.join(self.source, 'foo', 'bar'))
+
+        result = self.scan()
+        self.assertListEqual(result.deleted, [self.path('foo', 'bar')])
+        self.assertEqual(self.cache._children(self.path('foo', 'bar')), {})
+
+    def test_unchanged_folder_not_listed(self):
+        self.scan()
+        self.write('foo', 'bar', 'file', content='bar')
+
+        with patch('os.scandir', wraps=os.scandir) as scandir:
+            result = self.scan()
+            scandir.assert_not_called()
+        self.assertListEqual(result.changed, [self.path('foo', 'bar', 'file')])
+
+    def test_exclude(self):
+        result = self.scan(exclude=scancache.ExcludeFilter(['bar']))
+        self.assertNotIn(self.path('foo', 'bar'), result.changed)
+        self.assertNotIn(self.path('foo', 'bar', 'file'), result.changed)
+
+    def test_exclude_include_folder(self):
+        # include rules of folders come before all exclude rules in rsync
+        exclude = scancache.ExcludeFilter([self.source + '/*', 'source'])
+        result = self.scan(exclude=exclude)
+        self.assertIn(self.path(), result.changed)
+        self.assertNotIn(self.path('foo'), result.changed)
+
+    def test_limit(self):
+        result = self.scan(limit=2)
+        self.assertTrue(result.overflow)
+        self.assertEqual(len(result), 0)
+
+        # cache is updated completely anyway
+        self.assertEqual(len(self.scan()), 0)
+
+    def test_list_error(self):
+        self.scan()
+        self.write('foo', 'new')
+
+        with patch('os.scandir', side_effect=PermissionError('denied')):
+            result = self.scan()
+        self.assertEqual(result.errors, 1)
+        self.assertListEqual(result.deleted, [])
+
+        result = self.scan()
+        self.assertIn(self.path('foo', 'new'), result.changed)
+
+    def test_rollback(self):
+        self.scan()
+        self.write('foo', 'new')
+        self.cache.scan(self.include)
+        self.cache.close()
+
+        self.cache.open()
+        result = self.scan()
+        self.assertListEqual(sorted(result.changed),
+                             [self.path('foo'), self.path('foo', 'new')])
+
+    def test_valid(self):
+        self.assertFalse(self.cache.isValid('20151219-010324-123', 'foo'))
+        self.scan()
+        self.assertTrue(self.cache.isValid('20151219-010324-123', 'foo'))
+        self.assertFalse(self.cache.isValid('20151219-010324-123', 'bar'))
+        self.assertFalse(self.cache.isValid('20151219-020324-123', 'foo'))
+
+        self.cache.invalidate()
+        self.assertFalse(self.cache.isValid('20151219-010324-123', 'foo'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+# Back In Time
+# Copyright (C) 2008-2022 Oprea Dan, Bart de Koning, Richard Bailey,
+# Germar Reitze
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import os
+import sys
+import gzip
+import unittest
+from unittest.mock import patch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import configfile
+import snapshots
+import searchindex
+from test import generic
+
+SIDS = ('20151219-010324-123', '20151219-020324-123', '20151219-030324-123')
+
+
+class TestSearchIndex(generic.SnapshotsTestCase):
+    def setUp(self):
+        super(TestSearchIndex, self).setUp()
+        self.sids = [snapshots.SID(sid, self.cfg) for sid in SIDS]
+        first, second, third = self.sids
+
+        # invoice.pdf is unchanged in all snapshots, notes.txt changes in
+        # the third snapshot and old.txt is removed after the first one
+        first.makeDirs('foo')
+        with open(first.pathBackup('foo', 'invoice.pdf'), 'wt') as f:
+            f.write('invoice')
+        with open(first.pathBackup('foo', 'notes.txt'), 'wt') as f:
+            f.write('notes')
+        with open(first.pathBackup('foo', 'old.txt'), 'wt') as f:
+            f.write('old')
+
+        for sid in (second, third):
+            sid.makeDirs('foo')
+            os.link(first.pathBackup('foo', 'invoice.pdf'),
+                    sid.pathBackup('foo', 'invoice.pdf'))
+
+        os.link(first.pathBackup('foo', 'notes.txt'),
+                second.pathBackup('foo', 'notes.txt'))
+        with open(third.pathBackup('foo', 'notes.txt'), 'wt') as f:
+            f.write('new notes')
+
+    def inode(self, sid, *path):
+        return os.stat(sid.pathBackup(*path)).st_ino
+
+    def test_search(self):
+        first, second, third = self.sids
+
+        with searchindex.SearchIndex(self.cfg) as index:
+            self.assertEqual(index.update(self.sids), 3)
+            self.assertEqual(index.lastSID(), third.sid)
+
+            self.assertListEqual(index.search('invoice'),
+                                 [(b'/foo/invoice.pdf', first.sid, third.sid,
+                                   self.inode(first, 'foo', 'invoice.pdf'))])
+            self.assertListEqual(index.search('notes.txt'),
+                                 [(b'/foo/notes.txt', first.sid, second.sid,
+                                   self.inode(first, 'foo', 'notes.txt')),
+                                  (b'/foo/notes.txt', third.sid, third.sid,
+                                   self.inode(third, 'foo', 'notes.txt'))])
+            self.assertListEqual(index.search('old'),
+                                 [(b'/foo/old.txt', first.sid, first.sid,
+                                   self.inode(first, 'foo', 'old.txt'))])
+
+            results = index.search('/foo')
+            self.assertEqual(len(results), 5)
+            self.assertTupleEqual(results[0], (b'/foo', first.sid, third.sid, 0))
+
+    def test_glob(self):
+        with searchindex.SearchIndex(self.cfg) as index:
+            index.update(self.sids)
+
+            self.assertListEqual([path for path, *_ in index.search('*.txt')],
+                                 [b'/foo/notes.txt', b'/foo/notes.txt',
+                                  b'/foo/old.txt'])
+            self.assertListEqual([path for path, *_ in index.search('inv*.pdf')],
+                                 [b'/foo/invoice.pdf'])
+            self.assertListEqual(index.search('/inv*.pdf'), [])
+            self.assertListEqual(index.search('*.tx'), [])
+
+    def test_update_incremental(self):
+        first, second, third = self.sids
+
+        with searchindex.SearchIndex(self.cfg) as index:
+            self.assertEqual(index.update(self.sids[:2]), 2)
+            self.assertListEqual([r[1:3] for r in index.search('notes')],
+                                 [(first.sid, second.sid)])
+
+        with searchindex.SearchIndex(self.cfg) as index:
+            self.assertEqual(index.update(self.sids), 1)
+            self.assertEqual(index.update(self.sids), 0)
+            self.assertListEqual([r[1:3] for r in index.search('invoice')],
+                                 [(first.sid, third.sid)])
+            self.assertListEqual([r[1:3] for r in index.search('notes')],
+                                 [(first.sid, second.sid),
+                                  (third.sid, third.sid)])
+
+    def setChanges(self, sid, base, lines):
+        with gzip.open(sid.path(sid.CHANGES), 'wt', encoding='utf-8') as f:
+            for line in lines:
+                f.write(line + '\n')
+        info = configfile.ConfigFile()
+        info.setStrValue('changes_base', base)
+        sid.info = info
+
+    def test_update_from_changes(self):
+        first, second, third = self.sids
+        third.makeDirs('foo', 'new')
+        self.setChanges(second, first.sid, ['*deleting 3 0 /foo/old.txt'])
+        self.setChanges(third, second.sid, ['>f+++++++++ 9 0 /foo/notes.txt',
+                                            'cd+++++++++ 0 0 /foo/new'])
+
+        walk = searchindex.SearchIndex._walk
+        with patch('searchindex.SearchIndex._walk', autospec=True,
+                   side_effect=walk) as walked:
+            with searchindex.SearchIndex(self.cfg) as index:
+                self.assertEqual(index.update(self.sids), 3)
+                walked.assert_called_once_with(index, first.pathBackup())
+
+                self.assertListEqual(index.search('invoice'),
+                                     [(b'/foo/invoice.pdf', first.sid,
+                                       third.sid,
+                                       self.inode(first, 'foo', 'invoice.pdf'))])
+                self.assertListEqual([r[1:3] for r in index.search('notes')],
+                                     [(first.sid, second.sid),
+                                      (third.sid, third.sid)])
+                self.assertListEqual([r[1:3] for r in index.search('old')],
+                                     [(first.sid, first.sid)])
+                self.assertListEqual(index.search('new'),
+                                     [(b'/foo/new', third.sid, third.sid, 0)])
+
+    def test_update_changes_of_other_snapshot(self):
+        first, second, third = self.sids
+        # the manifest doesn't list the changes against the first snapshot
+        self.setChanges(second, '20151219-003024-123', [])
+
+        with searchindex.SearchIndex(self.cfg) as index:
+            index.update(self.sids[:2])
+            self.assertListEqual([r[1:3] for r in index.search('old')],
+                                 [(first.sid, first.sid)])
+
+    def test_reset(self):
+        with searchindex.SearchIndex(self.cfg) as index:
+            index.update(self.sids)
+
+        with searchindex.SearchIndex(self.cfg) as index:
+            index.VERSION = searchindex.SearchIndex.VERSION + 1
+            index.close()
+            index.open()
+            self.assertIsNone(index.lastSID())
+            self.assertListEqual(index.search('invoice'), [])
+
+    def test_special_characters(self):
+        sid = snapshots.SID('20151219-040324-123', self.cfg)
+        sid.makeDirs('foo')
+        with open(sid.pathBackup('foo', 'a\nb\xe4'), 'wt') as f:
+            f.write('foo')
+
+        with searchindex.SearchIndex(self.cfg) as index:
+            index.update(self.sids + [sid])
+            self.assertListEqual([path for path, *_ in index.search('a\nb')],
+                                 ['/foo/a\nb\xe4'.encode()])
+
+    def test_range_sids(self):
+        ids = list(SIDS)
+        self.assertListEqual(searchindex.rangeSIDs(ids, SIDS[0], SIDS[2]), ids)
+        self.assertListEqual(searchindex.rangeSIDs(ids, SIDS[1], SIDS[1]),
+                             [SIDS[1]])
+        self.assertListEqual(searchindex.rangeSIDs(ids[1:], SIDS[0], SIDS[0]),
+                             [])
+
+
+if __name__ == '__main__':
+    unittest.main()
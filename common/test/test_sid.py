@@ -17,6 +17,7 @@
 
 import os
 import sys
+import bz2
 import unittest
 import stat
 from datetime import date, datetime
@@ -289,7 +290,7 @@ class TestSID(generic.SnapshotsTestCase):
         os.makedirs(os.path.join(self.snapshotPath, '20151219-010324-123'))
         infoFile = os.path.join(self.snapshotPath,
                                 '20151219-010324-123',
-                                'fileinfo.bz2')
+                                'fileinfo.idx')
 
         d = snapshots.FileInfoDict()
         d[b'/tmp']     = (123, b'foo', b'bar')
@@ -302,6 +303,64 @@ class TestSID(generic.SnapshotsTestCase):
         sid2 = snapshots.SID('20151219-010324-123', self.cfg)
         self.assertDictEqual(sid2.fileInfo, d)
 
+    def test_fileInfoDict(self):
+        d = snapshots.FileInfoDict()
+        d[b'/tmp']     = (123, b'foo', b'bar')
+        d[b'/tmp/foo'] = (456, b'foo', b'qwer')
+        d[b'/tmp']     = (789, b'asdf', b'bar')
+
+        self.assertEqual(len(d), 3)
+        self.assertTupleEqual(d[b'/tmp'], (789, b'asdf', b'bar'))
+        self.assertTupleEqual(d.get(b'/tmp/foo'), (456, b'foo', b'qwer'))
+        self.assertIsNone(d.get(b'/tmp/bar'))
+        self.assertListEqual(list(d.items()),
+                             [(b'/', (16877, b'root', b'root')),
+                              (b'/tmp', (789, b'asdf', b'bar')),
+                              (b'/tmp/foo', (456, b'foo', b'qwer'))])
+        # user and group names are stored once
+        self.assertListEqual(d._names, [b'root', b'foo', b'bar', b'qwer',
+                                        b'asdf'])
+
+        self.assertEqual(d, {b'/': (16877, b'root', b'root'),
+                             b'/tmp': (789, b'asdf', b'bar'),
+                             b'/tmp/foo': (456, b'foo', b'qwer')})
+        del d[b'/tmp']
+        self.assertNotIn(b'/tmp', d)
+        self.assertNotEqual(d, snapshots.FileInfoDict())
+
+    def test_fileInfoBz2(self):
+        sid = snapshots.SID('20151219-010324-123', self.cfg)
+        os.makedirs(os.path.join(self.snapshotPath, '20151219-010324-123'))
+        with bz2.BZ2File(sid.path(sid.FILEINFO_BZ2), 'wb') as f:
+            f.write(b'123 foo bar /tmp\n456 asdf qwer /tmp/foo\n')
+
+        d = snapshots.FileInfoDict()
+        d[b'/tmp']     = (123, b'foo', b'bar')
+        d[b'/tmp/foo'] = (456, b'asdf', b'qwer')
+        self.assertDictEqual(sid.fileInfo, d)
+
+        del d[b'/tmp/foo']
+        self.assertDictEqual(sid.fileInfoSubtrees([b'/tmp/bar']), d)
+
+    def test_fileInfoSubtrees(self):
+        sid = snapshots.SID('20151219-010324-123', self.cfg)
+        os.makedirs(os.path.join(self.snapshotPath, '20151219-010324-123'))
+
+        d = snapshots.FileInfoDict()
+        d[b'/tmp']             = (123, b'foo', b'bar')
+        d[b'/tmp/foo']         = (456, b'asdf', b'qwer')
+        d[b'/tmp/foo/bar']     = (456, b'asdf', b'qwer')
+        d[b'/tmp/foo/bar/baz'] = (456, b'asdf', b'qwer')
+        d[b'/tmp/foobar']      = (456, b'asdf', b'qwer')
+        sid.fileInfo = d
+
+        del d[b'/tmp/foobar']
+        self.assertDictEqual(sid.fileInfoSubtrees([b'/tmp/foo/bar/']), d)
+
+        del d[b'/tmp/foo/bar/baz']
+        del d[b'/tmp/foo/bar']
+        self.assertDictEqual(sid.fileInfoSubtrees([b'/tmp/foo/baz']), d)
+
     @patch('logger.error')
     def test_fileInfoErrorRead(self, mock_logger):
         sid = snapshots.SID('20151219-010324-123', self.cfg)
@@ -437,6 +496,25 @@ class TestNewSnapshot(generic.SnapshotsTestCase):
         log.flush()
         self.assertTrue(new.hasChanges)
 
+    def test_checkpoints(self):
+        new = snapshots.NewSnapshot(self.cfg)
+        new.makeDirs()
+        self.assertIsNone(new.checkpoints('foo'))
+
+        new.startCheckpoints('foo')
+        self.assertListEqual(new.checkpoints('foo'), [])
+        self.assertIsNone(new.checkpoints('bar'))
+
+        new.addCheckpoint('foo', [('/home/foo', 0), ('/home/foo/bar', 0)])
+        new.addCheckpoint('foo', [('/etc/fstab', 1)])
+        self.assertListEqual(new.checkpoints('foo'),
+                             [[('/home/foo', 0), ('/home/foo/bar', 0)],
+                              [('/etc/fstab', 1)]])
+
+        new.removeCheckpoints()
+        self.assertIsNone(new.checkpoints('foo'))
+        self.assertNotExists(new.path(new.CHECKPOINTS))
+
 class TestRootSnapshot(generic.SnapshotsTestCase):
     #TODO: add test with 'sid.path(use_mode=['ssh_encfs'])'
     def test_create(self):
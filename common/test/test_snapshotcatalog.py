@@ -0,0 +1,123 @@
+# Back In Time
+# Copyright (C) 2008-2022 Oprea Dan, Bart de Koning, Richard Bailey,
+# Germar Reitze
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import os
+import sys
+import unittest
+from test import generic
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import snapshots
+import snapshotcatalog
+
+ENTRY = {'name': '', 'failed': False, 'last_checked': '2015-12-19 01:03:24'}
+
+
+class TestSnapshotCatalog(generic.SnapshotsTestCase):
+    def setUp(self):
+        super(TestSnapshotCatalog, self).setUp()
+        self.catalog = snapshotcatalog.SnapshotCatalog(self.cfg)
+
+        for i in ('20151219-010324-123', '20151219-020324-123'):
+            os.makedirs(os.path.join(self.snapshotPath, i, 'backup'))
+
+    def describe(self, item):
+        self.described.append(item)
+        return dict(ENTRY)
+
+    def test_build(self):
+        self.described = []
+        entries = self.catalog.entries(self.describe)
+        self.assertCountEqual(entries.keys(), ['20151219-010324-123',
+                                               '20151219-020324-123'])
+        self.assertCountEqual(self.described, entries.keys())
+        self.assertIsFile(self.cfg.snapshotCatalogFile())
+        self.assertNotExists(os.path.join(self.snapshotPath, 'catalog.json'))
+
+    def test_saved_catalog_is_used(self):
+        # not modified within the racy time
+        os.utime(self.snapshotPath, ns=(0, 10**9))
+        self.described = []
+        self.catalog.entries(self.describe)
+        self.assertEqual(len(self.described), 2)
+
+        # writing the catalog didn't invalidate it
+        self.described = []
+        self.catalog.entries(self.describe)
+        self.assertListEqual(self.described, [])
+
+    def test_other_folder(self):
+        self.catalog.save(self.catalog._folderMTime(), {})
+        self.catalog.folder = os.path.dirname(self.snapshotPath)
+        self.assertEqual(self.catalog.load(), (None, None))
+
+    def test_unchanged_folder(self):
+        self.catalog.save(self.catalog._folderMTime(),
+                          {'20151219-010324-123': ENTRY})
+
+        self.described = []
+        entries = self.catalog.entries(self.describe)
+        self.assertListEqual(list(entries), ['20151219-010324-123'])
+        self.assertListEqual(self.described, [])
+
+    def test_changed_folder(self):
+        self.catalog.save(0, {'20151219-010324-123': ENTRY,
+                              '20151219-000324-123': ENTRY})
+
+        self.described = []
+        entries = self.catalog.entries(self.describe)
+        self.assertCountEqual(entries.keys(), ['20151219-010324-123',
+                                               '20151219-020324-123'])
+        self.assertListEqual(self.described, ['20151219-020324-123'])
+
+    def test_update_remove(self):
+        self.catalog.save(0, {'20151219-010324-123': ENTRY})
+
+        self.catalog.update('20151219-020324-123', ENTRY)
+        self.assertCountEqual(self.catalog.load()[1].keys(),
+                              ['20151219-010324-123', '20151219-020324-123'])
+
+        self.catalog.remove('20151219-010324-123')
+        self.assertListEqual(list(self.catalog.load()[1]),
+                             ['20151219-020324-123'])
+
+    def test_broken_file(self):
+        with open(self.cfg.snapshotCatalogFile(), 'wt') as f:
+            f.write('{"version": 1, "mtime"')
+
+        self.assertEqual(self.catalog.load(), (None, None))
+        self.assertEqual(len(snapshots.listSnapshots(self.cfg)), 2)
+
+    def test_sid_details(self):
+        sid = snapshots.SID('20151219-010324-123', self.cfg)
+        sid.failed = True
+        snapshots.listSnapshots(self.cfg)
+
+        sid.name = 'foo'
+        self.catalog.save(self.catalog._folderMTime(),
+                          self.catalog.load()[1])
+
+        sids = snapshots.listSnapshots(self.cfg)
+        self.assertEqual(sids[1].name, 'foo')
+        self.assertTrue(sids[1].failed)
+        self.assertEqual(sids[1].displayName,
+                         '2015-12-19 01:03:24 - foo (WITH ERRORS !)')
+
+
+if __name__ == '__main__':
+    unittest.main()
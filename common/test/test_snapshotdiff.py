@@ -0,0 +1,132 @@
+# Back In Time
+# Copyright (C) 2008-2022 Oprea Dan, Bart de Koning, Richard Bailey,
+# Germar Reitze
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import snapshots
+import snapshotdiff
+from test import generic
+
+
+class TestSnapshotDiff(generic.SnapshotsTestCase):
+    def setUp(self):
+        super(TestSnapshotDiff, self).setUp()
+        self.sid1 = snapshots.SID('20151219-010324-123', self.cfg)
+        self.sid2 = snapshots.SID('20151219-020324-123', self.cfg)
+
+        self.sid1.makeDirs('foo', 'old')
+        self.sid2.makeDirs('foo', 'new', 'sub')
+        self.sid2.makeDirs('foo', 'bar')
+
+        self.write(self.sid1, 'foo', 'same', content='same')
+        os.link(self.sid1.pathBackup('foo', 'same'),
+                self.sid2.pathBackup('foo', 'same'))
+        self.write(self.sid1, 'foo', 'changed', content='old')
+        self.write(self.sid2, 'foo', 'changed', content='new content')
+        self.write(self.sid1, 'foo', 'old', 'file')
+        self.write(self.sid2, 'foo', 'new', 'sub', 'file')
+        self.write(self.sid1, 'foo', 'bar')
+        os.symlink('same', self.sid1.pathBackup('foo', 'link'))
+        os.symlink('changed', self.sid2.pathBackup('foo', 'link'))
+
+    def write(self, sid, *path, content='foo'):
+        with open(sid.pathBackup(*path), 'wt') as f:
+            f.write(content)
+
+    def test_diff(self):
+        self.assertListEqual(list(snapshotdiff.diff(self.sid1, self.sid2)),
+                             [('T', b'/foo/bar'),
+                              ('M', b'/foo/changed'),
+                              ('M', b'/foo/link'),
+                              ('A', b'/foo/new'),
+                              ('A', b'/foo/new/sub'),
+                              ('A', b'/foo/new/sub/file'),
+                              ('D', b'/foo/old'),
+                              ('D', b'/foo/old/file')])
+
+    def test_reverse(self):
+        self.assertListEqual(list(snapshotdiff.diff(self.sid2, self.sid1,
+                                                    '/foo/new')),
+                             [('D', b'/foo/new'),
+                              ('D', b'/foo/new/sub'),
+                              ('D', b'/foo/new/sub/file')])
+
+    def test_path(self):
+        self.assertListEqual(list(snapshotdiff.diff(self.sid1, self.sid2,
+                                                    '/foo/changed')),
+                             [('M', b'/foo/changed')])
+        self.assertListEqual(list(snapshotdiff.diff(self.sid1, self.sid2,
+                                                    '/foo/same')), [])
+        self.assertListEqual(list(snapshotdiff.diff(self.sid1, self.sid2,
+                                                    '/foo/new/')),
+                             [('A', b'/foo/new'),
+                              ('A', b'/foo/new/sub'),
+                              ('A', b'/foo/new/sub/file')])
+        self.assertListEqual(list(snapshotdiff.diff(self.sid1, self.sid2,
+                                                    '/missing')), [])
+
+    def test_same_size_and_mtime(self):
+        # a new copy of an unchanged file (e.g. after a permission change)
+        self.write(self.sid1, 'foo', 'copy')
+        self.write(self.sid2, 'foo', 'copy')
+        st = os.stat(self.sid1.pathBackup('foo', 'copy'))
+        os.utime(self.sid2.pathBackup('foo', 'copy'),
+                 ns=(st.st_atime_ns, st.st_mtime_ns))
+
+        self.assertNotIn(b'/foo/copy',
+                         [path for status, path
+                          in snapshotdiff.diff(self.sid1, self.sid2)])
+
+    def test_permission_changed(self):
+        self.write(self.sid1, 'foo', 'copy')
+        self.write(self.sid2, 'foo', 'copy')
+        st = os.stat(self.sid1.pathBackup('foo', 'copy'))
+        os.utime(self.sid2.pathBackup('foo', 'copy'),
+                 ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.chmod(self.sid2.pathBackup('foo', 'copy'), 0o600)
+
+        self.assertIn(('M', b'/foo/copy'),
+                      list(snapshotdiff.diff(self.sid1, self.sid2)))
+
+    def test_permission_denied(self):
+        with patch('os.lstat', side_effect=PermissionError(13, 'denied')):
+            self.assertListEqual(list(snapshotdiff.diff(self.sid1, self.sid2,
+                                                        '/foo/changed')),
+                                 [])
+
+    def test_hardlinks_skip_stat(self):
+        with patch('snapshotdiff._compare',
+                   wraps=snapshotdiff._compare) as compare:
+            list(snapshotdiff.diff(self.sid1, self.sid2, '/foo/same'))
+            list(snapshotdiff.diff(self.sid1, self.sid2))
+
+        paths = [call.args[2] for call in compare.call_args_list]
+        self.assertFalse([path for path in paths if path.endswith(b'/same')])
+
+    def test_callback(self):
+        folders = []
+        list(snapshotdiff.diff(self.sid1, self.sid2, callback=folders.append))
+        self.assertListEqual(folders, [b'', b'/foo'])
+
+
+if __name__ == '__main__':
+    unittest.main()
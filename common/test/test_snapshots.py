@@ -30,6 +30,8 @@ import config
 import snapshots
 import tools
 import mount
+import progress
+import scancache
 
 
 # all groups the current user is member in
@@ -234,6 +236,33 @@ class RsyncExcludeIncludeSuffix(generic.SnapshotsTestCase):
                                            r'--exclude=\* /$')
 
 
+class IncludeShards(generic.SnapshotsTestCase):
+    def test_split(self):
+        shards = self.sn.includeShards([('/foo', 0),
+                                        ('/bar', 1),
+                                        ('/baz', 0)], 2)
+        self.assertListEqual(shards, [[('/bar', 1), ('/foo', 0)],
+                                      [('/baz', 0)]])
+
+    def test_nested_items_same_shard(self):
+        shards = self.sn.includeShards([('/foo', 0),
+                                        ('/foobar', 0),
+                                        ('/foo/bar/baz', 1),
+                                        ('/foo/bar', 0)], 4)
+        self.assertListEqual(shards, [[('/foo', 0),
+                                       ('/foo/bar', 0),
+                                       ('/foo/bar/baz', 1)],
+                                      [('/foobar', 0)]])
+
+    def test_root(self):
+        include = [('/', 0), ('/foo', 0)]
+        self.assertListEqual(self.sn.includeShards(include, 4), [include])
+
+    def test_single_worker(self):
+        shards = self.sn.includeShards([('/foo', 0), ('/bar', 0)], 1)
+        self.assertListEqual(shards, [[('/bar', 0), ('/foo', 0)]])
+
+
 class Callbacks(generic.SnapshotsTestCase):
     def test_restore(self):
         msg = 'foo'
@@ -300,6 +329,64 @@ class Callbacks(generic.SnapshotsTestCase):
                              '[E] Error: rsync: send_files failed to open "/foo/bar": Operation not permitted (1)\n', f.read())
 
 
+    def test_coalesce_messages(self):
+        params = [False, False]
+
+        self.sn.rsyncCallback('BACKINTIME: <f+++++++++ /foo', params)
+        self.sn.rsyncCallback('BACKINTIME: <f+++++++++ /bar', params)
+        with open(self.cfg.takeSnapshotMessageFile(), 'rt') as f:
+            self.assertEqual('0\nTake snapshot (rsync: BACKINTIME: <f+++++++++ /foo)', f.read())
+
+        self.sn.flushRsyncStatus()
+        with open(self.cfg.takeSnapshotMessageFile(), 'rt') as f:
+            self.assertEqual('0\nTake snapshot (rsync: BACKINTIME: <f+++++++++ /bar)', f.read())
+
+        self.sn.snapshotLog.flush()
+        with open(self.cfg.takeSnapshotLogFile(), 'rt') as f:
+            self.assertEqual('[I] Take snapshot (rsync: BACKINTIME: <f+++++++++ /foo)\n'
+                             '[C] <f+++++++++ /foo\n'
+                             '[I] Take snapshot (rsync: BACKINTIME: <f+++++++++ /bar)\n'
+                             '[C] <f+++++++++ /bar\n', f.read())
+
+    def test_filter_progress(self):
+        self.assertEqual(self.sn.filterRsyncProgress('BACKINTIME: <f+++++++++ /foo'),
+                         'BACKINTIME: <f+++++++++ /foo')
+        self.assertEqual(self.sn.filterRsyncProgress('    517.38K  26%   14.46MB/s    0:02:36'), '')
+        self.assertEqual(self.sn.filterRsyncProgress('    1.02M  52%   14.46MB/s    0:01:12'), '')
+
+        pg = progress.ProgressFile(self.cfg)
+        pg.load()
+        self.assertEqual(pg.intValue('percent'), 26)
+
+        self.sn.flushRsyncStatus()
+        pg.load()
+        self.assertEqual(pg.intValue('status'), pg.RSYNC)
+        self.assertEqual(pg.intValue('percent'), 52)
+        self.assertEqual(pg.strValue('sent'), '1.02M')
+
+    def test_filter_progress_estimated(self):
+        self.sn._progressEstimator = progress.ProgressEstimator(
+            files=1000, size=4000000)
+        self.sn.filterRsyncProgress(
+            '    1.00M  90%   14.46MB/s    0:00:01 (xfr#1, ir-chk=10/100)')
+        self.sn.flushRsyncStatus()
+
+        pg = progress.ProgressFile(self.cfg)
+        pg.load()
+        self.assertEqual(pg.intValue('percent'), 9)
+        self.assertTrue(pg.strValue('eta'))
+
+    def test_snapshot_stats(self):
+        sid = snapshots.SID('20151219-010324-123', self.cfg)
+        sid.makeDirs()
+        self.assertDictEqual(self.sn.snapshotStats(sid), {})
+        self.assertDictEqual(self.sn.snapshotStats(None), {})
+
+        stats = {'files': 10, 'size': 2000, 'duration': 3}
+        self.sn._backup_info_file(sid, stats)
+        self.assertDictEqual(self.sn.snapshotStats(sid), stats)
+
+
 class SmartRemove(generic.SnapshotsTestCase):
     def test_increment_month(self):
         self.assertEqual(self.sn.incMonth(date(2016,  4, 21)), date(2016, 5, 1))
@@ -440,6 +527,156 @@ class SmartRemove(generic.SnapshotsTestCase):
                                              sid22, sid24, sid27, sid28, sid30])
 
 
+    def test_smart_remove_keep_reasons(self):
+        sid1 = snapshots.SID('20160424-215134-123', self.cfg)
+        sid2 = snapshots.SID('20160424-030324-123', self.cfg)
+        sid3 = snapshots.SID('20160423-030324-123', self.cfg)
+        sid4 = snapshots.SID('20160423-010324-123', self.cfg)
+        sid5 = snapshots.SID('20150904-134327-123', self.cfg)
+        sids = [sid1, sid2, sid3, sid4, sid5]
+        for sid in sids:
+            sid.makeDirs()
+        sid3.failed = True
+
+        keep = self.sn.smartRemoveKeep(sids, date(2016, 4, 24), 1, 2, 0, 0)
+        self.assertDictEqual(keep, {
+            sid1: ['last snapshot',
+                   'all for the last 1 days',
+                   'one per day (2016-04-24)',
+                   'one per year (2016)'],
+            sid2: ['all for the last 1 days'],
+            sid4: ['one per day (2016-04-23)'],
+            sid5: ['one per year (2015)']})
+
+    def test_smart_remove_keep_other_tag(self):
+        # tags are compared on date only, not on the current profile's tag
+        self.cfg.setProfileStrValue('snapshots.tag', '500')
+        sid1 = snapshots.SID('20160424-000000-999', self.cfg)
+        sid2 = snapshots.SID('20160423-000000-100', self.cfg)
+        sid3 = snapshots.SID('20160422-000000-100', self.cfg)
+        sids = [sid1, sid2, sid3]
+
+        keep = self.sn.smartRemoveKeep(sids, date(2016, 4, 24), 0, 2, 0, 0)
+        self.assertListEqual(keep[sid1], ['last snapshot',
+                                          'one per day (2016-04-24)',
+                                          'one per year (2016)'])
+        self.assertListEqual(keep[sid2], ['one per day (2016-04-23)'])
+        self.assertNotIn(sid3, keep)
+
+
+class FreeSpacePlan(generic.SnapshotsTestCase):
+    def setUp(self):
+        super(FreeSpacePlan, self).setUp()
+        self.sids = []
+        for i in ('20160422-010324-123',
+                  '20160423-010324-123',
+                  '20160424-010324-123'):
+            sid = snapshots.SID(i, self.cfg)
+            sid.makeDirs()
+            with open(sid.pathBackup('foo'), 'wt') as f:
+                f.write('foo')
+            self.sids.append(sid)
+
+    def test_enough_space(self):
+        self.assertListEqual(self.sn.freeSpacePlan(self.sids, 1, None), [])
+        self.assertListEqual(self.sn.freeSpacePlan(self.sids, None, None), [])
+
+    def test_keep_last_snapshot(self):
+        plan = self.sn.freeSpacePlan(self.sids, 2**40, None)
+        self.assertListEqual(plan, self.sids[:-1])
+
+    def test_keep_named(self):
+        self.cfg.setDontRemoveNamedSnapshots(True)
+        self.sids[0].name = 'foo'
+        plan = self.sn.freeSpacePlan(self.sids, 2**40, None)
+        self.assertListEqual(plan, self.sids[1:-1])
+
+    def test_pending(self):
+        self.assertListEqual(
+            self.sn.freeSpacePlan(self.sids, 1, None, pending=(2**40, 0)),
+            [])
+
+    def test_disk_usage_hard_links(self):
+        os.link(self.sids[0].pathBackup('foo'), self.sids[1].pathBackup('bar'))
+
+        links = {}
+        space, inodes = self.sn.diskUsage(self.sids[0].path(), links)
+        # only folder 'backup' because 'foo' is still linked in the second
+        # snapshot
+        self.assertEqual(inodes, 1)
+        space, inodes = self.sn.diskUsage(self.sids[1].path(), links)
+        self.assertEqual(inodes, 3)
+        self.assertDictEqual(links, {})
+
+    def test_free_space_halves_plan(self):
+        self.cfg.setMinFreeSpace(True, 1, config.Config.DISK_UNIT_MB)
+        self.cfg.setMinFreeInodes(False, 2)
+        self.cfg.setRemoveOldSnapshots(False, 10, config.Config.YEAR)
+        with patch.object(self.sn, 'freeSpacePlan',
+                          side_effect=[self.sids[:2], []]) as plan, \
+             patch.object(self.sn, 'statFreeSpaceLocal') as stat:
+            self.sn.freeSpace(datetime.today())
+
+        # measured again after removing the older half of the plan
+        self.assertEqual(plan.call_count, 2)
+        stat.assert_not_called()
+        self.assertFalse(self.sids[0].exists())
+        self.assertTrue(self.sids[1].exists())
+
+    def test_free_space_background(self):
+        self.cfg.setMinFreeSpace(True, 2**20, config.Config.DISK_UNIT_GB)
+        self.cfg.setMinFreeInodes(False, 2)
+        self.cfg.setRemoveOldSnapshots(False, 10, config.Config.YEAR)
+        self.cfg.setBackgroundRemoveEnabled(True)
+        with patch.object(self.sn, 'diskUsage',
+                          wraps=self.sn.diskUsage) as usage:
+            self.sn.freeSpace(datetime.today())
+
+        # each trashed snapshot is walked only once
+        self.assertEqual(usage.call_count, 2)
+        self.assertFalse(self.sids[0].exists())
+        self.assertFalse(self.sids[1].exists())
+        self.assertTrue(self.sids[2].exists())
+
+
+class Trash(generic.SnapshotsTestCase):
+    def setUp(self):
+        super(Trash, self).setUp()
+        self.sids = []
+        for i in ('20160422-010324-123', '20160423-010324-123'):
+            sid = snapshots.SID(i, self.cfg)
+            sid.makeDirs('foo')
+            with open(sid.pathBackup('foo', 'bar'), 'wt') as f:
+                f.write('bar')
+            self.sids.append(sid)
+
+    def test_move_to_trash(self):
+        snapshots.listSnapshots(self.cfg)
+
+        self.assertTrue(self.sn.moveToTrash(self.sids[0]))
+        self.assertFalse(self.sids[0].exists())
+        self.assertExists(self.sn.trashPath(), self.sids[0].sid)
+        self.assertListEqual(snapshots.listSnapshots(self.cfg),
+                             self.sids[1:])
+
+    def test_empty_trash(self):
+        for sid in self.sids:
+            self.sn.moveToTrash(sid)
+
+        self.assertTrue(self.sn.emptyTrash())
+        self.assertListEqual(os.listdir(self.sn.trashPath()), [])
+        self.assertListEqual(snapshots.listSnapshots(self.cfg), [])
+
+    def test_empty_trash_resume(self):
+        self.sn.moveToTrash(self.sids[0])
+        # interrupted deletion
+        os.remove(os.path.join(self.sn.trashPath(), self.sids[0].sid,
+                               'backup', 'foo', 'bar'))
+
+        self.assertTrue(self.sn.emptyTrash())
+        self.assertListEqual(os.listdir(self.sn.trashPath()), [])
+
+
 class SnapshotWithSID(generic.SnapshotsWithSidTestCase):
     def test_backup_config(self):
         self.sn.backupConfig(self.sid)
@@ -470,7 +707,7 @@ user.size=.+''', re.MULTILINE))
         #TODO: add test for save permissions over SSH (and one SSH-test for path with spaces)
         infoFilePath = os.path.join(self.snapshotPath,
                                     '20151219-010324-123',
-                                    'fileinfo.bz2')
+                                    'fileinfo.idx')
 
         include = self.cfg.include()[0][0]
         with TemporaryDirectory(dir = include) as tmp:
@@ -493,6 +730,134 @@ user.size=.+''', re.MULTILINE))
             self.assertIn(tmp.encode(), fileInfo)
             self.assertIn(file_path.encode(), fileInfo)
 
+    def test_backup_permissions_unchanged(self):
+        include = self.cfg.include()[0][0]
+        with TemporaryDirectory(dir = include) as tmp:
+            for name in ('foo', 'bar'):
+                with open(os.path.join(tmp, name), 'wt') as f:
+                    f.write(name)
+
+            prev_sid = snapshots.SID('20151218-010324-123', self.cfg)
+            prev_sid.makeDirs()
+            d = snapshots.FileInfoDict()
+            for name in ('foo', 'bar'):
+                d[os.path.join(tmp, name).encode()] = (33188, b'nobody',
+                                                       b'nogroup')
+            prev_sid.fileInfo = d
+
+            self.sid.makeDirs(tmp)
+            for name in ('foo', 'bar'):
+                with open(self.sid.pathBackup(tmp, name), 'wt') as f:
+                    f.write(name)
+
+            itemized = {os.path.join(tmp, 'bar').lstrip(os.sep).encode()}
+            self.sn.backupPermissions(self.sid, prev_sid, itemized)
+
+            fileInfo = self.sid.fileInfo
+            self.assertTupleEqual(fileInfo[os.path.join(tmp, 'foo').encode()],
+                                  (33188, b'nobody', b'nogroup'))
+            self.assertEqual(fileInfo[os.path.join(tmp, 'bar').encode()][1],
+                             CURRENTUSER.encode())
+            self.assertIn(tmp.encode(), fileInfo)
+
+    def test_backup_permissions_sorted(self):
+        include = self.cfg.include()[0][0]
+        with TemporaryDirectory(dir = include) as tmp:
+            names = ('a', 'a-b', 'a.txt', os.path.join('a', 'b'), 'b')
+            self.sid.makeDirs(tmp, 'a', 'b')
+            os.makedirs(os.path.join(tmp, 'a', 'b'))
+            for name in ('a-b', 'a.txt', 'b'):
+                with open(os.path.join(tmp, name), 'wt') as f:
+                    f.write(name)
+                with open(self.sid.pathBackup(tmp, name), 'wt') as f:
+                    f.write(name)
+
+            self.assertEqual(self.sn.backupPermissions(self.sid), 0)
+
+            fileInfo = self.sid.fileInfo
+            for name in names:
+                self.assertIn(os.path.join(tmp, name).encode(), fileInfo)
+
+    def test_itemized_names(self):
+        self.assertListEqual(self.sn.itemizedNames('foo/bar/'), [b'foo/bar'])
+        self.assertListEqual(self.sn.itemizedNames('foo -> bar'),
+                             [b'foo -> bar', b'foo'])
+        self.assertListEqual(self.sn.itemizedNames('f\\#303\\#244o'),
+                             ['fäo'.encode()])
+
+        self.sn._itemized = set()
+        self.sn.rsyncCallback('BACKINTIME: cd+++++++++ foo/', [False, False])
+        self.sn.rsyncCallback('BACKINTIME: >f.st...... foo/bar', [False, False])
+        self.assertSetEqual(self.sn._itemized, {b'foo', b'foo/bar'})
+
+    def test_changes(self):
+        mtime = int(datetime(2023, 11, 5, 12, 34, 56).timestamp())
+        params = [False, False]
+
+        self.sn._changes = self.sn.openChanges(self.sid)
+        for line in ('BACKINTIME: >f+++++++++ foo/bar 1,234 2023/11/05-12:34:56',
+                     'BACKINTIME: cd+++++++++ foo/ 4096 2023/11/05-12:34:56',
+                     'BACKINTIME: cL+++++++++ foo/link -> bar 3 2023/11/05-12:34:56',
+                     'BACKINTIME: hf+++++++++ foo/a\\#012b => foo/bar 1234 2023/11/05-12:34:56'):
+            self.sn.rsyncCallback(line, params)
+        self.sn._changes.close()
+
+        self.assertListEqual(list(self.sid.changes()),
+                             [(b'/foo/bar', '>f+++++++++', 1234, mtime),
+                              (b'/foo/link', 'cL+++++++++', 3, mtime),
+                              (b'/foo/a\nb', 'hf+++++++++', 1234, mtime)])
+        self.sn.snapshotLog.flush()
+        with open(self.cfg.takeSnapshotLogFile(), 'rt') as f:
+            self.assertIn('[C] >f+++++++++ foo/bar\n', f.read())
+
+    def test_deleted_changes(self):
+        prev_sid = snapshots.SID('20151218-010324-123', self.cfg)
+        prev_sid.makeDirs('foo')
+        with open(prev_sid.pathBackup('foo', 'bar\xe4'), 'wt') as f:
+            f.write('foo')
+        info = (33188, b'user', b'user')
+        d = snapshots.FileInfoDict()
+        for path in (b'/foo', b'/foo/baz'):
+            d[path] = info
+        self.sid.fileInfo = d
+        d['/foo/bar\xe4'.encode()] = info
+        prev_sid.fileInfo = d
+
+        self.assertTrue(self.sn.addFileInfoChanges(self.sid, prev_sid))
+
+        changes = list(self.sid.changes())
+        self.assertEqual(len(changes), 1)
+        self.assertTupleEqual(changes[0][:3],
+                              ('/foo/bar\xe4'.encode(), '*deleting', 3))
+
+    def test_created_folder_changes(self):
+        prev_sid = snapshots.SID('20151218-010324-123', self.cfg)
+        prev_sid.makeDirs('foo')
+        self.sid.makeDirs('foo', 'new')
+        self.sid.makeDirs('foo', 'replaced')
+        file_info = (33188, b'user', b'user')
+        dir_info = (16877, b'user', b'user')
+        d = snapshots.FileInfoDict()
+        d[b'/foo'] = dir_info
+        d[b'/foo/replaced'] = file_info
+        prev_sid.fileInfo = d
+        d[b'/foo/new'] = dir_info
+        d[b'/foo/replaced'] = dir_info
+        self.sid.fileInfo = d
+
+        self.assertTrue(self.sn.addFileInfoChanges(self.sid, prev_sid))
+
+        self.assertListEqual([change[:2] for change in self.sid.changes()],
+                             [(b'/foo/new', 'cd+++++++++'),
+                              (b'/foo/replaced', 'cd+++++++++')])
+        self.assertFalse(self.sn.addFileInfoChanges(self.sid, None))
+
+    def test_escape_rsync(self):
+        for name in (b'foo', b'f\no', b'f\\#oo', b'f\xffo', 'fäo'.encode()):
+            self.assertEqual(snapshots.unescapeRsync(
+                snapshots.escapeRsync(name).encode()), name)
+        self.assertEqual(snapshots.escapeRsync(b'f\no'), 'f\\#012o')
+
     def test_collect_permission(self):
         # force permissions because different distributions will have different umask
         os.chmod(self.testDirFullPath, stat.S_IRWXU | stat.S_IRWXG | stat.S_IROTH | stat.S_IXOTH)
@@ -638,6 +1003,83 @@ class RestorePathInfo(generic.SnapshotsTestCase):
         self.assertEqual(s.st_gid, CURRENTGID)
 
 
+class RestorePermissions(generic.SnapshotsTestCase):
+    def setUp(self):
+        super(RestorePermissions, self).setUp()
+        self.tmp = TemporaryDirectory()
+        self.root = self.tmp.name.encode()
+        self.folder = os.path.join(self.root, b'foo')
+        self.file = os.path.join(self.folder, b'bar')
+        self.link = os.path.join(self.folder, b'link')
+        os.makedirs(self.folder)
+        with open(self.file, 'wt'):
+            pass
+        os.symlink(b'bar', self.link)
+        self.messages = []
+
+    def tearDown(self):
+        os.chmod(self.folder, 0o755)
+        self.tmp.cleanup()
+        super(RestorePermissions, self).tearDown()
+
+    def entry(self, mode):
+        return (mode,
+                CURRENTUSER.encode('utf-8', 'replace'),
+                CURRENTGROUP.encode('utf-8', 'replace'))
+
+    def test_no_changes(self):
+        entries = {path: self.entry(os.stat(path).st_mode)
+                   for path in (self.folder, self.file)}
+
+        self.sn.restorePermissions(entries, self.messages.append)
+
+        self.assertListEqual(self.messages, [])
+
+    def test_change_permissions(self):
+        # folder without write permission is changed after its content
+        entries = {self.folder: self.entry(0o40500),
+                   self.file: self.entry(0o100600),
+                   self.link: self.entry(0o100644),
+                   os.path.join(self.folder, b'missing'): self.entry(0o100600)}
+
+        self.sn.restorePermissions(entries, self.messages.append)
+
+        self.assertEqual(os.stat(self.folder).st_mode, 0o40500)
+        self.assertEqual(os.stat(self.file).st_mode, 0o100600)
+        self.assertEqual(len(self.messages), 2)
+        self.assertRegex(self.messages[0], r'^chmod .*/foo/bar 100600$')
+        self.assertRegex(self.messages[1], r'^chmod .*/foo 40500$')
+        self.assertFalse(self.sn.restorePermissionFailed)
+
+    def test_parallel(self):
+        entries = {}
+        for i in range(20):
+            folder = os.path.join(self.folder, str(i).encode())
+            os.mkdir(folder)
+            for j in range(5):
+                path = os.path.join(folder, str(j).encode())
+                with open(path, 'wt'):
+                    pass
+                entries[path] = self.entry(0o100600)
+            entries[folder] = self.entry(0o40700)
+        entries[self.folder] = self.entry(0o40500)
+
+        self.sn.restorePermissions(entries, self.messages.append, max_workers=4)
+
+        for path, info in entries.items():
+            self.assertEqual(os.stat(path).st_mode, info[0])
+        self.assertEqual(len(self.messages), len(entries))
+        self.assertRegex(self.messages[-1], r'^chmod .*/foo 40500$')
+
+    @patch('snapshots.Snapshots.RESTORE_PROGRESS_INTERVAL', 0)
+    def test_progress(self):
+        entries = {self.file: self.entry(os.stat(self.file).st_mode)}
+
+        self.sn.restorePermissions(entries, self.messages.append)
+
+        self.assertListEqual(self.messages, ['Restore permissions: 1/1'])
+
+
 class DeletePath(generic.SnapshotsWithSidTestCase):
     def test_file(self):
         self.assertExists(self.testFileFullPath)
@@ -667,6 +1109,108 @@ class DeletePath(generic.SnapshotsWithSidTestCase):
         self.assertNotExists(self.testDirFullPath)
 
 
+class Filter(generic.SnapshotsTestCase):
+    PATH = '/bit-test-filter/file'
+
+    def setUp(self):
+        super(Filter, self).setUp()
+        self.sids = []
+        for i in range(4):
+            sid = snapshots.SID('20151219-0%d0324-123' % (i + 1), self.cfg)
+            sid.makeDirs(os.path.dirname(self.PATH))
+            self.sids.append(sid)
+
+        # 2nd is a hardlink of the 1st, 4th a copy with a different mtime
+        for sid, content in ((self.sids[0], 'one'), (self.sids[2], 'three'),
+                             (self.sids[3], 'one')):
+            with open(sid.pathBackup(self.PATH), 'wt') as f:
+                f.write(content)
+        os.link(self.sids[0].pathBackup(self.PATH),
+                self.sids[1].pathBackup(self.PATH))
+        os.utime(self.sids[3].pathBackup(self.PATH), (0, 0))
+
+        # newest first like listSnapshots
+        self.sids.reverse()
+
+    def test_all(self):
+        found = []
+        self.assertListEqual(self.sn.filter(self.sids[0], self.PATH,
+                                            self.sids, callback=found.append),
+                             self.sids)
+        self.assertListEqual(found, self.sids)
+
+    def test_missing(self):
+        os.remove(self.sids[1].pathBackup(self.PATH))
+        self.assertListEqual(self.sn.filter(self.sids[0], self.PATH, self.sids),
+                             [self.sids[0], self.sids[2], self.sids[3]])
+        self.assertListEqual(self.sn.filter(self.sids[1], self.PATH, self.sids),
+                             [])
+
+    def test_type(self):
+        os.remove(self.sids[1].pathBackup(self.PATH))
+        os.symlink('foo', self.sids[1].pathBackup(self.PATH))
+        self.assertNotIn(self.sids[1],
+                         self.sn.filter(self.sids[0], self.PATH, self.sids))
+        self.assertListEqual(self.sn.filter(self.sids[1], self.PATH, self.sids),
+                             [self.sids[1]])
+
+    def test_diff_only(self):
+        self.assertListEqual(self.sn.filter(self.sids[0], self.PATH, self.sids,
+                                            list_diff_only=True),
+                             [self.sids[0], self.sids[1], self.sids[2]])
+
+    def test_diff_only_hardlink_without_content_check(self):
+        with patch('tools.hashsum', wraps=tools.hashsum) as hashsum:
+            self.assertListEqual(self.sn.filter(self.sids[0], self.PATH,
+                                                self.sids,
+                                                list_diff_only=True,
+                                                flag_deep_check=True),
+                                 [self.sids[0], self.sids[1]])
+            self.assertEqual(hashsum.call_count, 2)
+            self.assertNotIn(self.sids[3].pathBackup(self.PATH),
+                             [call.args[0] for call in hashsum.call_args_list])
+
+            # hashes are cached
+            hashsum.reset_mock()
+            self.sn.filter(self.sids[0], self.PATH, self.sids,
+                           list_diff_only=True, flag_deep_check=True)
+            hashsum.assert_not_called()
+
+    def test_cancel(self):
+        found = []
+
+        def cancel():
+            return len(found) >= 2
+
+        with patch('tools.hashsum', wraps=tools.hashsum) as hashsum:
+            self.assertListEqual(self.sn.filter(self.sids[0], self.PATH,
+                                                self.sids,
+                                                list_diff_only=True,
+                                                flag_deep_check=True,
+                                                callback=found.append,
+                                                cancel=cancel),
+                                 [self.sids[0], self.sids[1]])
+
+            hashsum.reset_mock()
+            self.assertListEqual(self.sn.filter(self.sids[0], self.PATH,
+                                                self.sids,
+                                                list_diff_only=True,
+                                                flag_deep_check=True,
+                                                cancel=lambda: True),
+                                 [])
+            hashsum.assert_not_called()
+
+    def test_equal_to(self):
+        equal_to = self.sids[3].pathBackup(self.PATH)
+        self.assertListEqual(self.sn.filter(self.sids[0], self.PATH, self.sids,
+                                            list_equal_to=equal_to),
+                             [self.sids[2], self.sids[3]])
+        self.assertListEqual(self.sn.filter(self.sids[0], self.PATH, self.sids,
+                                            flag_deep_check=True,
+                                            list_equal_to=equal_to),
+                             [self.sids[0], self.sids[2], self.sids[3]])
+
+
 class RemoveSnapshot(generic.SnapshotsWithSidTestCase):
     """Integration test about removing a snapshot."""
 
@@ -686,6 +1230,64 @@ class RemoveSnapshot(generic.SnapshotsWithSidTestCase):
         self.assertFalse(self.sid.exists())
 
 
+class LinkSnapshot(generic.SnapshotsWithSidTestCase):
+    def setUp(self):
+        super().setUp()
+        os.symlink('baz', self.sid.pathBackup('foo', 'bar', 'link'))
+        os.utime(self.testDirFullPath, ns=(0, 0))
+        self.new = snapshots.NewSnapshot(self.cfg)
+        self.new.makeDirs()
+
+    def test_link(self):
+        self.sn.linkSnapshot(self.sid, self.new)
+
+        self.assertEqual(os.stat(self.testFileFullPath).st_ino,
+                         os.stat(self.new.pathBackup(self.testFile)).st_ino)
+        self.assertEqual(os.readlink(self.new.pathBackup('foo', 'bar', 'link')),
+                         'baz')
+        self.assertEqual(os.stat(self.new.pathBackup(self.testDir)).st_mtime_ns,
+                         0)
+
+    def test_remove_scan_changes(self):
+        self.sn.linkSnapshot(self.sid, self.new)
+        result = scancache.ScanResult()
+        result.deleted.append(b'/foo/bar/baz')
+        result.changed.append(b'/foo/bar/link')
+        result.changed.append(b'/foo/bar/new')
+
+        parents = self.sn.removeScanChanges(self.new, result)
+
+        self.assertNotExists(self.new.pathBackup(self.testFile))
+        self.assertFalse(os.path.lexists(self.new.pathBackup('foo', 'bar', 'link')))
+        self.assertExists(self.testFileFullPath)
+        self.assertEqual(len(parents), 1)
+        folder, st = parents[0]
+        self.assertEqual(folder, os.fsencode(self.new.pathBackup(self.testDir)))
+        self.assertEqual(st.st_mtime_ns, 0)
+
+    def test_remove_scan_changes_read_only(self):
+        sub = self.sid.pathBackup('foo', 'bar', 'sub')
+        os.mkdir(sub)
+        with open(os.path.join(sub, 'file'), 'wt') as f:
+            f.write('foo')
+        for path in (sub, self.testDirFullPath):
+            os.chmod(path, 0o555)
+        self.sn.linkSnapshot(self.sid, self.new)
+
+        result = scancache.ScanResult()
+        result.deleted.append(b'/foo/bar/baz')
+        result.deleted.append(b'/foo/bar/sub')
+
+        self.sn.removeScanChanges(self.new, result)
+
+        self.assertNotExists(self.new.pathBackup(self.testFile))
+        self.assertNotExists(self.new.pathBackup('foo', 'bar', 'sub'))
+        self.assertExists(sub, 'file')
+        # mode of the previous snapshot restored
+        self.assertEqual(stat.S_IMODE(os.stat(
+            self.new.pathBackup(self.testDir)).st_mode), 0o555)
+
+
 @unittest.skipIf(not generic.LOCAL_SSH, generic.SKIP_SSH_TEST_MESSAGE)
 class SshSnapshots(generic.SSHTestCase):
     def setUp(self):
@@ -696,6 +1298,21 @@ class SshSnapshots(generic.SSHTestCase):
     def test_stat_free_space_ssh(self):
         self.assertIsInstance(self.sn.statFreeSpaceSsh(), int)
 
+    def test_remove_partial_dirs(self):
+        new = snapshots.NewSnapshot(self.cfg)
+        backup = new.pathBackup(use_mode=['ssh', 'ssh_encfs'])
+        partial = os.path.join(backup, 'foo bar', self.sn.PARTIAL_DIR)
+        os.makedirs(partial)
+        with open(os.path.join(partial, 'baz'), 'wt') as f:
+            f.write('ba')
+        with open(os.path.join(backup, 'foo bar', 'baz'), 'wt') as f:
+            f.write('baz')
+
+        self.sn.removePartialDirs(new)
+
+        self.assertNotExists(partial)
+        self.assertExists(backup, 'foo bar', 'baz')
+
 
 def _rand_string(self, max_length=10, min_length=1):
     """Create a string with random uppercase characters and digits and
@@ -1015,8 +1632,8 @@ class SshPermissions(unittest.TestCase):
         # expected field where the permissions are stored in
         # e.g. /tmp/BITa6ekd80lTEST/foo/backintime/test-host/test-user/1
         infoFilePath = pathlib.Path(cfg.snapshotsFullPath())
-        # ...'/20151219-010324-123/fileinfo.bz2'
-        infoFilePath = infoFilePath / str(sid.sid) / 'fileinfo.bz2'
+        # ...'/20151219-010324-123/fileinfo.idx'
+        infoFilePath = infoFilePath / str(sid.sid) / 'fileinfo.idx'
 
         # Does it exists as a file?
         self.assertTrue(infoFilePath.exists())
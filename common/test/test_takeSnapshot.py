@@ -70,7 +70,7 @@ class Take(generic.SnapshotsTestCase):
         self.assertTrue(sid1.isExistingPathInsideSnapshotFolder(os.path.join(self.include.name, 'file with spaces')))
         self.assertExists(self.cfg.anacronSpoolFile())
         for f in ('config',
-                  'fileinfo.bz2',
+                  'fileinfo.idx',
                   'info',
                   'takesnapshot.log.bz2'):
             self.assertExists(sid1.path(f))
@@ -115,6 +115,170 @@ class Take(generic.SnapshotsTestCase):
         self.assertTrue(sid4.isExistingPathInsideSnapshotFolder(os.path.join(self.include.name, 'foo', 'bar', 'baz')))
         self.assertTrue(sid4.isExistingPathInsideSnapshotFolder(os.path.join(self.include.name, 'test')))
 
+    @patch('time.sleep')  # speed up unittest
+    def test_check_for_changes(self, sleep):
+        self.cfg.setCheckForChanges(True)
+        now = datetime.today() - timedelta(minutes = 4)
+        sid1 = snapshots.SID(now, self.cfg)
+
+        self.assertListEqual([True, False], self.sn.takeSnapshot(sid1, now, [(self.include.name, 0),]))
+        self.assertTrue(sid1.exists())
+
+        # nothing changed: dry run only, no new_snapshot left behind
+        os.remove(self.cfg.anacronSpoolFile())
+        now = datetime.today() - timedelta(minutes = 2)
+        sid2 = snapshots.SID(now, self.cfg)
+
+        with patch.object(self.sn, 'rsyncCallback') as rsyncCallback:
+            self.assertListEqual([False, False], self.sn.takeSnapshot(sid2, now, [(self.include.name, 0),]))
+            rsyncCallback.assert_not_called()
+        self.assertFalse(sid2.exists())
+        self.assertFalse(snapshots.NewSnapshot(self.cfg).exists())
+        self.assertExists(self.cfg.anacronSpoolFile())
+
+        # changed file
+        self.remount()
+        with open(os.path.join(self.include.name, 'lalala'), 'wt') as f:
+            f.write('asdf')
+
+        now = datetime.today()
+        sid3 = snapshots.SID(now, self.cfg)
+
+        self.assertListEqual([True, False], self.sn.takeSnapshot(sid3, now, [(self.include.name, 0),]))
+        self.assertTrue(sid3.exists())
+        self.assertTrue(sid3.isExistingPathInsideSnapshotFolder(os.path.join(self.include.name, 'lalala')))
+
+    @patch('time.sleep')  # speed up unittest
+    def test_scan_cache(self, sleep):
+        if self.cfg.snapshotsMode() != 'local':
+            self.skipTest('scan cache is used in local mode only')
+
+        self.cfg.setScanCacheEnabled(True)
+        include = [(self.include.name, 0),]
+        now = datetime.today() - timedelta(minutes = 4)
+        sid1 = snapshots.SID(now, self.cfg)
+        self.assertListEqual([True, False], self.sn.takeSnapshot(sid1, now, include))
+        self.assertExists(self.cfg.scanCacheFile())
+
+        # nothing changed
+        now = datetime.today() - timedelta(minutes = 2)
+        sid2 = snapshots.SID(now, self.cfg)
+        self.assertListEqual([False, False], self.sn.takeSnapshot(sid2, now, include))
+        self.assertFalse(sid2.exists())
+        self.assertFalse(snapshots.NewSnapshot(self.cfg).exists())
+
+        # only the changes are transferred with --files-from
+        with open(os.path.join(self.include.name, 'lalala'), 'wt') as f:
+            f.write('asdf')
+        os.remove(os.path.join(self.include.name, 'test'))
+
+        now = datetime.today()
+        sid3 = snapshots.SID(now, self.cfg)
+        with patch('tools.Execute', wraps=snapshots.tools.Execute) as execute:
+            self.assertListEqual([True, False], self.sn.takeSnapshot(sid3, now, include))
+        self.assertTrue([call for call in execute.call_args_list
+                         if '--from0' in call.args[0]])
+
+        self.assertTrue(sid3.isExistingPathInsideSnapshotFolder(os.path.join(self.include.name, 'lalala')))
+        self.assertFalse(sid3.isExistingPathInsideSnapshotFolder(os.path.join(self.include.name, 'test')))
+        self.assertTrue(sid1.isExistingPathInsideSnapshotFolder(os.path.join(self.include.name, 'test')))
+        baz = os.path.join(self.include.name, 'foo', 'bar', 'baz')
+        self.assertEqual(os.stat(sid1.pathBackup(baz)).st_ino,
+                         os.stat(sid3.pathBackup(baz)).st_ino)
+
+    @patch('time.sleep')  # speed up unittest
+    def test_copy_engine_python(self, sleep):
+        if self.cfg.snapshotsMode() != 'local':
+            self.skipTest('copy engine python is used in local mode only')
+
+        self.cfg.setCopyEngine('python')
+        include = [(self.include.name, 0),]
+        now = datetime.today() - timedelta(minutes = 2)
+        sid1 = snapshots.SID(now, self.cfg)
+        with patch('snapshots.localcopy.LocalCopy',
+                   wraps=snapshots.localcopy.LocalCopy) as engine:
+            self.assertListEqual([True, False], self.sn.takeSnapshot(sid1, now, include))
+            engine.assert_called_once()
+
+        with open(os.path.join(self.include.name, 'lalala'), 'wt') as f:
+            f.write('asdf')
+
+        now = datetime.today()
+        sid2 = snapshots.SID(now, self.cfg)
+        self.assertListEqual([True, False], self.sn.takeSnapshot(sid2, now, include))
+        self.assertTrue(sid2.isExistingPathInsideSnapshotFolder(os.path.join(self.include.name, 'lalala')))
+        baz = os.path.join(self.include.name, 'foo', 'bar', 'baz')
+        self.assertEqual(os.stat(sid1.pathBackup(baz)).st_ino,
+                         os.stat(sid2.pathBackup(baz)).st_ino)
+        self.assertListEqual([(b'>f+++++++++', b'/' + os.fsencode(self.include.name.lstrip('/')) + b'/lalala')],
+                             [(flags.encode(), path) for path, flags, size, mtime in sid2.changes()
+                              if flags.startswith('>f')])
+        # the manifest of sid2 is complete for the search index
+        self.assertEqual(sid2.info.strValue('changes_base', ''), sid1.sid)
+        self.assertEqual(sid1.info.strValue('changes_base', ''), '')
+
+    @patch('time.sleep')  # speed up unittest
+    def test_continue_interrupted(self, sleep):
+        self.cfg.setContinueInterruptedEnabled(True)
+        self.cfg.setParallelRsync(True, 2)
+        other = os.path.join(self.include.name, 'other')
+        generic.create_test_files(other)
+        include = [(os.path.join(self.include.name, 'foo'), 0), (other, 0)]
+        run = snapshots.tools.Execute.run
+
+        # connection lost while the second include item is transferred
+        def interrupted(proc):
+            if any(arg.startswith('--include=' + other) for arg in proc.cmd):
+                return 255
+            return run(proc)
+
+        now = datetime.today()
+        sid1 = snapshots.SID(now, self.cfg)
+        with patch('tools.Execute.run', interrupted):
+            self.assertListEqual([False, True], self.sn.takeSnapshot(sid1, now, include))
+
+        new = snapshots.NewSnapshot(self.cfg)
+        self.assertTrue(new.saveToContinue)
+        self.assertTrue(os.path.exists(new.path(new.CHECKPOINTS)))
+
+        with patch('tools.Execute.run', autospec=True, side_effect=run) as execute:
+            self.assertListEqual([True, False], self.sn.takeSnapshot(sid1, now, include))
+
+        # the first include item is not transferred again
+        self.assertEqual(execute.call_count, 1)
+        self.assertFalse(new.exists())
+        self.assertFalse(os.path.exists(sid1.path(new.CHECKPOINTS)))
+        self.assertTrue(sid1.isExistingPathInsideSnapshotFolder(os.path.join(self.include.name, 'foo', 'bar', 'baz')))
+        self.assertTrue(sid1.isExistingPathInsideSnapshotFolder(os.path.join(other, 'test')))
+
+    @patch('time.sleep')  # speed up unittest
+    def test_continue_interrupted_single_rsync(self, sleep):
+        self.cfg.setContinueInterruptedEnabled(True)
+        other = os.path.join(self.include.name, 'other')
+        generic.create_test_files(other)
+        include = [(os.path.join(self.include.name, 'foo'), 0), (other, 0)]
+        run = snapshots.tools.Execute.run
+
+        now = datetime.today()
+        sid1 = snapshots.SID(now, self.cfg)
+        with patch('tools.Execute.run', return_value=255):
+            self.assertListEqual([False, True], self.sn.takeSnapshot(sid1, now, include))
+
+        # no checkpoints without concurrent rsync processes
+        new = snapshots.NewSnapshot(self.cfg)
+        self.assertTrue(new.saveToContinue)
+        self.assertFalse(os.path.exists(new.path(new.CHECKPOINTS)))
+
+        # the continued run transfers all include items again
+        with patch('tools.Execute.run', autospec=True, side_effect=run) as execute:
+            self.assertListEqual([True, False], self.sn.takeSnapshot(sid1, now, include))
+
+        self.assertEqual(execute.call_count, 1)
+        self.assertIn('--include=' + other + '/**',
+                      execute.call_args.args[0].cmd)
+        self.assertTrue(sid1.isExistingPathInsideSnapshotFolder(os.path.join(self.include.name, 'foo', 'bar', 'baz')))
+        self.assertTrue(sid1.isExistingPathInsideSnapshotFolder(os.path.join(other, 'test')))
+
     @patch('time.sleep') # speed up unittest
     def test_spaces_in_include(self, sleep):
         now = datetime.today()
@@ -127,7 +291,7 @@ class Take(generic.SnapshotsTestCase):
         self.assertTrue(sid1.isExistingPathInsideSnapshotFolder(os.path.join(include, 'foo', 'bar', 'baz')))
         self.assertTrue(sid1.isExistingPathInsideSnapshotFolder(os.path.join(include, 'test')))
         for f in ('config',
-                  'fileinfo.bz2',
+                  'fileinfo.idx',
                   'info',
                   'takesnapshot.log.bz2'):
             self.assertExists(sid1.path(f))
@@ -148,7 +312,7 @@ class Take(generic.SnapshotsTestCase):
         self.assertFalse(sid1.isExistingPathInsideSnapshotFolder(os.path.join(self.include.name, 'foo', 'bar', 'baz')))
         self.assertTrue(sid1.isExistingPathInsideSnapshotFolder(os.path.join(self.include.name, 'test')))
         for f in ('config',
-                  'fileinfo.bz2',
+                  'fileinfo.idx',
                   'info',
                   'takesnapshot.log.bz2'):
             self.assertExists(sid1.path(f))
@@ -171,7 +335,7 @@ class Take(generic.SnapshotsTestCase):
         self.assertTrue(sid1.isExistingPathInsideSnapshotFolder(os.path.join(self.include.name, 'test')))
         self.assertFalse(sid1.isExistingPathInsideSnapshotFolder(exclude))
         for f in ('config',
-                  'fileinfo.bz2',
+                  'fileinfo.idx',
                   'info',
                   'takesnapshot.log.bz2'):
             self.assertExists(sid1.path(f))
@@ -191,7 +355,7 @@ class Take(generic.SnapshotsTestCase):
             self.assertTrue(sid1.isExistingPathInsideSnapshotFolder(os.path.join(self.include.name, 'foo', 'bar', 'baz')))
             self.assertFalse(sid1.isExistingPathInsideSnapshotFolder(os.path.join(self.include.name, 'test')))
             for f in ('config',
-                      'fileinfo.bz2',
+                      'fileinfo.idx',
                       'info',
                       'takesnapshot.log.bz2',
                       'failed'):
@@ -17,6 +17,7 @@ import subprocess
 import random
 import pathlib
 import gzip
+import hashlib
 import stat
 import signal
 import unittest
@@ -207,6 +208,39 @@ class TestTools(generic.TestCase):
                 d, 'foobar{}'.format(random.randrange(100, 999)))
             self.assertFalse(tools.makeDirs(path))
 
+    def test_removeTree(self):
+        with TemporaryDirectory() as d:
+            root = os.path.join(d, 'foo')
+            for sub in ('a', 'b', os.path.join('b', 'c')):
+                os.makedirs(os.path.join(root, sub))
+                with open(os.path.join(root, sub, 'bar'), 'wt') as f:
+                    f.write('bar')
+            os.symlink(d, os.path.join(root, 'link'))
+
+            # read-only like in snapshots
+            for sub in (os.path.join('b', 'c'), 'b', 'a', ''):
+                os.chmod(os.path.join(root, sub), stat.S_IRUSR | stat.S_IXUSR)
+
+            counts = []
+            self.assertTrue(tools.removeTree(root, callback=counts.append))
+            self.assertFalse(os.path.exists(root))
+            self.assertTrue(os.path.exists(d))
+            self.assertEqual(counts[-1], 8)
+
+    def test_removeTree_task_raises(self):
+        with TemporaryDirectory() as d:
+            root = os.path.join(d, 'foo')
+            os.makedirs(os.path.join(root, 'a'))
+
+            # must not wait forever for the root folder
+            with patch.object(tools._TreeRemover, '_finish',
+                              side_effect=KeyError('foo')):
+                self.assertFalse(tools.removeTree(root))
+
+    def test_removeTree_not_existing(self):
+        with TemporaryDirectory() as d:
+            self.assertTrue(tools.removeTree(os.path.join(d, 'foo')))
+
     def test_mkdir(self):
         self.assertFalse(tools.mkdir('/'))
         with TemporaryDirectory() as d:
@@ -376,6 +410,17 @@ class TestTools(generic.TestCase):
             self.assertEqual(tools.md5sum(f.name),
                              'acbd18db4cc2f85cedef654fccc4a4d8')
 
+    def test_hashsum(self):
+        with NamedTemporaryFile() as f:
+            f.write(b'foo' * 1000)
+            f.flush()
+
+            with patch('tools.HASH_BUFFER_SIZE', 7):
+                self.assertEqual(tools.hashsum(f.name, 'sha1'),
+                                 hashlib.sha1(b'foo' * 1000).hexdigest())
+            self.assertEqual(tools.hashsum(f.name, 'blake2b'),
+                             hashlib.blake2b(b'foo' * 1000).hexdigest())
+
     def test_checkCronPattern(self):
         self.assertTrue(tools.checkCronPattern('0'))
         self.assertTrue(tools.checkCronPattern('0,10,13,15,17,20,23'))
@@ -651,6 +696,49 @@ class ExecuteSubprocess(generic.TestCase):
         proc = tools.Execute(['true'])
         self.assertTrue(proc.pausable)
 
+    def test_streaming(self):
+        lines = []
+        proc = tools.Execute(['seq', '1', '10000'],
+                             callback=lambda x, y: lines.append(x),
+                             streaming=True)
+        self.assertEqual(proc.run(), 0)
+        self.assertListEqual(lines, [str(i) for i in range(1, 10001)])
+        self.assertEqual(proc.statistics()['lines'], 10000)
+
+    def test_streaming_callback_raises(self):
+        def callback(line, user_data):
+            raise ValueError(line)
+
+        proc = tools.Execute(['yes'], callback=callback, streaming=True)
+        with self.assertRaises(ValueError):
+            proc.run()
+        self.assertIsNotNone(proc.currentProc.returncode)
+
+    def test_run_parallel(self):
+        finished = []
+        procs = [tools.Execute(['true']), tools.Execute(['false'])]
+        self.assertListEqual(
+            tools.runParallel(procs, 1, lambda *args: finished.append(args)),
+            [0, 1])
+        self.assertListEqual(finished, [(0, 0), (1, 1)])
+
+    def test_streaming_unterminated_line(self):
+        lines = []
+        proc = tools.Execute(['printf', 'foo\nbar'],
+                             callback=lambda x, y: lines.append(x),
+                             streaming=True)
+        proc.run()
+        self.assertListEqual(lines, ['foo', 'bar'])
+
+    def test_capture_stderr(self):
+        lines = []
+        proc = tools.Execute(['sh', '-c', 'echo foo; echo bar >&2'],
+                             callback=lambda x, y: lines.append(x),
+                             capture_stderr=True)
+        proc.run()
+        self.assertListEqual(lines, ['foo'])
+        self.assertEqual(proc.stderr, 'bar\n')
+
 
 class Tools_FakeFS(pyfakefs_ut.TestCase):
     """Tests using a fake filesystem."""
@@ -11,6 +11,7 @@
 import os
 import sys
 import unittest
+import unittest.mock
 import packaging.version
 import pyfakefs.fake_filesystem_unittest as pyfakefs_ut
 from pathlib import Path
@@ -203,3 +204,27 @@ class General(pyfakefs_ut.TestCase):
 
             self.assertTrue(sut.check(fpa))
             self.assertTrue(sut.check(fpb))
+
+    def test_hardlink_equal_without_content_check(self):
+        """Hardlinks are the same without comparing the content"""
+        with TemporaryDirectory(prefix='bit.') as temp_name:
+            temp_path = Path(temp_name)
+            fpa = temp_path / 'foo'
+            fpa.write_text('one')
+            fpb = temp_path / 'bar'
+            os.link(fpa, fpb)
+
+            with unittest.mock.patch('uniquenessset.md5sum') as md5sum:
+                sut = UniquenessSet(deep_check=True,
+                                    follow_symlink=False,
+                                    equal_to='')
+                self.assertTrue(sut.check(fpa))
+                self.assertFalse(sut.check(fpb, os.stat(fpb)))
+
+                sut = UniquenessSet(deep_check=True,
+                                    follow_symlink=False,
+                                    equal_to=str(fpa))
+                md5sum.reset_mock()
+                self.assertTrue(sut.check(fpb))
+
+            md5sum.assert_not_called()
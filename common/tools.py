@@ -18,6 +18,7 @@ import pathlib
 import subprocess
 import shlex
 import signal
+import stat
 import re
 import errno
 import gzip
@@ -25,6 +26,11 @@ import locale
 import gettext
 import hashlib
 import ipaddress
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from packaging.version import Version
 from typing import Union
@@ -82,6 +88,9 @@ except NameError:
 
 DISK_BY_UUID = '/dev/disk/by-uuid'
 
+# read size in bytes while hashing files
+HASH_BUFFER_SIZE = 1024 * 1024
+
 # |-----------------|
 # | Handling paths  |
 # |-----------------|
@@ -1257,9 +1266,10 @@ def rsyncPrefix(config,
                     '--group',         # preserve group
                     '--owner'))         # preserve owner (super-user only)
 
+    # Incremental recursion stays enabled. The totals it doesn't know yet
+    # are estimated by progress.ProgressEstimator.
     if progress and 'progress2' in caps:
-        cmd.extend(('--info=progress2',
-                    '--no-inc-recursive'))
+        cmd.append('--info=progress2')
 
     if config.bwlimitEnabled():
         cmd.append('--bwlimit=%d' % config.bwlimit())
@@ -1355,14 +1365,29 @@ def md5sum(path):
     Returns:
         str:        md5sum of file
     """
-    md5 = hashlib.md5()
-    with open(path, 'rb') as f:
+    return hashsum(path, 'md5')
+
+def hashsum(path, algorithm='md5'):
+    """
+    Calculate the hash of file ``path`` reading large blocks.
+
+    Args:
+        path (str):         full path to file
+        algorithm (str):    name of a :py:mod:`hashlib` algorithm
+
+    Returns:
+        str:                hex digest of file
+    """
+    h = hashlib.new(algorithm)
+    buf = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buf)
+    with open(path, 'rb', buffering=0) as f:
         while True:
-            data = f.read(4096)
-            if not data:
+            size = f.readinto(buf)
+            if not size:
                 break
-            md5.update(data)
-    return md5.hexdigest()
+            h.update(view[:size])
+    return h.hexdigest()
 
 def checkCronPattern(s):
     """
@@ -2480,12 +2505,24 @@ class Execute:
         conv_str (bool): Convert output to :py:class:`str` if ``True`` or keep
             it as :py:class:`bytes` if ``False``.
         join_stderr (bool): Join ``stderr`` to ``stdout``.
+        capture_stderr (bool): Capture ``stderr`` separately into
+            :py:attr:`stderr` instead of joining or discarding it.
+        streaming (bool): Read ``stdout`` in a separate thread so the command
+            doesn't stall while ``filters`` and ``callback`` are busy. See
+            :py:func:`_readStream`.
 
     Note:
         Signals ``SIGTSTP`` ("keyboard stop") and ``SIGCONT`` send to Python
         main process will be forwarded to the command. ``SIGHUP`` will kill
         the process.
     """
+    # Size of each read() on stdout in streaming mode
+    STREAM_CHUNK_SIZE = 64 * 1024
+    # Maximum number of chunks waiting for the callback in streaming mode.
+    # The reader blocks (and with it the command) only if the callback is
+    # behind by more than this.
+    STREAM_QUEUE_SIZE = 256
+
     def __init__(self,
                  cmd,
                  callback=None,
@@ -2493,7 +2530,9 @@ class Execute:
                  filters=(),
                  parent=None,
                  conv_str=True,
-                 join_stderr=True):
+                 join_stderr=True,
+                 capture_stderr=False,
+                 streaming=False):
         self.cmd = cmd
         self.callback = callback
         self.user_data = user_data
@@ -2501,6 +2540,16 @@ class Execute:
         self.currentProc = None
         self.conv_str = conv_str
         self.join_stderr = join_stderr
+        self.capture_stderr = capture_stderr
+        self.streaming = streaming
+        # Output of stderr if ``capture_stderr`` is used
+        self.stderr = None
+        # Counters of the last run(). See :py:func:`statistics`.
+        self.lineCount = 0
+        self.duration = 0.0
+        self.callbackTime = 0.0
+        self.callbackMaxLatency = 0.0
+        self.queueMaxSize = 0
         # Need to forward parent to have the correct class name in debug log.
         self.parent = parent if parent else self
 
@@ -2519,6 +2568,7 @@ class Execute:
                 '<bit-dev-join@python.org>.')
 
         self.pausable = True
+        self.terminated = False
         self.printable_cmd = ' '.join(self.cmd)
         logger.debug(f'Call command "{self.printable_cmd}"', self.parent, 2)
 
@@ -2546,10 +2596,23 @@ class Execute:
             # TODO What does this imply?
             pass
 
-        stderr = subprocess.STDOUT if self.join_stderr else subprocess.DEVNULL
+        if self.capture_stderr:
+            # A file instead of a pipe can't block the command and doesn't
+            # need another reader next to stdout.
+            stderr = tempfile.TemporaryFile()
+        elif self.join_stderr:
+            stderr = subprocess.STDOUT
+        else:
+            stderr = subprocess.DEVNULL
 
         logger.debug(f"Starting command '{self.printable_cmd}'")
 
+        self.lineCount = 0
+        self.callbackTime = 0.0
+        self.callbackMaxLatency = 0.0
+        self.queueMaxSize = 0
+        start = time.monotonic()
+
         self.currentProc = subprocess.Popen(
             self.cmd, stdout=subprocess.PIPE, stderr=stderr)
 
@@ -2560,7 +2623,10 @@ class Execute:
         #     # self.currentProc.kill()  # signal 9
         #     logger.error("rsync killed for testing purposes during development")
 
-        if self.callback:
+        if self.callback and self.streaming:
+            self._dispatchStream()
+
+        elif self.callback:
 
             for line in self.currentProc.stdout:
 
@@ -2591,6 +2657,21 @@ class Execute:
         ret_val = self.currentProc.returncode
         # TODO ret_val is sometimes 0 instead of e.g. 23 for rsync. Why?
 
+        self.duration = time.monotonic() - start
+
+        if self.capture_stderr:
+            stderr.seek(0)
+            self.stderr = stderr.read()
+            stderr.close()
+            if self.conv_str:
+                self.stderr = self.stderr.decode(errors='replace')
+
+        if self.streaming:
+            logger.debug('Command "{}" streamed {}'.format(
+                self.printable_cmd[:16],
+                ', '.join(f'{k}={v}' for k, v in self.statistics().items())),
+                self.parent, 2)
+
         try:
             # reset signal handler to their default
             signal.signal(signal.SIGTSTP, signal.SIG_DFL)
@@ -2601,7 +2682,7 @@ class Execute:
             # TODO What does this imply?
             pass
 
-        if ret_val == 0:
+        if ret_val == 0 or self.terminated:
             msg = f'Command "{self.printable_cmd[:16]}" returns {ret_val}'
             if out:
                 msg += ': ' + out.decode().strip('\n')
@@ -2616,6 +2697,108 @@ class Execute:
 
         return ret_val
 
+    def _readStream(self, fileobj, chunks):
+        """Reader thread of the streaming mode. Read ``fileobj`` in large
+        chunks, split them into lines and put a list of lines per chunk into
+        the queue ``chunks``. ``None`` marks the end of the output.
+        """
+        fd = fileobj.fileno()
+        rest = b''
+
+        try:
+            while True:
+                data = os.read(fd, self.STREAM_CHUNK_SIZE)
+                if not data:
+                    break
+
+                lines = (rest + data).split(b'\n')
+                rest = lines.pop()
+                if lines:
+                    chunks.put(lines)
+
+            if rest:
+                chunks.put([rest])
+
+        except OSError as exc:
+            logger.error(f'Failed to read output of "{self.printable_cmd}": '
+                         f'{str(exc)}', self.parent)
+
+        finally:
+            chunks.put(None)
+
+    def _dispatchStream(self):
+        """Consumer of the streaming mode. Run ``filters`` and ``callback``
+        on the lines collected by :py:func:`_readStream` batch by batch in
+        the calling thread.
+        """
+        chunks = queue.Queue(maxsize=self.STREAM_QUEUE_SIZE)
+        reader = threading.Thread(target=self._readStream,
+                                  args=(self.currentProc.stdout, chunks),
+                                  name='Execute reader',
+                                  daemon=True)
+        reader.start()
+        finished = False
+
+        try:
+            while True:
+                self.queueMaxSize = max(self.queueMaxSize, chunks.qsize())
+                lines = chunks.get()
+                if lines is None:
+                    break
+
+                self.lineCount += len(lines)
+
+                for line in lines:
+                    begin = time.perf_counter()
+
+                    if self.conv_str:
+                        line = line.decode()
+
+                    for f in self.filters:
+                        line = f(line)
+
+                    if line:
+                        self.callback(line, self.user_data)
+
+                    latency = time.perf_counter() - begin
+                    self.callbackTime += latency
+                    if latency > self.callbackMaxLatency:
+                        self.callbackMaxLatency = latency
+
+            finished = True
+
+        finally:
+            if not finished:
+                # A filter or the callback raised. Stop the command and
+                # keep draining, otherwise the reader blocks on the full
+                # queue and the command is never reaped.
+                self.currentProc.terminate()
+                while chunks.get() is not None:
+                    pass
+                self.currentProc.wait()
+
+        reader.join()
+
+    def statistics(self):
+        """Counters of the last streaming :py:func:`run`.
+
+        Returns:
+            dict: Number of ``lines``, ``lines_per_second`` read from the
+            command, average and maximum callback latency per line in
+            milliseconds and the maximum number of chunks waiting in the
+            queue.
+        """
+        lines = self.lineCount
+        return {
+            'lines': lines,
+            'lines_per_second':
+                round(lines / self.duration) if self.duration else 0,
+            'callback_avg_ms':
+                round(self.callbackTime / lines * 1000, 3) if lines else 0,
+            'callback_max_ms': round(self.callbackMaxLatency * 1000, 3),
+            'queue_max': self.queueMaxSize,
+        }
+
     def pause(self, signum, frame):
         """Slot which will send ``SIGSTOP`` to the command. Is connected to
         signal ``SIGTSTP``.
@@ -2634,9 +2817,289 @@ class Execute:
                 f'Resume process "{self.printable_cmd}"', self.parent, 2)
             return self.currentProc.send_signal(signal.SIGCONT)
 
+    def terminate(self):
+        """Terminate the command on purpose, e.g. from inside ``callback``
+        when the remaining output is not of interest anymore. The return code
+        of a terminated command is not reported as a warning.
+        """
+        if self.currentProc and self.currentProc.poll() is None:
+            self.terminated = True
+            self.currentProc.terminate()
+
     def kill(self, signum, frame):
         """Slot which will kill the command. Is connected to signal ``SIGHUP``.
         """
         if self.pausable and self.currentProc:
             logger.info(f'Kill process "{self.printable_cmd}"', self.parent, 2)
             return self.currentProc.kill()
+
+
+def runParallel(procs, max_workers, finished=None):
+    """Run several :py:class:`Execute` instances concurrently.
+
+    The commands run in a pool of ``max_workers`` threads. Because signal
+    handlers can only be registered in the main thread, ``SIGTSTP``,
+    ``SIGCONT`` and ``SIGHUP`` are forwarded from here to all commands.
+    Callbacks of the commands are called from the worker threads.
+
+    Args:
+        procs (list): :py:class:`Execute` instances.
+        max_workers (int): Maximum number of concurrently running commands.
+        finished (method): Called from the worker thread with the index and
+            the return code of each command as soon as it finished.
+
+    Returns:
+        list: Return codes of the commands in the order of ``procs``.
+    """
+    killed = threading.Event()
+
+    def forward(method):
+        def handler(signum, frame):
+            if method == 'kill':
+                killed.set()
+
+            for proc in procs:
+                getattr(proc, method)(signum, frame)
+
+        return handler
+
+    try:
+        signal.signal(signal.SIGTSTP, forward('pause'))
+        signal.signal(signal.SIGCONT, forward('resume'))
+        signal.signal(signal.SIGHUP, forward('kill'))
+
+    except ValueError:
+        # signal only work in qt main thread
+        pass
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            def run(idx):
+                # commands still waiting for a worker don't start anymore
+                if killed.is_set():
+                    return -signal.SIGKILL
+
+                code = procs[idx].run()
+                if finished is not None:
+                    finished(idx, code)
+                return code
+
+            return list(executor.map(run, range(len(procs))))
+
+    finally:
+        try:
+            signal.signal(signal.SIGTSTP, signal.SIG_DFL)
+            signal.signal(signal.SIGCONT, signal.SIG_DFL)
+            signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        except ValueError:
+            pass
+
+
+def lstatOrNone(path):
+    """:py:func:`os.lstat` ``path`` if it is accessible.
+
+    Args:
+        path (str): Full path. :py:class:`bytes` works as well.
+
+    Returns:
+        os.stat_result: Result of :py:func:`os.lstat` or ``None`` if
+        ``path`` doesn't exist or can't be accessed.
+    """
+    try:
+        return os.lstat(path)
+    except OSError:
+        return None
+
+
+def removeTree(path, max_workers=8, callback=None):
+    """Remove the folder ``path`` with all its content like
+    :py:func:`shutil.rmtree` but much faster on large trees like snapshots.
+
+    Each folder is a separate task in a thread pool. Files are removed with
+    :py:func:`os.unlink` relative to a file descriptor of their folder
+    (``dir_fd``). A folder is removed by the task of its last subfolder
+    which finished. Folders without write permission (like in snapshots)
+    are made writable when they are opened.
+
+    Args:
+        path (str): Folder to remove.
+        max_workers (int): Maximum number of threads.
+        callback (method): Called with the number of removed files and
+            folders about once per second. It might be called from any of the
+            threads but never concurrently.
+
+    Returns:
+        bool: ``True`` if everything was removed.
+    """
+    remover = _TreeRemover(max_workers, callback)
+    return remover.run(path)
+
+
+class _TreeRemover:
+    """Implementation of :py:func:`removeTree`."""
+
+    # Report progress at most every n seconds
+    PROGRESS_INTERVAL = 1.0
+
+    def __init__(self, max_workers, callback):
+        self.max_workers = max(1, max_workers)
+        self.callback = callback
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        # number of subfolders not removed yet and parent of each folder
+        self.pending = {}
+        self.parents = {}
+        # number of tasks submitted but not finished yet
+        self.running = 0
+        self.count = 0
+        self.lastProgress = time.monotonic()
+        self.failed = False
+        self.executor = None
+
+    def run(self, path):
+        path = path.rstrip(os.sep)
+        if not os.path.lexists(path):
+            return True
+
+        if not os.path.isdir(path) or os.path.islink(path):
+            try:
+                os.unlink(path)
+                return True
+
+            except OSError as exc:
+                logger.error(f'Failed to remove {path}: {str(exc)}')
+                return False
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            self.executor = executor
+            self.parents[path] = None
+            self._submit(path)
+            self.done.wait()
+
+        if self.callback:
+            self.callback(self.count)
+
+        return not self.failed
+
+    def _openDir(self, path):
+        """Open ``path`` and make it readable and writable for its owner."""
+        flags = os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW
+
+        try:
+            fd = os.open(path, flags)
+
+        except PermissionError:
+            os.chmod(path, stat.S_IRWXU)
+            return os.open(path, flags)
+
+        mode = os.fstat(fd).st_mode
+        if mode & stat.S_IRWXU != stat.S_IRWXU:
+            os.fchmod(fd, mode | stat.S_IRWXU)
+
+        return fd
+
+    def _submit(self, path):
+        with self.lock:
+            self.running += 1
+
+        try:
+            self.executor.submit(self._task, path)
+
+        except Exception:
+            with self.lock:
+                self.running -= 1
+            raise
+
+    def _task(self, path):
+        """Run :py:func:`_removeFolder` and signal :py:attr:`done` once the
+        last task exits, even if it failed."""
+        try:
+            self._removeFolder(path)
+
+        except Exception as exc:
+            self._error(path, exc)
+
+        finally:
+            with self.lock:
+                self.running -= 1
+                last = not self.running
+
+            if last:
+                self.done.set()
+
+    def _removeFolder(self, path):
+        """Remove all files in folder ``path`` and add a task for each
+        subfolder."""
+        subfolders = []
+        removed = 0
+
+        try:
+            fd = self._openDir(path)
+
+            try:
+                with os.scandir(fd) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            subfolders.append(os.path.join(path, entry.name))
+                        else:
+                            os.unlink(entry.name, dir_fd=fd)
+                            removed += 1
+
+            finally:
+                os.close(fd)
+
+        except OSError as exc:
+            self._error(path, exc)
+
+        with self.lock:
+            self.count += removed
+            self.pending[path] = len(subfolders)
+            for subfolder in subfolders:
+                self.parents[subfolder] = path
+
+        if not subfolders:
+            self._finish(path)
+            return
+
+        for subfolder in subfolders:
+            self._submit(subfolder)
+
+    def _finish(self, path):
+        """Remove the empty folder ``path`` and its parents if that was their
+        last subfolder."""
+        while path is not None:
+            try:
+                os.rmdir(path)
+
+            except OSError as exc:
+                self._error(path, exc)
+
+            with self.lock:
+                self.count += 1
+                self._progress()
+
+                del self.pending[path]
+                parent = self.parents.pop(path)
+
+                if parent is not None:
+                    self.pending[parent] -= 1
+                    last = not self.pending[parent]
+
+            if parent is None or not last:
+                return
+
+            path = parent
+
+    def _progress(self):
+        # called with self.lock held
+        if not self.callback:
+            return
+
+        now = time.monotonic()
+        if now - self.lastProgress >= self.PROGRESS_INTERVAL:
+            self.lastProgress = now
+            self.callback(self.count)
+
+    def _error(self, path, exc):
+        self.failed = True
+        logger.error(f'Failed to remove {path}: {str(exc)}')
@@ -30,7 +30,8 @@ class UniquenessSet:
     `SnapshotsDialog` class.
     """
 
-    def __init__(self, deep_check=False, follow_symlink=False, equal_to=''):
+    def __init__(self, deep_check=False, follow_symlink=False, equal_to='',
+                 hash_cache=None, cancel=None):
         """
         Args:
             deep_check (bool): If ``True`` use deep check which will compare
@@ -42,33 +43,76 @@ class UniquenessSet:
             equal_to (str): Full path to file. If not empty only return
                 equal files to the given path instead of unique
                 files. (default: ``''``)
+            hash_cache (hashcache.HashCache): Cache for the hashes of deep
+                checks. Uses uncached md5sums if ``None``.
+            cancel (method): Stops hashing in :py:func:`prepare` as soon
+                as it returns ``True``.
         """
         self.deep_check = deep_check
         self.follow_sym = follow_symlink
+        self.hash_cache = hash_cache
+        self.cancel = cancel
 
         # if not self._uniq_dict[size] -> size already checked with md5sum
         self._uniq_dict = {}
 
-        # if (size, inode) in self._size_inode -> path is a hlink
-        self._size_inode = set()
+        # if (dev, inode) in self._dev_inode -> path is a hlink
+        self._dev_inode = set()
 
         self.equal_to = equal_to
 
         if equal_to:
             st = os.stat(equal_to)
+            self.reference_id = (st.st_dev, st.st_ino)
 
             if self.deep_check:
-                self.reference = (st.st_size, md5sum(equal_to))
+                self.reference = (st.st_size, self._hash(equal_to, st))
 
             else:
                 self.reference = (st.st_size, int(st.st_mtime))
 
-    def check(self, input_path):
+    def _hash(self, path, stat=None):
+        if self.hash_cache is None:
+            return md5sum(path)
+
+        return self.hash_cache.hash(path, stat)
+
+    def prepare(self, files):
+        """Hash all files which will need a hash in deep checks in
+        parallel with the ``hash_cache``. Later checks of these files take
+        their hash from the cache.
+
+        Args:
+            files (list): (path, :py:class:`os.stat_result`) of all files
+                which will be checked
+        """
+        if not self.deep_check or self.hash_cache is None:
+            return
+
+        # only files with the same size as another file need a hash
+        inodes = {}
+        for path, st in files:
+            inodes.setdefault(st.st_size, {}).setdefault(
+                (st.st_dev, st.st_ino), (path, st))
+
+        if self.equal_to:
+            sizes = [self.reference[0]]
+        else:
+            sizes = [size for size, same in inodes.items() if len(same) > 1]
+
+        self.hash_cache.hashMany([item
+                                  for size in sizes
+                                  for item in inodes.get(size, {}).values()],
+                                 cancel=self.cancel)
+
+    def check(self, input_path, stat=None):
         """Check file ``input_path`` for either uniqueness or equality
         (depending on ``equal_to`` from constructor).
 
         Args:
             input_path (str):   full path to file
+            stat (os.stat_result): stat of ``input_path`` if the caller
+                already has it. Ignored if a symlink is followed.
 
         Returns:
             bool: ``True`` if file is unique and ``equal_to``
@@ -80,24 +124,27 @@ class UniquenessSet:
         # follow symlinks ?
         if self.follow_sym and os.path.islink(input_path):
             path = os.readlink(input_path)
+            stat = None
 
         if self.equal_to:
-            return self.checkEqual(path)
+            return self.checkEqual(path, stat)
 
         else:
-            return self.checkUnique(path)
+            return self.checkUnique(path, stat)
 
-    def checkUnique(self, path):
+    def checkUnique(self, path, stat=None):
         """Check file ``path`` for uniqueness and store a unique key for
         ``path``.
 
         This check is performed if `equal_to` is empty. By default
         (``deep_check is False``) the uniqueness is based on file size and
-        mtime. If ``deep_check is True`` the uniqueness is based on inode
-        number and the files size (or md5sum).
+        mtime. If ``deep_check is True`` the uniqueness is based on the
+        files size (or md5sum). Hardlinks to an already checked file
+        (same device and inode) are never unique.
 
         Args:
             path (str): Full path to file.
+            stat (os.stat_result): stat of ``path`` or ``None``.
 
         Returns:
             bool: ``True`` if file is unique.
@@ -105,17 +152,18 @@ class UniquenessSet:
         """
         logger.debug(f'{path=}')
 
-        if self.deep_check:
+        if stat is None:
             stat = os.stat(path)
-            size, inode = stat.st_size, stat.st_ino
 
-            # Hardlink?
-            if (size, inode) in self._size_inode:
-                logger.debug(
-                    "[deep test]: skip, it's a duplicate (size, inode)", self)
-                return False
+        # Hardlink?
+        if (stat.st_dev, stat.st_ino) in self._dev_inode:
+            logger.debug("skip, it's a duplicate (dev, inode)", self)
+            return False
+
+        self._dev_inode.add((stat.st_dev, stat.st_ino))
 
-            self._size_inode.add((size, inode))
+        if self.deep_check:
+            size = stat.st_size
 
             if size not in self._uniq_dict:
                 # first item of that size
@@ -126,20 +174,19 @@ class UniquenessSet:
                 prev = self._uniq_dict[size]
                 if prev:
                     # store md5sum instead of previously stored size
-                    md5sum_prev = md5sum(prev)
+                    md5sum_prev = self._hash(prev)
                     self._uniq_dict[md5sum_prev] = prev
                     # remove the entry with that size
                     self._uniq_dict[size] = None
                     logger.debug(
                         "[deep test]: size duplicate, remove the size, store "
                         "prev md5sum", self)
-                unique_key = md5sum(path)
+                unique_key = self._hash(path, stat)
                 logger.debug("[deep test]: store current md5sum?", self)
 
         else:
             # store a tuple of (size, modification time)
-            obj = os.stat(path)
-            unique_key = (obj.st_size, int(obj.st_mtime))
+            unique_key = (stat.st_size, int(stat.st_mtime))
 
         # store if not already present, then return True
         if unique_key not in self._uniq_dict:
@@ -152,21 +199,26 @@ class UniquenessSet:
 
         return False
 
-    def checkEqual(self, path):
+    def checkEqual(self, path, stat=None):
         """Check if ``path`` is equal to the file specified by ``equal_to``.
+        A hardlink to that file is equal without comparing its content.
 
         Args:
             path (str): Full path to file.
+            stat (os.stat_result): stat of ``path`` or ``None``.
 
         Returns:
             bool: ``True`` if file is equal.
         """
-        st = os.stat(path)
+        st = os.stat(path) if stat is None else stat
+
+        if (st.st_dev, st.st_ino) == self.reference_id:
+            return True
 
         if self.deep_check:
 
             if self.reference[0] == st.st_size:
-                return self.reference[1] == md5sum(path)
+                return self.reference[1] == self._hash(path, st)
 
             return False
 
@@ -87,6 +87,8 @@ from PyQt6.QtCore import (Qt,
                           QUrl)
 from manageprofiles import SettingsDialog
 import snapshotsdialog
+import searchdialog
+import snapshotdiffdialog
 import logviewdialog
 from restoredialog import RestoreDialog
 from restoreconfigdialog import RestoreConfigDialog
@@ -400,12 +402,18 @@ class MainWindow(QMainWindow):
         self.timerRaiseApplication.timeout.connect(self.raiseApplication)
         self.timerRaiseApplication.start()
 
+        # Polling is only needed while a snapshot is taken (pause state and
+        # killed processes). All other updates are pushed by the watcher.
         self.timerUpdateTakeSnapshot = QTimer(self)
         self.timerUpdateTakeSnapshot.setInterval(1000)
         self.timerUpdateTakeSnapshot.setSingleShot(False)
         self.timerUpdateTakeSnapshot.timeout.connect(self.updateTakeSnapshot)
         self.timerUpdateTakeSnapshot.start()
 
+        self.takeSnapshotWatcher = qttools.TakeSnapshotWatcher(self.config,
+                                                               self)
+        self.takeSnapshotWatcher.changed.connect(self.updateTakeSnapshot)
+
         SetupCron(self).start()
 
         # Finished countdown of manual GUI starts
@@ -608,6 +616,15 @@ class MainWindow(QMainWindow):
             'act_snapshots_dialog': (
                 icon.SNAPSHOTS, _('Compare snapshots…'),
                 self.btnSnapshotsClicked, None, None),
+            'act_search': (
+                icon.SEARCH, _('Search in snapshots…'),
+                self.btnSearchClicked, ['Ctrl+F'],
+                _('Find files by name or pattern in all snapshots.')),
+            'act_snapshot_diff': (
+                icon.DIFF, _('Show changes between snapshots…'),
+                self.btnSnapshotDiffClicked, None,
+                _('List all files which were added, deleted or modified '
+                  'between two snapshots.')),
         }
 
         for attr in action_dict:
@@ -685,6 +702,8 @@ class MainWindow(QMainWindow):
                 self.act_take_snapshot_checksum,
                 self.act_settings,
                 self.act_snapshots_dialog,
+                self.act_search,
+                self.act_snapshot_diff,
                 self.act_name_snapshot,
                 self.act_remove_snapshot,
                 self.act_snapshot_logview,
@@ -811,6 +830,7 @@ class MainWindow(QMainWindow):
             self.act_show_hidden,
             self.act_restore,
             self.act_snapshots_dialog,
+            self.act_search,
         ]
 
         toolbar.addActions(actions_for_toolbar)
@@ -988,8 +1008,9 @@ class MainWindow(QMainWindow):
         """Update the statusbar and progress indicator with latest message
         from the snapshot message file.
 
-        This method is called via a timeout event. See
-        `self.timerUpdateTakeSnapshot`. Also see
+        This method is called by `self.takeSnapshotWatcher` when the status
+        files change and via a timeout event of
+        `self.timerUpdateTakeSnapshot` while a snapshot is taken. Also see
         `Snapshots.takeSnapshotMessage()` for further details.
         """
         if force_wait_lock:
@@ -1095,6 +1116,12 @@ class MainWindow(QMainWindow):
         #if not fake_busy:
         #	self.lastTakeSnapshotMessage = None
 
+        if not fake_busy:
+            self.timerUpdateTakeSnapshot.stop()
+
+        elif not self.timerUpdateTakeSnapshot.isActive():
+            self.timerUpdateTakeSnapshot.start()
+
     def getProgressBarFormat(self, pg, message):
         d = (
             ('sent', '{}:'.format(_('Sent'))),
@@ -1629,6 +1656,35 @@ class MainWindow(QMainWindow):
                 if dlg.sid != self.sid:
                     self.timeLine.setCurrentSnapshotID(dlg.sid)
 
+    def btnSearchClicked(self):
+        with self.suspendMouseButtonNavigation():
+            dlg = searchdialog.SearchDialog(self)
+
+            if dlg.exec() != QDialog.DialogCode.Accepted:
+                return
+
+        if dlg.sid != self.sid:
+            self.timeLine.setCurrentSnapshotID(dlg.sid)
+
+        self.path = os.path.dirname(dlg.path)
+        self.path_history.append(self.path)
+        self.updateFilesView(1, selected_file=os.path.basename(dlg.path))
+
+    def btnSnapshotDiffClicked(self):
+        with self.suspendMouseButtonNavigation():
+            dlg = snapshotdiffdialog.SnapshotDiffDialog(self, self.sid,
+                                                        self.path)
+
+            if dlg.exec() != QDialog.DialogCode.Accepted:
+                return
+
+        if dlg.sid != self.sid:
+            self.timeLine.setCurrentSnapshotID(dlg.sid)
+
+        self.path = os.path.dirname(dlg.path)
+        self.path_history.append(self.path)
+        self.updateFilesView(1, selected_file=os.path.basename(dlg.path))
+
     def btnFolderUpClicked(self):
 
         if len(self.path) <= 1:
@@ -102,11 +102,14 @@ RESTORE_TO          = QIcon.fromTheme('document-revert')
 SNAPSHOTS           = QIcon.fromTheme('file-manager',
                       QIcon.fromTheme('view-list-details',
                       QIcon.fromTheme('system-file-manager')))
+SEARCH              = QIcon.fromTheme('edit-find')
 
 #Snapshot dialog
 DIFF_OPTIONS        = SETTINGS
 DELETE_FILE         = REMOVE_SNAPSHOT
 SELECT_ALL          = QIcon.fromTheme('edit-select-all')
+DIFF                = QIcon.fromTheme('document-compare',
+                      QIcon.fromTheme('view-split-left-right'))
 
 #Restore dialog
 RESTORE_DIALOG      = VIEW_SNAPSHOT_LOG
@@ -86,10 +86,12 @@ class QtSysTrayIcon:
         self.btnPause = self.contextMenu.addAction(icon.PAUSE, _('Pause snapshot process'))
         action = lambda: os.kill(self.snapshots.pid(), signal.SIGSTOP)
         self.btnPause.triggered.connect(action)
+        self.btnPause.triggered.connect(self.updateInfo)
 
         self.btnResume = self.contextMenu.addAction(icon.RESUME, _('Resume snapshot process'))
         action = lambda: os.kill(self.snapshots.pid(), signal.SIGCONT)
         self.btnResume.triggered.connect(action)
+        self.btnResume.triggered.connect(self.updateInfo)
         self.btnResume.setVisible(False)
 
         self.btnStop = self.contextMenu.addAction(icon.STOP, _('Stop snapshot process'))
@@ -127,11 +129,17 @@ class QtSysTrayIcon:
         self.popup = None
         self.last_message = None
 
+        # Status updates are pushed by the watcher. The timer only catches
+        # pause state changes and a killed snapshot process.
         self.timer = QTimer()
         self.timer.timeout.connect(self.updateInfo)
 
+        self.watcher = qttools.TakeSnapshotWatcher(self.config)
+        self.watcher.changed.connect(self.updateInfo)
+
     def prepareExit(self):
         self.timer.stop()
+        self.watcher.blockSignals(True)
 
         if not self.status_icon is None:
             self.status_icon.hide()
@@ -147,7 +155,7 @@ class QtSysTrayIcon:
         if not self.snapshots.busy():
             sys.exit()
         self.status_icon.show()
-        self.timer.start(500)
+        self.timer.start(2000)
 
         # logger.debug("begin loop", self)
 
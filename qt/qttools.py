@@ -27,6 +27,9 @@ from typing import Union, Iterable
 from PyQt6.QtGui import (QAction, QFont, QPalette, QIcon)
 from PyQt6.QtCore import (QDir,
                           Qt,
+                          QObject,
+                          QTimer,
+                          QFileSystemWatcher,
                           pyqtSlot,
                           pyqtSignal,
                           QModelIndex,
@@ -704,3 +707,54 @@ class ProfileCombo(SortedComboBox):
             if self.itemData(i) == profileID:
                 self.setCurrentIndex(i)
                 break
+
+
+class TakeSnapshotWatcher(QObject):
+    """Emit :py:attr:`changed` when the snapshot process of the current
+    profile starts, finishes or updates its message or progress file.
+
+    The files are watched with :py:class:`QFileSystemWatcher` (inotify on
+    Linux) so nothing needs to be polled while no snapshot is taken. Changes
+    of several files in a row are merged into one signal.
+
+    Args:
+        config (config.Config): Current config.
+        parent (QObject): Qt parent.
+    """
+    changed = pyqtSignal()
+
+    def __init__(self, config, parent=None):
+        super().__init__(parent)
+        self.config = config
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(50)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.changed)
+
+        self.watcher = QFileSystemWatcher(self)
+        # Creating and removing files (e.g. the lock file of the snapshot
+        # process) is only reported for the folder.
+        self.watcher.addPath(
+            os.path.dirname(self.config.takeSnapshotMessageFile()))
+        self.watcher.directoryChanged.connect(self._onChanged)
+        self.watcher.fileChanged.connect(self._onChanged)
+        self._watchFiles()
+
+    def _watchFiles(self):
+        """Add the status files of the current profile to the watcher.
+        Removed files get dropped by ``QFileSystemWatcher`` and need to be
+        added again after they were recreated.
+        """
+        watched = self.watcher.files()
+        files = [fn for fn in (self.config.takeSnapshotMessageFile(),
+                               self.config.takeSnapshotProgressFile(),
+                               self.config.takeSnapshotInstanceFile())
+                 if fn not in watched and os.path.exists(fn)]
+
+        if files:
+            self.watcher.addPaths(files)
+
+    def _onChanged(self, path):
+        self._watchFiles()
+        self.timer.start()
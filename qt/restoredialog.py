@@ -54,6 +54,16 @@ class RestoreDialog(QDialog):
         self.txtLogView.setMaximumBlockCount(100000)
         self.mainLayout.addWidget(self.txtLogView)
 
+        #progress of all restored paths
+        self.progressBar = QProgressBar(self)
+        self.progressBar.setMinimum(0)
+        self.progressBar.setMaximum(100)
+        self.progressBar.setVisible(False)
+        self.mainLayout.addWidget(self.progressBar)
+        self.lblProgress = QLabel(self)
+        self.lblProgress.setVisible(False)
+        self.mainLayout.addWidget(self.lblProgress)
+
         #buttons
         buttonBox = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
         showLog = buttonBox.addButton(_('Show full Log'), QDialogButtonBox.ButtonRole.ActionRole)
@@ -85,6 +95,17 @@ class RestoreDialog(QDialog):
             self.thread.mutex.unlock()
             self.txtLogView.appendPlainText(newLog.rstrip('\n'))
 
+        progress = self.thread.progress
+        if progress:
+            percent, sent, speed, eta = progress
+            self.progressBar.setValue(percent)
+            self.lblProgress.setText(' | '.join((
+                '{}: {}'.format(_('Sent'), sent),
+                '{}: {}'.format(_('Speed'), speed),
+                '{}: {}'.format(_('ETA'), eta))))
+            self.progressBar.setVisible(True)
+            self.lblProgress.setVisible(True)
+
     def exec(self):
         #inhibit suspend/hibernate during restore
         self.config.inhibitCookie = tools.inhibitSuspend(toplevel_xid = self.config.xWindowId, reason = 'restoring')
@@ -97,6 +118,8 @@ class RestoreDialog(QDialog):
 
     def threadFinished(self):
         self.btnClose.setEnabled(True)
+        self.progressBar.setVisible(False)
+        self.lblProgress.setVisible(False)
         #release inhibit suspend
         if self.config.inhibitCookie:
             self.config.inhibitCookie = tools.unInhibitSuspend(*self.config.inhibitCookie)
@@ -111,11 +134,19 @@ class RestoreThread(QThread):
         self.log = open(parent.logFile, 'wt')
         self.mutex = QMutex()
         self.buffer = ''
+        # latest (percent, sent, speed, eta) of rsync
+        self.progress = None
 
     def run(self):
-        self.parent.snapshots.restore(self.parent.sid, self.parent.what, self.callback, self.parent.where, **self.parent.kwargs)
+        self.parent.snapshots.restore(self.parent.sid, self.parent.what, self.callback, self.parent.where, progress = self.progressCallback, **self.parent.kwargs)
         self.log.close()
 
+    def progressCallback(self, *progress):
+        """
+        keep the latest progress for the progress bar
+        """
+        self.progress = progress
+
     def callback(self, line, *args):
         """
         write into log file and provide thread save string for log window
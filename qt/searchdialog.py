@@ -0,0 +1,152 @@
+#    Back In Time
+#    Copyright (C) 2008-2022 Oprea Dan, Bart de Koning, Richard Bailey, Germar Reitze
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+import os
+
+from PyQt6.QtGui import *
+from PyQt6.QtWidgets import *
+from PyQt6.QtCore import *
+
+import snapshots
+import searchindex
+import logger
+
+
+class SearchDialog(QDialog):
+    """
+    Search files in all snapshots of the current profile with the
+    :py:class:`searchindex.SearchIndex`. After the dialog was accepted
+    ``sid`` and ``path`` hold the selected snapshot and full path.
+    """
+    def __init__(self, parent):
+        super(SearchDialog, self).__init__(parent)
+        self.config = parent.config
+        self.sid = None
+        self.path = None
+        import icon
+
+        self.setWindowIcon(icon.SEARCH)
+        self.setWindowTitle(_('Search in snapshots'))
+        self.resize(700, 500)
+
+        self.mainLayout = QVBoxLayout(self)
+
+        layout = QHBoxLayout()
+        self.mainLayout.addLayout(layout)
+        self.editSearch = QLineEdit(self)
+        self.editSearch.setPlaceholderText(
+            _('File name, part of a path or pattern like invoice-2023*.pdf'))
+        self.editSearch.returnPressed.connect(self.search)
+        layout.addWidget(self.editSearch)
+        self.btnSearch = QPushButton(icon.SEARCH, _('Search'), self)
+        self.btnSearch.clicked.connect(self.search)
+        layout.addWidget(self.btnSearch)
+
+        self.lblStatus = QLabel(self)
+        self.mainLayout.addWidget(self.lblStatus)
+
+        #results
+        self.listResults = QTreeWidget(self)
+        self.listResults.setRootIsDecorated(False)
+        self.listResults.setHeaderLabels(
+            [_('Path'), _('First snapshot'), _('Last snapshot')])
+        self.listResults.itemActivated.connect(self.accept)
+        self.mainLayout.addWidget(self.listResults)
+
+        buttonBox = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok
+                                     | QDialogButtonBox.StandardButton.Cancel)
+        buttonBox.button(QDialogButtonBox.StandardButton.Ok).setText(_('Go To'))
+        buttonBox.accepted.connect(self.accept)
+        buttonBox.rejected.connect(self.reject)
+        self.mainLayout.addWidget(buttonBox)
+
+        #add new snapshots to the index in background
+        self.sids = snapshots.listSnapshots(self.config, reverse = False)
+        self.btnSearch.setEnabled(False)
+        self.lblStatus.setText(_('Updating search index…'))
+        self.thread = UpdateThread(self)
+        self.thread.finished.connect(self.updateFinished)
+        self.thread.start()
+
+    def updateFinished(self):
+        self.btnSearch.setEnabled(True)
+        self.lblStatus.setText(self.thread.error or '')
+
+    def search(self):
+        pattern = self.editSearch.text()
+        if not pattern or self.thread.isRunning():
+            return
+
+        self.listResults.clear()
+        ids = [sid.sid for sid in self.sids]
+
+        try:
+            with searchindex.SearchIndex(self.config) as index:
+                results = index.search(pattern)
+
+        except Exception as e:
+            logger.error(f'Search failed: {str(e)}', self)
+            self.lblStatus.setText(str(e))
+            return
+
+        for path, first, last, inode in results:
+            existing = searchindex.rangeSIDs(ids, first, last)
+            if not existing:
+                continue
+
+            item = QTreeWidgetItem([os.fsdecode(path), existing[0],
+                                    existing[-1]])
+            item.setData(0, Qt.ItemDataRole.UserRole, existing[-1])
+            self.listResults.addTopLevelItem(item)
+
+        self.lblStatus.setText(_('{count} results').format(
+            count=self.listResults.topLevelItemCount()))
+        self.listResults.resizeColumnToContents(0)
+
+    def accept(self):
+        item = self.listResults.currentItem()
+        if item is None:
+            return
+
+        self.sid = snapshots.SID(item.data(0, Qt.ItemDataRole.UserRole),
+                                 self.config)
+        self.path = item.text(0)
+        super(SearchDialog, self).accept()
+
+    def done(self, result):
+        self.thread.wait()
+        super(SearchDialog, self).done(result)
+
+
+class UpdateThread(QThread):
+    """
+    update the search index in a separate thread
+    """
+    def __init__(self, parent):
+        super(UpdateThread, self).__init__()
+        self.parent = parent
+        self.error = None
+
+    def run(self):
+        try:
+            with searchindex.SearchIndex(self.parent.config) as index:
+                index.update(self.parent.sids)
+
+        except Exception as e:
+            logger.error(f'Failed to update search index: {str(e)}', self)
+            self.error = str(e)
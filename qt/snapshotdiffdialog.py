@@ -0,0 +1,185 @@
+#    Back In Time
+#    Copyright (C) 2008-2022 Oprea Dan, Bart de Koning, Richard Bailey, Germar Reitze
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+import os
+
+from PyQt6.QtGui import *
+from PyQt6.QtWidgets import *
+from PyQt6.QtCore import *
+
+import qttools
+import snapshotdiff
+import logger
+
+
+class SnapshotDiffDialog(QDialog):
+    """
+    List all files which differ between two snapshots using
+    :py:func:`snapshotdiff.diff`. After the dialog was accepted ``sid`` and
+    ``path`` hold the snapshot and full path of the selected file.
+    """
+    STATUS = {snapshotdiff.ADDED: _('Added'),
+              snapshotdiff.DELETED: _('Deleted'),
+              snapshotdiff.MODIFIED: _('Modified'),
+              snapshotdiff.TYPE_CHANGED: _('Replaced')}
+
+    def __init__(self, parent, sid, path):
+        super(SnapshotDiffDialog, self).__init__(parent)
+        self.config = parent.config
+        self.snapshotsList = [s for s in parent.snapshotsList
+                              if not s.isRoot]
+        self.sid = None
+        self.path = path
+        import icon
+
+        self.setWindowIcon(icon.DIFF)
+        self.setWindowTitle(_('Changes between snapshots'))
+        self.resize(700, 500)
+
+        self.mainLayout = QVBoxLayout(self)
+
+        layout = QHBoxLayout()
+        self.mainLayout.addLayout(layout)
+        layout.addWidget(QLabel(_('From:'), self))
+        self.comboOld = qttools.SnapshotCombo(self)
+        layout.addWidget(self.comboOld, 1)
+        layout.addWidget(QLabel(_('To:'), self))
+        self.comboNew = qttools.SnapshotCombo(self)
+        layout.addWidget(self.comboNew, 1)
+        self.btnCompare = QPushButton(icon.DIFF, _('Compare'), self)
+        self.btnCompare.clicked.connect(self.compare)
+        layout.addWidget(self.btnCompare)
+
+        #path
+        self.editPath = QLineEdit(path, self)
+        self.editPath.returnPressed.connect(self.compare)
+        self.mainLayout.addWidget(self.editPath)
+
+        self.lblStatus = QLabel(self)
+        self.mainLayout.addWidget(self.lblStatus)
+
+        #results
+        self.listResults = QTreeWidget(self)
+        self.listResults.setRootIsDecorated(False)
+        self.listResults.setHeaderLabels([_('Status'), _('Path')])
+        self.listResults.itemActivated.connect(self.accept)
+        self.mainLayout.addWidget(self.listResults)
+
+        buttonBox = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok
+                                     | QDialogButtonBox.StandardButton.Cancel)
+        buttonBox.button(QDialogButtonBox.StandardButton.Ok).setText(_('Go To'))
+        buttonBox.accepted.connect(self.accept)
+        buttonBox.rejected.connect(self.reject)
+        self.mainLayout.addWidget(buttonBox)
+
+        for s in self.snapshotsList:
+            self.comboOld.addSnapshotID(s)
+            self.comboNew.addSnapshotID(s)
+
+        # compare the selected snapshot with the one before by default
+        if sid is None or sid.isRoot:
+            sid = self.snapshotsList[0] if self.snapshotsList else None
+        if sid is not None:
+            self.comboNew.setCurrentSnapshotID(sid)
+            older = [s for s in self.snapshotsList if s < sid]
+            self.comboOld.setCurrentSnapshotID(older[0] if older else sid)
+
+        self.thread = None
+
+    def compare(self):
+        if self.thread is not None and self.thread.isRunning():
+            return
+
+        sid1 = self.comboOld.currentSnapshotID()
+        sid2 = self.comboNew.currentSnapshotID()
+        if sid1 is None or sid2 is None:
+            return
+
+        self.listResults.clear()
+        self.btnCompare.setEnabled(False)
+        self.lblStatus.setText(_('Comparing…'))
+        self.thread = DiffThread(self, sid1, sid2, self.editPath.text() or '/')
+        self.thread.found.connect(self.addResults)
+        self.thread.finished.connect(self.compareFinished)
+        self.thread.start()
+
+    def addResults(self, results):
+        for status, path in results:
+            item = QTreeWidgetItem([self.STATUS[status], os.fsdecode(path)])
+            item.setData(0, Qt.ItemDataRole.UserRole, status)
+            self.listResults.addTopLevelItem(item)
+
+    def compareFinished(self):
+        self.btnCompare.setEnabled(True)
+        self.lblStatus.setText(self.thread.error or
+            _('{count} differences').format(
+                count=self.listResults.topLevelItemCount()))
+        self.listResults.resizeColumnToContents(0)
+
+    def accept(self):
+        item = self.listResults.currentItem()
+        if item is None:
+            return
+
+        # deleted files only exist in the old snapshot
+        if item.data(0, Qt.ItemDataRole.UserRole) == snapshotdiff.DELETED:
+            self.sid = self.thread.sid1
+        else:
+            self.sid = self.thread.sid2
+        self.path = item.text(1)
+        super(SnapshotDiffDialog, self).accept()
+
+    def done(self, result):
+        if self.thread is not None:
+            self.thread.requestInterruption()
+            self.thread.wait()
+        super(SnapshotDiffDialog, self).done(result)
+
+
+class DiffThread(QThread):
+    """
+    compare two snapshots in a separate thread and report results in batches
+    """
+    found = pyqtSignal(list)
+
+    def __init__(self, parent, sid1, sid2, path):
+        super(DiffThread, self).__init__()
+        self.sid1 = sid1
+        self.sid2 = sid2
+        self.path = path
+        self.error = None
+
+    def run(self):
+        batch = []
+
+        try:
+            for result in snapshotdiff.diff(self.sid1, self.sid2, self.path):
+                if self.isInterruptionRequested():
+                    return
+
+                batch.append(result)
+                if len(batch) >= 100:
+                    self.found.emit(batch)
+                    batch = []
+
+        except Exception as e:
+            logger.error(f'Failed to compare snapshots: {str(e)}', self)
+            self.error = str(e)
+
+        if batch:
+            self.found.emit(batch)
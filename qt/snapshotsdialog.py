@@ -118,6 +118,9 @@ class SnapshotsDialog(QDialog):
 
         self.sid = sid
         self.path = path
+        self.filterThread = None
+        # interrupted threads may still run until they notice it
+        self.filterThreads = []
 
         self.setWindowIcon(icon.SNAPSHOTS)
         self.setWindowTitle(_('Snapshots'))
@@ -246,7 +249,18 @@ class SnapshotsDialog(QDialog):
         else:
             equal_to = False
 
-        snapshotsFiltered = self.snapshots.filter(
+        # results of a previous filter are outdated
+        if self.filterThread is not None:
+            self.filterThread.requestInterruption()
+            self.filterThread.found.disconnect()
+            self.filterThread.finished.disconnect()
+
+        self.filterThreads = [thread for thread in self.filterThreads
+                              if thread.isRunning()]
+
+        # snapshots are added while they are checked
+        self.filterThread = FilterThread(
+            self,
             base_sid=self.sid,
             base_path=self.path,
             snapshotsList=self.snapshotsList,
@@ -254,9 +268,10 @@ class SnapshotsDialog(QDialog):
             flag_deep_check=self.cbDeepCheck.isChecked(),
             list_equal_to=equal_to
         )
-
-        for sid in snapshotsFiltered:
-            self.addSnapshot(sid)
+        self.filterThread.found.connect(self.addSnapshot)
+        self.filterThread.finished.connect(self.updateToolbar)
+        self.filterThreads.append(self.filterThread)
+        self.filterThread.start()
 
         self.updateToolbar()
 
@@ -454,6 +469,35 @@ class SnapshotsDialog(QDialog):
             self.sid = sid
         super(SnapshotsDialog, self).accept()
 
+    def done(self, result):
+        for thread in self.filterThreads:
+            thread.requestInterruption()
+        for thread in self.filterThreads:
+            thread.wait()
+        super(SnapshotsDialog, self).done(result)
+
+
+class FilterThread(QThread):
+    """
+    filter snapshots with :py:func:`snapshots.Snapshots.filter` in background
+    and report every matching snapshot immediately
+    """
+    found = pyqtSignal(object)
+
+    def __init__(self, parent, **kwargs):
+        self.snapshots = parent.snapshots
+        self.kwargs = kwargs
+        super(FilterThread, self).__init__(parent)
+
+    def run(self):
+        self.snapshots.filter(callback=self.report,
+                              cancel=self.isInterruptionRequested,
+                              **self.kwargs)
+
+    def report(self, sid):
+        if not self.isInterruptionRequested():
+            self.found.emit(sid)
+
 
 class RemoveFileThread(QThread):
     """